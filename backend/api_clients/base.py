@@ -1,54 +1,116 @@
 import httpx
 import asyncio
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Union
 from abc import ABC, abstractmethod
 from config import settings
-from cache import cache_manager
-from utils.circuit_breaker import circuit_breaker_manager
+from cache import cache_manager, NegativeResult, make_cache_key
+from utils.circuit_breaker import circuit_breaker_manager, CircuitOpenError
 from utils.rate_limiter import rate_limiter_manager
+from services.api_metrics import api_metrics
+from utils.quota import quota_ledger
+from utils.bulkhead import bulkheads, BulkheadFullError
 import logging
+import random
 import time
+from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
 
 class BaseAPIClient(ABC):
-    def __init__(self, api_name: str, rate_limit: int = 60):
+    def __init__(self, api_name: str, rate_limit: int = 60, credential: Optional[str] = None):
         self.api_name = api_name
-        self.rate_limiter = rate_limiter_manager.get_limiter(api_name, rate_limit)
+        self.rate_limiter = rate_limiter_manager.get_limiter(api_name, rate_limit, credential)
+        quota_ledger.register(api_name, credential)
         self.circuit_breaker = circuit_breaker_manager.get_breaker(api_name)
         self.client = httpx.AsyncClient(timeout=settings.API_TIMEOUT, limits=httpx.Limits(max_connections=10, max_keepalive_connections=5))
         self.cache_ttl = settings.CACHE_TTL_SOCIAL
         
     async def _make_request(self, method: str, url: str, cache_key: Optional[str] = None, **kwargs) -> Optional[Dict[str, Any]]:
         if cache_key:
-            cached = await cache_manager.get(cache_key)
-            if cached is not None:
-                return cached
-        
+            return await self._cached_call(cache_key, lambda: self._fetch(method, url, **kwargs))
+        result = await self._fetch(method, url, **kwargs)
+        return None if isinstance(result, NegativeResult) else result
+    
+    def cache_key(self, query_type: str, query: str, *suffix: str) -> str:
+        return make_cache_key(self.api_name, query_type, query, *suffix)
+    
+    async def _cached_call(self, cache_key: str, fetch_func, ttl: Optional[int] = None, endpoint: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """endpoint names an SDK call to time and record; HTTP calls are recorded in _fetch"""
+        if endpoint:
+            sdk_call = fetch_func
+            fetch_func = lambda: self._timed(endpoint, sdk_call)
+        return await cache_manager.get_or_set(cache_key, fetch_func, ttl or self.cache_ttl, tags=[f"source:{self.api_name}"], persist_as=self.api_name)
+    
+    async def _timed(self, endpoint: str, fetch_func):
+        try:
+            async with bulkheads.admit(self.api_name):
+                await quota_ledger.record(self.api_name)
+                start = time.perf_counter()
+                try:
+                    result = await fetch_func()
+                except Exception as e:
+                    api_metrics.record(self.api_name, endpoint, time.perf_counter() - start, None, False, str(e))
+                    raise
+        except BulkheadFullError as e:
+            logger.warning(f"{self.api_name} call shed: {e}")
+            return self.shed()
+        failed = isinstance(result, NegativeResult) and result.reason == "transient_error"
+        api_metrics.record(self.api_name, endpoint, time.perf_counter() - start, None, not failed, result.reason if failed else None)
+        return result
+    
+    def not_found(self) -> NegativeResult:
+        return NegativeResult("not_found", settings.CACHE_TTL_NOT_FOUND)
+    
+    def transient_error(self) -> NegativeResult:
+        jitter = settings.CACHE_TTL_TRANSIENT_ERROR * settings.CACHE_NEGATIVE_JITTER
+        ttl = settings.CACHE_TTL_TRANSIENT_ERROR + random.uniform(-jitter, jitter)
+        return NegativeResult("transient_error", max(1, int(ttl)))
+    
+    def shed(self) -> NegativeResult:
+        # Local overload says nothing about the upstream, so other workers must not see it cached
+        return NegativeResult("shed", 0, shared=False)
+    
+    async def _fetch(self, method: str, url: str, **kwargs) -> Union[Dict[str, Any], NegativeResult, None]:
         await self.rate_limiter.wait_if_needed()
+        endpoint = urlparse(url).path or url
+        
+        async def timed_request():
+            await quota_ledger.record(self.api_name)
+            start = time.perf_counter()
+            try:
+                response = await self.client.request(method=method, url=url, **kwargs)
+            except Exception as e:
+                api_metrics.record(self.api_name, endpoint, time.perf_counter() - start, None, False, str(e))
+                raise
+            success = response.status_code < 500 and response.status_code != 429
+            api_metrics.record(self.api_name, endpoint, time.perf_counter() - start, response.status_code, success)
+            return response
         
         try:
-            response = await self.circuit_breaker.call(
-                self.client.request,
-                method=method,
-                url=url,
-                **kwargs
-            )
+            async with bulkheads.admit(self.api_name):
+                response = await self.circuit_breaker.call(timed_request)
+            await self.rate_limiter.observe(response.status_code, response.headers)
             
             if response.status_code == 200:
-                data = response.json() if response.headers.get("content-type", "").startswith("application/json") else {"raw": response.text}
-                
-                if cache_key:
-                    await cache_manager.set(cache_key, data, self.cache_ttl)
-                
-                return data
-            else:
-                logger.warning(f"{self.api_name} API error: {response.status_code}")
-                return None
+                return response.json() if response.headers.get("content-type", "").startswith("application/json") else {"raw": response.text}
+            
+            logger.warning(f"{self.api_name} API error: {response.status_code}")
+            if response.status_code in (404, 410):
+                return self.not_found()
+            if response.status_code == 429 or response.status_code >= 500:
+                return self.transient_error()
+            return None
                 
+        except BulkheadFullError as e:
+            logger.warning(f"{self.api_name} call shed: {e}")
+            return self.shed()
+        except CircuitOpenError as e:
+            # Not cached: the entry could outlive the open interval and keep failing lookups after the breaker closes
+            logger.warning(f"{self.api_name} call rejected: {e}")
+            return NegativeResult("circuit_open", 0, shared=False)
         except Exception as e:
             logger.error(f"{self.api_name} API exception: {e}")
-            return None
+            return self.transient_error()
     
     @abstractmethod
     async def search(self, query: str, query_type: str) -> Optional[Dict[str, Any]]:
@@ -4,14 +4,14 @@ from config import settings
 
 class EtherscanClient(BaseAPIClient):
     def __init__(self):
-        super().__init__("etherscan", rate_limit=5)
+        super().__init__("etherscan", rate_limit=5, credential=settings.ETHERSCAN_API_KEY)
         self.api_key = settings.ETHERSCAN_API_KEY
         self.base_url = "https://api.etherscan.io/api"
         self.cache_ttl = settings.CACHE_TTL_BLOCKCHAIN
         
     async def search(self, query: str, query_type: str) -> Optional[Dict[str, Any]]:
         if query_type in ["email", "username"]:
-            cache_key = f"etherscan:ens:{query}"
+            cache_key = self.cache_key("ens", query)
             params = {
                 "module": "proxy",
                 "action": "eth_getEnsName",
@@ -22,7 +22,7 @@ class EtherscanClient(BaseAPIClient):
             
             if query_type == "email" and "@" in query:
                 domain = query.split("@")[1]
-                cache_key_domain = f"etherscan:domain:{domain}"
+                cache_key_domain = self.cache_key("domain", domain)
                 params_domain = {
                     "module": "proxy",
                     "action": "eth_getEnsName",
@@ -1,10 +1,12 @@
 from api_clients.base import BaseAPIClient
 from typing import Optional, Dict, Any
 from config import settings
+from cache import cache_manager
+import asyncio
 
 class GitHubClient(BaseAPIClient):
     def __init__(self):
-        super().__init__("github", rate_limit=5000)
+        super().__init__("github", rate_limit=5000, credential=settings.GITHUB_API_TOKEN)
         self.api_token = settings.GITHUB_API_TOKEN
         self.base_url = "https://api.github.com"
         self.headers = {
@@ -14,12 +16,23 @@ class GitHubClient(BaseAPIClient):
         
     async def search(self, query: str, query_type: str) -> Optional[Dict[str, Any]]:
         if query_type == "username":
-            cache_key = f"github:username:{query}"
+            cache_key = self.cache_key("username", query)
             user_url = f"{self.base_url}/users/{query}"
             repos_url = f"{self.base_url}/users/{query}/repos"
             
-            user_data = await self._make_request("GET", user_url, f"{cache_key}:user", headers=self.headers)
-            repos_data = await self._make_request("GET", repos_url, f"{cache_key}:repos", headers=self.headers, params={"per_page": 10, "sort": "updated"})
+            user_key = f"{cache_key}:user"
+            repos_key = f"{cache_key}:repos"
+            cached = await cache_manager.get_many([user_key, repos_key])
+            if user_key in cached and repos_key in cached:
+                return {
+                    "user": cached[user_key],
+                    "repos": cached[repos_key] if cached[repos_key] else []
+                }
+            
+            user_data, repos_data = await asyncio.gather(
+                self._make_request("GET", user_url, user_key, headers=self.headers),
+                self._make_request("GET", repos_url, repos_key, headers=self.headers, params={"per_page": 10, "sort": "updated"})
+            )
             
             if user_data:
                 return {
@@ -27,7 +40,7 @@ class GitHubClient(BaseAPIClient):
                     "repos": repos_data if repos_data else []
                 }
         elif query_type == "email":
-            cache_key = f"github:email:{query}"
+            cache_key = self.cache_key("email", query)
             url = f"{self.base_url}/search/users"
             params = {"q": f"{query} in:email"}
             result = await self._make_request("GET", url, cache_key, headers=self.headers, params=params)
@@ -40,11 +40,10 @@ class InstagramScraper(BaseAPIClient):
         if not self.loader:
             return None
         
-        cache_key = f"instagram_scraper:username:{username}"
-        cached = await cache_manager.get(cache_key)
-        if cached:
-            return cached
-        
+        cache_key = self.cache_key("username", username)
+        return await self._cached_call(cache_key, lambda: self._fetch_profile(username), endpoint="profile")
+    
+    async def _fetch_profile(self, username: str):
         try:
             loop = asyncio.get_event_loop()
             profile = await loop.run_in_executor(
@@ -84,22 +83,22 @@ class InstagramScraper(BaseAPIClient):
                 'posts': posts
             }
             
-            await cache_manager.set(cache_key, result, self.cache_ttl)
             return result
+        except instaloader.exceptions.ProfileNotExistsException:
+            return self.not_found()
         except Exception as e:
             logger.error(f"Instagram scraper error for {username}: {e}")
-            return None
+            return self.transient_error()
     
     async def search_by_name(self, name: str) -> Optional[Dict[str, Any]]:
         await self._init_loader()
         if not self.loader:
             return None
         
-        cache_key = f"instagram_scraper:name:{name}"
-        cached = await cache_manager.get(cache_key)
-        if cached:
-            return cached
-        
+        cache_key = self.cache_key("name", name)
+        return await self._cached_call(cache_key, lambda: self._fetch_profiles_by_name(name), endpoint="search")
+    
+    async def _fetch_profiles_by_name(self, name: str):
         try:
             loop = asyncio.get_event_loop()
             profiles = await loop.run_in_executor(
@@ -125,12 +124,11 @@ class InstagramScraper(BaseAPIClient):
             
             if results:
                 result_data = {'profiles': results, 'count': len(results)}
-                await cache_manager.set(cache_key, result_data, self.cache_ttl)
                 return result_data
+            return self.not_found()
         except Exception as e:
             logger.error(f"Instagram name search error: {e}")
-        
-        return None
+            return self.transient_error()
     
     async def search(self, query: str, query_type: str) -> Optional[Dict[str, Any]]:
         if query_type == "username":
@@ -4,14 +4,14 @@ from config import settings
 
 class NewsAPIClient(BaseAPIClient):
     def __init__(self):
-        super().__init__("newsapi", rate_limit=100)
+        super().__init__("newsapi", rate_limit=100, credential=settings.NEWSAPI_KEY)
         self.api_key = settings.NEWSAPI_KEY
         self.base_url = "https://newsapi.org/v2"
         self.cache_ttl = settings.CACHE_TTL_NEWS
         
     async def search(self, query: str, query_type: str) -> Optional[Dict[str, Any]]:
         if query_type in ["name", "username", "email"]:
-            cache_key = f"newsapi:{query_type}:{query}"
+            cache_key = self.cache_key(query_type, query)
             url = f"{self.base_url}/everything"
             params = {
                 "apiKey": self.api_key,
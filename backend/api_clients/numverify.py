@@ -5,14 +5,14 @@ from utils.validators import normalize_phone
 
 class NumverifyClient(BaseAPIClient):
     def __init__(self):
-        super().__init__("numverify", rate_limit=1000)
+        super().__init__("numverify", rate_limit=1000, credential=settings.NUMVERIFY_API_KEY)
         self.api_key = settings.NUMVERIFY_API_KEY
         self.cache_ttl = 2592000
         
     async def search(self, query: str, query_type: str) -> Optional[Dict[str, Any]]:
         if query_type == "phone":
             normalized = normalize_phone(query)
-            cache_key = f"numverify:phone:{normalized}"
+            cache_key = self.cache_key("phone", normalized)
             url = f"http://apilayer.net/api/validate"
             params = {
                 "access_key": self.api_key,
@@ -16,7 +16,7 @@ except ImportError:
 
 class TelegramClientWrapper(BaseAPIClient):
     def __init__(self):
-        super().__init__("telegram", rate_limit=20)
+        super().__init__("telegram", rate_limit=20, credential=settings.API_ID_TELEGRAM)
         self.api_id = settings.API_ID_TELEGRAM
         self.api_hash = settings.API_KEY_TELEGRAM
         self.client = None
@@ -41,25 +41,25 @@ class TelegramClientWrapper(BaseAPIClient):
             return None
         
         if query_type == "username":
-            cache_key = f"telegram:username:{query}"
-            cached = await cache_manager.get(cache_key)
-            if cached:
-                return cached
-                
-            try:
-                entity = await self.client.get_entity(query)
-                result = {
-                    "username": entity.username,
-                    "first_name": getattr(entity, "first_name", None),
-                    "last_name": getattr(entity, "last_name", None),
-                    "id": entity.id,
-                    "phone": getattr(entity, "phone", None),
-                    "verified": getattr(entity, "verified", False),
-                    "bot": getattr(entity, "bot", False)
-                }
-                await cache_manager.set(cache_key, result, self.cache_ttl)
-                return result
-            except Exception as e:
-                logger.error(f"Telegram search error: {e}")
+            cache_key = self.cache_key("username", query)
+            return await self._cached_call(cache_key, lambda: self._fetch_entity(query), endpoint="get_entity")
         return None
-
+    
+    async def _fetch_entity(self, query: str):
+        try:
+            entity = await self.client.get_entity(query)
+            result = {
+                "username": entity.username,
+                "first_name": getattr(entity, "first_name", None),
+                "last_name": getattr(entity, "last_name", None),
+                "id": entity.id,
+                "phone": getattr(entity, "phone", None),
+                "verified": getattr(entity, "verified", False),
+                "bot": getattr(entity, "bot", False)
+            }
+            return result
+        except ValueError:
+            return self.not_found()
+        except Exception as e:
+            logger.error(f"Telegram search error: {e}")
+            return self.transient_error()
@@ -9,7 +9,7 @@ logger = logging.getLogger(__name__)
 
 class TwitterClient(BaseAPIClient):
     def __init__(self):
-        super().__init__("twitter", rate_limit=300)
+        super().__init__("twitter", rate_limit=300, credential=settings.API_KEY_X)
         self.api_key = settings.API_KEY_X
         self.api_secret = settings.API_KEY_SECRET_X
         self.client_v2 = None
@@ -28,23 +28,22 @@ class TwitterClient(BaseAPIClient):
         await self._init_client()
         
         if query_type == "email":
-            cache_key = f"twitter:email:{query}"
+            cache_key = self.cache_key("email", query)
             return await self._search_by_email(query, cache_key)
         elif query_type == "username":
-            cache_key = f"twitter:username:{query}"
+            cache_key = self.cache_key("username", query)
             return await self._search_by_username(query, cache_key)
         elif query_type == "name":
-            cache_key = f"twitter:name:{query}"
+            cache_key = self.cache_key("name", query)
             return await self._search_by_name(query, cache_key)
         elif query_type == "phone":
             return None
         return None
     
     async def _search_by_username(self, username: str, cache_key: str) -> Optional[Dict[str, Any]]:
-        cached = await cache_manager.get(cache_key)
-        if cached:
-            return cached
-            
+        return await self._cached_call(cache_key, lambda: self._fetch_user(username), endpoint="users/by/username")
+    
+    async def _fetch_user(self, username: str):
         try:
             loop = asyncio.get_event_loop()
             user = await loop.run_in_executor(
@@ -71,20 +70,19 @@ class TwitterClient(BaseAPIClient):
                     "recent_tweets": [{"text": t.text, "created_at": str(t.created_at), "likes": t.public_metrics.get("like_count", 0) if hasattr(t, "public_metrics") else 0} for t in (tweets.data or [])] if tweets.data else []
                 }
                 
-                await cache_manager.set(cache_key, result, self.cache_ttl)
                 return result
+            return self.not_found()
         except Exception as e:
             logger.error(f"Twitter search error: {e}")
-        return None
+            return self.transient_error()
     
     async def _search_by_email(self, email: str, cache_key: str) -> Optional[Dict[str, Any]]:
         return None
     
     async def _search_by_name(self, name: str, cache_key: str) -> Optional[Dict[str, Any]]:
-        cached = await cache_manager.get(cache_key)
-        if cached:
-            return cached
-            
+        return await self._cached_call(cache_key, lambda: self._fetch_users_by_name(name), endpoint="users/search")
+    
+    async def _fetch_users_by_name(self, name: str):
         try:
             loop = asyncio.get_event_loop()
             try:
@@ -94,7 +92,7 @@ class TwitterClient(BaseAPIClient):
                 )
             except Exception as search_error:
                 logger.warning(f"Twitter search_users failed, trying alternative: {search_error}")
-                return None
+                return self.transient_error()
             
             if users and hasattr(users, 'data') and users.data:
                 results = []
@@ -116,9 +114,9 @@ class TwitterClient(BaseAPIClient):
                 
                 if results:
                     result_data = {"users": results, "count": len(results)}
-                    await cache_manager.set(cache_key, result_data, self.cache_ttl)
                     return result_data
+            return self.not_found()
         except Exception as e:
             logger.error(f"Twitter name search error: {e}")
-        return None
+            return self.transient_error()
 
@@ -4,13 +4,13 @@ from config import settings
 
 class VirusTotalClient(BaseAPIClient):
     def __init__(self):
-        super().__init__("virustotal", rate_limit=4)
+        super().__init__("virustotal", rate_limit=4, credential=settings.VIRUSTOTAL_API_KEY)
         self.api_key = settings.VIRUSTOTAL_API_KEY
         self.base_url = "https://www.virustotal.com/vtapi/v2"
         
     async def search(self, query: str, query_type: str) -> Optional[Dict[str, Any]]:
         if query_type == "email":
-            cache_key = f"virustotal:email:{query}"
+            cache_key = self.cache_key("email", query)
             url = f"{self.base_url}/domain/report"
             params = {
                 "apikey": self.api_key,
@@ -18,7 +18,7 @@ class VirusTotalClient(BaseAPIClient):
             }
             return await self._make_request("GET", url, cache_key, params=params)
         elif query_type == "username":
-            cache_key = f"virustotal:url:{query}"
+            cache_key = self.cache_key("url", query)
             url = f"{self.base_url}/url/report"
             params = {
                 "apikey": self.api_key,
@@ -1,134 +1,776 @@
 import redis.asyncio as redis
-import json
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+import asyncio
 import hashlib
+import math
+import random
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime, timedelta
-from typing import Optional, Any, Dict
+from typing import Optional, Any, Dict, List, Tuple, Iterable
 from config import settings
+from utils.cache_codec import CacheCodec
+from utils.sharded_redis import ShardedRedis
 import logging
 
 logger = logging.getLogger(__name__)
 
+def make_cache_key(prefix: str, query_type: str, query: str, *suffix: str) -> str:
+    """Build a cache key whose {query} hash tag keeps every source's entry for one query on the same Redis node"""
+    return ":".join([prefix, query_type, f"{{{query}}}", *suffix])
+
+CACHE_STATE_DISCONNECTED = "disconnected"
+CACHE_STATE_CONNECTING = "connecting"
+CACHE_STATE_CONNECTED = "connected"
+CACHE_STATE_DEGRADED = "degraded"
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+INCREMENT_EXISTING_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 1 then
+    return redis.call('incrby', KEYS[1], ARGV[1])
+end
+return false
+"""
+
+NEGATIVE_MARKER = "__negative__"
+
+class NegativeResult:
+    """Returned by a fetch function to cache a miss (not found or transient error) for ttl seconds.
+
+    shared=False marks a miss caused by this process's own state (e.g. a shed call);
+    it is returned to the caller but never cached.
+    """
+    def __init__(self, reason: str, ttl: int, shared: bool = True):
+        self.reason = reason
+        self.ttl = ttl
+        self.shared = shared
+
+def is_negative(value: Any) -> bool:
+    return isinstance(value, dict) and NEGATIVE_MARKER in value
+
+# Tags attached to every cache write made inside a cache_tag_scope, e.g. the
+# target of the search that triggered the API calls.
+scoped_cache_tags: ContextVar[Tuple[str, ...]] = ContextVar("scoped_cache_tags", default=())
+
+@contextmanager
+def cache_tag_scope(*tags: str):
+    token = scoped_cache_tags.set(scoped_cache_tags.get() + tuple(tags))
+    try:
+        yield
+    finally:
+        scoped_cache_tags.reset(token)
+
+# While set, get_or_set treats entries with less than this many seconds left as
+# due and refreshes them (used by the cache warmer to refresh ahead of expiry).
+refresh_ahead_window: ContextVar[float] = ContextVar("refresh_ahead_window", default=0.0)
+
+@contextmanager
+def cache_refresh_ahead(window: float):
+    token = refresh_ahead_window.set(window)
+    try:
+        yield
+    finally:
+        refresh_ahead_window.reset(token)
+
+CONNECTION_ERRORS = (RedisConnectionError, RedisTimeoutError, ConnectionError, OSError, asyncio.TimeoutError)
+
+class LocalCache:
+    """Bounded in-process LRU used while Redis is unreachable"""
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+    
+    def set(self, key: str, value: Any, ttl: int):
+        self.entries[key] = (value, time.monotonic() + ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+    
+    def delete(self, key: str):
+        self.entries.pop(key, None)
+    
+    def increment(self, key: str, amount: int = 1, ttl: int = 3600) -> int:
+        value = (self.get(key) or 0) + amount
+        self.set(key, value, ttl)
+        return value
+    
+    def clear(self):
+        self.entries.clear()
+
+class CacheBatcher:
+    """Coalesces concurrent single-key gets and sets into one pipeline per window"""
+    def __init__(self, manager: "CacheManager", window: float, max_batch: int = 256):
+        self.manager = manager
+        self.window = window
+        self.max_batch = max_batch
+        self.pending_gets: Dict[str, List[asyncio.Future]] = {}
+        self.pending_sets: List[Tuple[str, bytes, int, asyncio.Future]] = []
+        self.flush_task: Optional[asyncio.Task] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        
+    def _bind_loop(self) -> asyncio.AbstractEventLoop:
+        # Celery tasks each run in a fresh event loop; futures and the flush task from a finished loop are dropped
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.pending_gets = {}
+            self.pending_sets = []
+            self.flush_task = None
+        return loop
+    
+    async def get(self, key: str) -> Optional[Any]:
+        future = self._bind_loop().create_future()
+        self.pending_gets.setdefault(key, []).append(future)
+        self._schedule()
+        return await future
+    
+    async def set(self, key: str, data: bytes, ttl: int):
+        future = self._bind_loop().create_future()
+        self.pending_sets.append((key, data, ttl, future))
+        self._schedule()
+        await future
+    
+    def _flush_pending(self) -> bool:
+        return self.flush_task is not None and not self.flush_task.done()
+    
+    def _schedule(self):
+        if len(self.pending_gets) + len(self.pending_sets) >= self.max_batch:
+            if self._flush_pending():
+                self.flush_task.cancel()
+            self.flush_task = None
+            self.loop.create_task(self._flush())
+        elif not self._flush_pending():
+            self.flush_task = self.loop.create_task(self._flush_after_window())
+    
+    def reset(self):
+        """Drop pending work and forget the loop; called when the owning event loop is about to close"""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if self._flush_pending() and self.flush_task.get_loop() is running:
+            self.flush_task.cancel()
+        for futures in self.pending_gets.values():
+            for future in futures:
+                if not future.done() and future.get_loop() is running:
+                    future.cancel()
+        for _, _, _, future in self.pending_sets:
+            if not future.done() and future.get_loop() is running:
+                future.cancel()
+        self.pending_gets = {}
+        self.pending_sets = []
+        self.flush_task = None
+        self.loop = None
+    
+    async def _flush_after_window(self):
+        await asyncio.sleep(self.window)
+        self.flush_task = None
+        await self._flush()
+    
+    async def _flush(self):
+        gets, self.pending_gets = self.pending_gets, {}
+        sets, self.pending_sets = self.pending_sets, []
+        if not gets and not sets:
+            return
+        
+        keys = list(gets.keys())
+        values: List[Optional[bytes]] = [None] * len(keys)
+        try:
+            async with self.manager.redis_client.pipeline(transaction=False) as pipe:
+                for key, data, ttl, _ in sets:
+                    pipe.setex(key, ttl, data)
+                for key in keys:
+                    pipe.get(key)
+                results = await pipe.execute()
+            values = results[len(sets):]
+        except Exception as e:
+            self.manager._on_error(e)
+            logger.error(f"Cache batch flush error: {e}")
+        
+        for _, _, _, future in sets:
+            if not future.done():
+                future.set_result(None)
+        for key, data in zip(keys, values):
+            try:
+                value = self.manager.codec.decode(data) if data else None
+            except Exception as e:
+                logger.error(f"Cache decode error for {key}: {e}")
+                value = None
+            for future in gets[key]:
+                if not future.done():
+                    future.set_result(value)
+
 class CacheManager:
     def __init__(self):
         self.redis_client: Optional[redis.Redis] = None
+        self.batcher: Optional[CacheBatcher] = None
+        if settings.CACHE_BATCH_WINDOW_MS > 0:
+            self.batcher = CacheBatcher(self, settings.CACHE_BATCH_WINDOW_MS / 1000.0, settings.CACHE_BATCH_MAX_SIZE)
+        self.codec = CacheCodec(
+            serializer=settings.CACHE_SERIALIZER,
+            compression=settings.CACHE_COMPRESSION,
+            compression_threshold=settings.CACHE_COMPRESSION_THRESHOLD,
+            compression_level=settings.CACHE_COMPRESSION_LEVEL
+        )
+        self.local = LocalCache(settings.CACHE_LOCAL_MAX_ENTRIES)
+        self.state = CACHE_STATE_DISCONNECTED
+        self.degraded_since: Optional[float] = None
+        self.reconnect_attempts = 0
+        self.next_reconnect_at: Optional[float] = None
+        self.reconnect_task: Optional[asyncio.Task] = None
+        self.l3 = None
         
+    def attach_l3(self, store):
+        self.l3 = store
+    
+    @property
+    def degraded(self) -> bool:
+        return self.state != CACHE_STATE_CONNECTED
+    
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "degraded_since": self.degraded_since,
+            "reconnect_attempts": self.reconnect_attempts,
+            "next_reconnect_in": max(0.0, self.next_reconnect_at - time.monotonic()) if self.next_reconnect_at else None,
+            "local_entries": len(self.local.entries)
+        }
+    
+    async def _open_client(self):
+        options = {
+            "decode_responses": False,
+            "max_connections": 50,
+            "socket_connect_timeout": 2,
+            "socket_timeout": settings.CACHE_SOCKET_TIMEOUT
+        }
+        nodes = [node.strip() for node in settings.REDIS_CACHE_NODES.split(",") if node.strip()]
+        url = nodes[0] if nodes else (settings.REDIS_CACHE_URL or settings.REDIS_URL)
+        mode = settings.REDIS_CACHE_MODE
+        if mode == "cluster":
+            from redis.asyncio.cluster import RedisCluster
+            client = RedisCluster.from_url(url, **options)
+            await client.initialize()
+        elif mode == "sharded":
+            client = ShardedRedis.from_urls(nodes or [url], settings.REDIS_CACHE_RING_REPLICAS, **options)
+        else:
+            client = await redis.from_url(url, **options)
+        await client.ping()
+        return client
+    
     async def connect(self):
         try:
-            self.redis_client = await redis.from_url(
-                settings.REDIS_URL,
-                encoding="utf-8",
-                decode_responses=True,
-                max_connections=50,
-                socket_connect_timeout=2
-            )
-            await self.redis_client.ping()
+            self.redis_client = await self._open_client()
+            self._mark_connected()
         except Exception as e:
-            logger.warning(f"Redis connection failed: {e}. Running without cache.")
+            logger.warning(f"Redis connection failed: {e}. Running in degraded mode.")
             self.redis_client = None
+            self._mark_degraded()
         
     async def disconnect(self):
+        """Close the client and forget loop-bound state; the next call reconnects in whatever loop is running then"""
+        if self.reconnect_task and not self.reconnect_task.done():
+            self.reconnect_task.cancel()
+        self.reconnect_task = None
+        if self.batcher:
+            self.batcher.reset()
         if self.redis_client:
-            await self.redis_client.close()
+            try:
+                await self.redis_client.close()
+            except Exception as e:
+                logger.error(f"Redis close error: {e}")
+        self.redis_client = None
+        self.state = CACHE_STATE_DISCONNECTED
+    
+    def _mark_connected(self):
+        if self.state != CACHE_STATE_CONNECTED and self.degraded_since is not None:
+            logger.info(f"Redis connection restored after {time.monotonic() - self.degraded_since:.1f}s")
+        self.state = CACHE_STATE_CONNECTED
+        self.degraded_since = None
+        self.reconnect_attempts = 0
+        self.next_reconnect_at = None
+        self.local.clear()
+    
+    def _mark_degraded(self):
+        if self.state == CACHE_STATE_CONNECTED or self.degraded_since is None:
+            self.degraded_since = time.monotonic()
+            logger.warning("Cache entering degraded mode, serving from local cache")
+        self.state = CACHE_STATE_DEGRADED
+        self._ensure_reconnect_task()
+    
+    def _on_error(self, error: Exception):
+        if isinstance(error, CONNECTION_ERRORS):
+            self._mark_degraded()
+    
+    def _ensure_reconnect_task(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self.reconnect_task and not self.reconnect_task.done() and self.reconnect_task.get_loop() is loop:
+            return
+        self.reconnect_task = loop.create_task(self._reconnect_loop())
+    
+    async def _reconnect_loop(self):
+        while self.state != CACHE_STATE_CONNECTED:
+            delay = min(
+                settings.CACHE_RECONNECT_MAX_DELAY,
+                settings.CACHE_RECONNECT_BASE_DELAY * (2 ** self.reconnect_attempts)
+            )
+            delay = delay * (0.5 + random.random() / 2)
+            self.next_reconnect_at = time.monotonic() + delay
+            await asyncio.sleep(delay)
+            self.reconnect_attempts += 1
+            try:
+                client = await self._open_client()
+            except Exception as e:
+                logger.debug(f"Redis reconnect attempt {self.reconnect_attempts} failed: {e}")
+                continue
+            old_client, self.redis_client = self.redis_client, client
+            self._mark_connected()
+            if old_client is not None:
+                try:
+                    await old_client.close()
+                except Exception:
+                    pass
+    
+    async def _available(self) -> bool:
+        if self.state == CACHE_STATE_CONNECTED and self.redis_client is not None:
+            return True
+        if self.state == CACHE_STATE_DISCONNECTED:
+            self.state = CACHE_STATE_CONNECTING
+            await self.connect()
+            return self.state == CACHE_STATE_CONNECTED
+        if self.state == CACHE_STATE_DEGRADED:
+            self._ensure_reconnect_task()
+        return False
             
     def _generate_key(self, prefix: str, *args) -> str:
         key_str = ":".join(str(arg) for arg in args)
         normalized = key_str.lower().strip()
         return f"{prefix}:{normalized}"
     
-    async def get(self, key: str) -> Optional[Any]:
-        if not self.redis_client:
-            try:
-                await self.connect()
-            except:
-                return None
-        if not self.redis_client:
+    async def get(self, key: str, include_negative: bool = False) -> Optional[Any]:
+        value = await self._get(key)
+        if not include_negative and is_negative(value):
             return None
+        return value
+    
+    async def _get(self, key: str) -> Optional[Any]:
+        if not await self._available():
+            return self.local.get(key)
+        if self.batcher:
+            return await self.batcher.get(key)
         try:
             data = await self.redis_client.get(key)
             if data:
-                return json.loads(data)
+                return self.codec.decode(data)
         except Exception as e:
+            self._on_error(e)
             logger.error(f"Cache get error: {e}")
         return None
     
-    async def set(self, key: str, value: Any, ttl: int = 3600):
-        if not self.redis_client:
-            await self.connect()
+    def _tag_key(self, tag: str) -> str:
+        return f"tags:{tag.lower().strip()}"
+    
+    def _resolve_tags(self, tags: Optional[Iterable[str]]) -> List[str]:
+        resolved = list(scoped_cache_tags.get())
+        if tags:
+            resolved.extend(tags)
+        return list(dict.fromkeys(tag for tag in resolved if tag))
+    
+    def _add_tags(self, pipe, keys: List[str], tags: List[str], ttl: int):
+        # Members are scored by when their key expires, so each write also drops the ones that already have
+        now = time.time()
+        for tag in tags:
+            tag_key = self._tag_key(tag)
+            pipe.zremrangebyscore(tag_key, "-inf", now)
+            pipe.zadd(tag_key, {key: now + ttl for key in keys})
+            pipe.expire(tag_key, max(ttl, settings.CACHE_TAG_TTL))
+    
+    async def set(self, key: str, value: Any, ttl: int = 3600, tags: Optional[Iterable[str]] = None):
+        if not await self._available():
+            self.local.set(key, value, ttl)
+            return
+        tags = self._resolve_tags(tags)
         try:
+            if tags:
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    pipe.setex(key, ttl, self.codec.encode(value))
+                    self._add_tags(pipe, [key], tags, ttl)
+                    await pipe.execute()
+                return
+            if self.batcher:
+                await self.batcher.set(key, self.codec.encode(value), ttl)
+                return
             await self.redis_client.setex(
                 key,
                 ttl,
-                json.dumps(value, default=str)
+                self.codec.encode(value)
             )
         except Exception as e:
+            self._on_error(e)
             logger.error(f"Cache set error: {e}")
     
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        if not keys:
+            return {}
+        if not await self._available():
+            values = {key: self.local.get(key) for key in keys}
+            return {key: value for key, value in values.items() if value is not None and not is_negative(value)}
+        try:
+            if settings.REDIS_CACHE_MODE == "cluster":
+                values = await self.redis_client.mget_nonatomic(keys)
+            else:
+                values = await self.redis_client.mget(keys)
+            decoded = {
+                key: self.codec.decode(data)
+                for key, data in zip(keys, values)
+                if data
+            }
+            return {key: value for key, value in decoded.items() if not is_negative(value)}
+        except Exception as e:
+            self._on_error(e)
+            logger.error(f"Cache get_many error: {e}")
+        return {}
+    
+    async def set_many(self, mapping: Dict[str, Any], ttl: int = 3600, ttls: Optional[Dict[str, int]] = None):
+        if not mapping:
+            return
+        ttls = ttls or {}
+        if not await self._available():
+            for key, value in mapping.items():
+                self.local.set(key, value, ttls.get(key, ttl))
+            return
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key, value in mapping.items():
+                    pipe.setex(key, ttls.get(key, ttl), self.codec.encode(value))
+                await pipe.execute()
+        except Exception as e:
+            self._on_error(e)
+            logger.error(f"Cache set_many error: {e}")
+    
     async def delete(self, key: str):
-        if not self.redis_client:
-            await self.connect()
+        self.local.delete(key)
+        if not await self._available():
+            return
         try:
             await self.redis_client.delete(key)
         except Exception as e:
+            self._on_error(e)
             logger.error(f"Cache delete error: {e}")
     
-    async def get_or_set(self, key: str, fetch_func, ttl: int = 3600) -> Any:
-        cached = await self.get(key)
-        if cached is not None:
+    async def delete_many(self, keys: List[str]):
+        if not keys:
+            return
+        for key in keys:
+            self.local.delete(key)
+        if not await self._available():
+            return
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.delete(key)
+                await pipe.execute()
+        except Exception as e:
+            self._on_error(e)
+            logger.error(f"Cache delete_many error: {e}")
+    
+    async def get_or_set(self, key: str, fetch_func, ttl: int = 3600, lock_timeout: Optional[float] = None, tags: Optional[Iterable[str]] = None, persist_as: Optional[str] = None,
+                         wait_timeout: Optional[float] = None) -> Any:
+        """lock_timeout is the rebuild lock's TTL; wait_timeout (default CACHE_LOCK_WAIT) caps how long a caller without the lock waits before fetching uncoordinated"""
+        l3 = self.l3 if persist_as else None
+        if not await self._available():
+            cached = self.local.get(key)
+            if cached is not None:
+                return None if is_negative(cached) else cached
+            if l3:
+                stored = await l3.get(key)
+                if stored is not None:
+                    self.local.set(key, stored[0], stored[1])
+                    return stored[0]
+            value = await fetch_func()
+            if isinstance(value, NegativeResult):
+                if value.shared:
+                    self.local.set(key, {NEGATIVE_MARKER: value.reason}, value.ttl)
+                return None
+            if value is not None:
+                self.local.set(key, value, ttl)
+                if l3:
+                    l3.put(key, persist_as, value, ttl)
+            return value
+        
+        cached, remaining, delta = await self._get_with_meta(key)
+        if is_negative(cached):
+            return None
+        if cached is not None and not self._should_recompute_early(remaining, delta):
             return cached
-        value = await fetch_func()
-        if value is not None:
-            await self.set(key, value, ttl)
-        return value
+        if cached is None and l3:
+            stored = await l3.get(key)
+            if stored is not None:
+                await self.set(key, stored[0], stored[1], tags=tags)
+                return stored[0]
+        
+        lock_timeout = lock_timeout or settings.CACHE_LOCK_TIMEOUT
+        lock_key = f"{key}:lock"
+        token = uuid.uuid4().hex
+        locked = await self._acquire_lock(lock_key, token, lock_timeout)
+        if not locked:
+            if cached is not None:
+                return cached
+            wait_timeout = settings.CACHE_LOCK_WAIT if wait_timeout is None else wait_timeout
+            fresh = await self._wait_for_value(key, lock_key, min(wait_timeout, lock_timeout))
+            if fresh is not None:
+                return None if is_negative(fresh) else fresh
+        
+        try:
+            start = time.monotonic()
+            value = await fetch_func()
+            if isinstance(value, NegativeResult):
+                if cached is None and value.shared:
+                    await self.set(key, {NEGATIVE_MARKER: value.reason}, value.ttl, tags=tags)
+                return cached
+            if value is not None:
+                await self._set_with_meta(key, value, ttl, time.monotonic() - start, tags)
+                if l3:
+                    l3.put(key, persist_as, value, ttl)
+                return value
+            return cached
+        finally:
+            if locked:
+                await self._release_lock(lock_key, token)
+    
+    def _should_recompute_early(self, remaining: Optional[float], delta: Optional[float]) -> bool:
+        # XFetch: recompute ahead of expiry with a probability that rises as the
+        # remaining TTL approaches the time the value took to compute.
+        window = refresh_ahead_window.get()
+        if window and remaining is not None and remaining <= window:
+            return True
+        if remaining is None or not delta:
+            return False
+        return -delta * settings.CACHE_XFETCH_BETA * math.log(1.0 - random.random()) >= remaining
+    
+    async def _get_with_meta(self, key: str) -> Tuple[Optional[Any], Optional[float], Optional[float]]:
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.get(key)
+                pipe.pttl(key)
+                pipe.get(f"{key}:xf")
+                data, pttl, delta = await pipe.execute()
+            if not data:
+                return None, None, None
+            remaining = pttl / 1000.0 if pttl and pttl > 0 else None
+            return self.codec.decode(data), remaining, float(delta) if delta else None
+        except Exception as e:
+            self._on_error(e)
+            logger.error(f"Cache get error: {e}")
+        return None, None, None
+    
+    async def _set_with_meta(self, key: str, value: Any, ttl: int, delta: float, tags: Optional[Iterable[str]] = None):
+        tags = self._resolve_tags(tags)
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.setex(key, ttl, self.codec.encode(value))
+                pipe.setex(f"{key}:xf", ttl, f"{delta:.4f}")
+                self._add_tags(pipe, [key, f"{key}:xf"], tags, ttl)
+                await pipe.execute()
+        except Exception as e:
+            self._on_error(e)
+            logger.error(f"Cache set error: {e}")
+    
+    async def _acquire_lock(self, lock_key: str, token: str, timeout: float) -> bool:
+        try:
+            return bool(await self.redis_client.set(lock_key, token, nx=True, px=int(timeout * 1000)))
+        except Exception as e:
+            self._on_error(e)
+            logger.error(f"Cache lock error: {e}")
+            return True
+    
+    async def _release_lock(self, lock_key: str, token: str):
+        if not await self._available():
+            return
+        try:
+            await self.redis_client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+        except Exception as e:
+            self._on_error(e)
+            logger.error(f"Cache unlock error: {e}")
+    
+    async def _wait_for_value(self, key: str, lock_key: str, timeout: float) -> Optional[Any]:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(settings.CACHE_LOCK_POLL_INTERVAL)
+            if not await self._available():
+                return None
+            try:
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    pipe.get(key)
+                    pipe.exists(lock_key)
+                    data, lock_held = await pipe.execute()
+            except Exception as e:
+                self._on_error(e)
+                return None
+            if data:
+                return self.codec.decode(data)
+            if not lock_held:
+                return None
+        return None
+    
+    async def ttl(self, key: str) -> Optional[float]:
+        if not await self._available():
+            return None
+        try:
+            pttl = await self.redis_client.pttl(key)
+            return pttl / 1000.0 if pttl and pttl > 0 else None
+        except Exception as e:
+            self._on_error(e)
+            logger.error(f"Cache ttl error: {e}")
+        return None
+    
+    async def invalidate_tag(self, tag: str) -> int:
+        if not await self._available():
+            return 0
+        tag_key = self._tag_key(tag)
+        removed = 0
+        try:
+            chunk: List[bytes] = []
+            async for member, _ in self.redis_client.zscan_iter(tag_key, count=settings.CACHE_INVALIDATE_CHUNK):
+                chunk.append(member)
+                if len(chunk) >= settings.CACHE_INVALIDATE_CHUNK:
+                    removed += await self._unlink_chunk(chunk)
+                    chunk = []
+            if chunk:
+                removed += await self._unlink_chunk(chunk)
+            await self.redis_client.unlink(tag_key)
+        except Exception as e:
+            self._on_error(e)
+            logger.error(f"Cache tag invalidate error: {e}")
+        return removed
+    
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        removed = 0
+        for tag in tags:
+            removed += await self.invalidate_tag(tag)
+        return removed
+    
+    async def _unlink_chunk(self, keys: List[Any]) -> int:
+        # One UNLINK per key keeps the pipeline valid when keys live in different cluster slots
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.unlink(key)
+            results = await pipe.execute()
+        return sum(result or 0 for result in results)
     
     async def invalidate_pattern(self, pattern: str):
-        if not self.redis_client:
-            await self.connect()
+        if not await self._available():
+            return
         try:
-            keys = []
-            async for key in self.redis_client.scan_iter(match=pattern):
-                keys.append(key)
-            if keys:
-                await self.redis_client.delete(*keys)
+            chunk = []
+            async for key in self.redis_client.scan_iter(match=pattern, count=settings.CACHE_INVALIDATE_CHUNK):
+                chunk.append(key)
+                if len(chunk) >= settings.CACHE_INVALIDATE_CHUNK:
+                    await self._unlink_chunk(chunk)
+                    chunk = []
+            if chunk:
+                await self._unlink_chunk(chunk)
         except Exception as e:
+            self._on_error(e)
             logger.error(f"Cache invalidate error: {e}")
     
     async def increment(self, key: str, amount: int = 1) -> int:
-        if not self.redis_client:
-            await self.connect()
+        if not await self._available():
+            return self.local.increment(key, amount)
         try:
             return await self.redis_client.incrby(key, amount)
         except Exception as e:
+            self._on_error(e)
             logger.error(f"Cache increment error: {e}")
             return 0
     
+    async def increment_existing(self, key: str, amount: int = 1) -> Optional[int]:
+        """INCRBY only when the counter is already initialised, so a lost key is never restarted from zero"""
+        if not await self._available():
+            return None
+        try:
+            return await self.redis_client.eval(INCREMENT_EXISTING_SCRIPT, 1, key, amount)
+        except Exception as e:
+            self._on_error(e)
+            logger.error(f"Cache increment error: {e}")
+            return None
+    
+    async def run_script(self, script: str, keys: List[str], args: List[Any]) -> Any:
+        """EVAL a Lua script; None when Redis is unavailable so callers can fall back to local state"""
+        if not await self._available():
+            return None
+        try:
+            return await self.redis_client.eval(script, len(keys), *keys, *args)
+        except Exception as e:
+            self._on_error(e)
+            logger.error(f"Cache script error: {e}")
+            return None
+    
+    async def set_counter(self, key: str, value: int, only_if_missing: bool = False) -> bool:
+        if not await self._available():
+            return False
+        try:
+            return bool(await self.redis_client.set(key, int(value), nx=only_if_missing))
+        except Exception as e:
+            self._on_error(e)
+            logger.error(f"Cache set counter error: {e}")
+            return False
+    
     async def set_hash(self, key: str, field: str, value: Any):
-        if not self.redis_client:
-            await self.connect()
+        if not await self._available():
+            return
         try:
-            await self.redis_client.hset(key, field, json.dumps(value, default=str))
+            await self.redis_client.hset(key, field, self.codec.encode(value))
         except Exception as e:
+            self._on_error(e)
             logger.error(f"Cache hash set error: {e}")
     
     async def get_hash(self, key: str, field: str) -> Optional[Any]:
-        if not self.redis_client:
-            await self.connect()
+        if not await self._available():
+            return None
         try:
             data = await self.redis_client.hget(key, field)
             if data:
-                return json.loads(data)
+                return self.codec.decode(data)
         except Exception as e:
+            self._on_error(e)
             logger.error(f"Cache hash get error: {e}")
         return None
     
     async def get_all_hash(self, key: str) -> Dict[str, Any]:
-        if not self.redis_client:
-            await self.connect()
+        if not await self._available():
+            return {}
         try:
             data = await self.redis_client.hgetall(key)
-            return {k: json.loads(v) for k, v in data.items()}
+            return {
+                (k.decode("utf-8") if isinstance(k, bytes) else k): self.codec.decode(v)
+                for k, v in data.items()
+            }
         except Exception as e:
+            self._on_error(e)
             logger.error(f"Cache hash get all error: {e}")
             return {}
 
 cache_manager = CacheManager()
-
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Optional, Dict
 import os
 
 class Settings(BaseSettings):
@@ -46,10 +46,46 @@ class Settings(BaseSettings):
     REDDIT_USER_AGENT: str = "OSINT/1.0 by YourAppName"
     
     DATABASE_URL: str = "sqlite+aiosqlite:///./osint.db"
+    SQLITE_WAL: bool = True
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 268435456
+    SQLITE_CACHE_SIZE_KB: int = 65536
+    SQLITE_READ_POOL_SIZE: int = 8
+    SQLITE_WRITE_TIMEOUT: float = 30.0
+    PROFILE_SOURCE_HISTORY: bool = False
+    PROFILE_SNAPSHOTS_ENABLED: bool = True
+    PROFILE_SNAPSHOT_REBASE_EVERY: int = 10
+    PROFILE_SNAPSHOT_MAX_DELTA_RATIO: float = 0.5
+    PROFILE_RETENTION_DAYS: int = 90
+    SEARCH_INDEX_ENABLED: bool = True
+    SEARCH_INDEX_MAX_TEXT: int = 20000
+    PROFILES_PARTITIONED: bool = False
+    PROFILE_PARTITION_PREMAKE_MONTHS: int = 3
+    RETENTION_BATCH_SIZE: int = 1000
+    RETENTION_BATCH_PAUSE: float = 0.05
+    PERSISTENCE_FLUSH_INTERVAL: float = 0.5
+    PERSISTENCE_BATCH_SIZE: int = 200
+    
+    METRICS_BUFFER_SIZE: int = 10000
+    METRICS_FLUSH_INTERVAL: float = 5.0
+    METRICS_BATCH_SIZE: int = 1000
+    METRICS_ROLLUP_GRACE: int = 120
+    METRICS_RAW_RETENTION_HOURS: int = 24
+    METRICS_ROLLUP_RETENTION_DAYS: int = 30
+    
     REDIS_URL: str = "redis://localhost:6379/0"
+    # Cache topology: "single" (REDIS_CACHE_URL or REDIS_URL), "cluster" (Redis Cluster
+    # seed node) or "sharded" (client-side consistent hashing over REDIS_CACHE_NODES)
+    REDIS_CACHE_MODE: str = "single"
+    REDIS_CACHE_URL: str = ""
+    REDIS_CACHE_NODES: str = ""
+    REDIS_CACHE_RING_REPLICAS: int = 128
     
     CELERY_BROKER_URL: str = "redis://localhost:6379/1"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/2"
+    # The Redis broker redelivers a task not acknowledged within this many seconds, ETA tasks included
+    CELERY_VISIBILITY_TIMEOUT: int = 3600
     
     JWT_SECRET_KEY: str = "your-secret-key-change-in-production"
     JWT_ALGORITHM: str = "HS256"
@@ -57,14 +93,80 @@ class Settings(BaseSettings):
     
     API_TIMEOUT: int = 30
     MAX_CONCURRENT_REQUESTS: int = 50
+    ADMISSION_MAX_QUEUE: int = 200
+    BULKHEAD_API_CONCURRENCY: int = 8
+    BULKHEAD_API_LIMITS: Dict[str, int] = {"telegram": 2, "instagram_scraper": 4}
+    BULKHEAD_MAX_QUEUE: int = 50
+    BULKHEAD_QUEUE_TIMEOUT: float = 5.0
+    SEARCH_CONCURRENCY_BUDGET: int = 8
     CACHE_TTL_SOCIAL: int = 3600
     CACHE_TTL_EMAIL: int = 86400
     CACHE_TTL_BLOCKCHAIN: int = 900
     CACHE_TTL_NEWS: int = 3600
+    CACHE_TTL_NOT_FOUND: int = 21600
+    CACHE_TTL_TRANSIENT_ERROR: int = 60
+    CACHE_NEGATIVE_JITTER: float = 0.25
+    
+    CACHE_SERIALIZER: str = "auto"
+    CACHE_COMPRESSION: str = "auto"
+    CACHE_COMPRESSION_THRESHOLD: int = 1024
+    CACHE_COMPRESSION_LEVEL: int = 3
+    CACHE_BATCH_WINDOW_MS: float = 2.0
+    CACHE_BATCH_MAX_SIZE: int = 256
+    CACHE_SOCKET_TIMEOUT: float = 1.0
+    CACHE_RECONNECT_BASE_DELAY: float = 0.5
+    CACHE_RECONNECT_MAX_DELAY: float = 30.0
+    CACHE_LOCAL_MAX_ENTRIES: int = 2048
+    CACHE_XFETCH_BETA: float = 1.0
+    CACHE_LOCK_TIMEOUT: float = 15.0
+    CACHE_LOCK_POLL_INTERVAL: float = 0.1
+    CACHE_LOCK_WAIT: float = 5.0
+    CACHE_TAG_TTL: int = 86400
+    CACHE_INVALIDATE_CHUNK: int = 500
+    
+    CACHE_L3_ENABLED: bool = True
+    CACHE_L3_FLUSH_INTERVAL: float = 5.0
+    CACHE_L3_BATCH_SIZE: int = 500
+    CACHE_L3_SWEEP_INTERVAL: float = 3600.0
+    CACHE_L3_WARMUP_KEYS: int = 1000
+    
+    CACHE_WARM_ON_STARTUP: bool = True
+    CACHE_WARM_INTERVAL: float = 600.0
+    CACHE_WARM_TOP_N: int = 50
+    CACHE_WARM_LOOKBACK_DAYS: int = 7
+    CACHE_WARM_REFRESH_WINDOW: float = 900.0
+    CACHE_WARM_RATE_LIMIT_SHARE: float = 0.2
+    CACHE_WARM_CALLS_PER_PROFILE: int = 4
     
     RATE_LIMIT_PER_MINUTE: int = 60
+    RATE_LIMIT_DISTRIBUTED: bool = True
+    RATE_LIMIT_LEASE_SIZE: int = 5
+    RATE_LIMIT_LEASE_TTL: float = 2.0
+    RATE_LIMIT_DEFAULT_BACKOFF: float = 30.0
+    RATE_LIMIT_MAX_BACKOFF: float = 3600.0
+    
+    # Upstream call quotas per API and period ("day" / "month"), e.g. free-tier plan caps
+    QUOTA_ENABLED: bool = True
+    API_QUOTAS: Dict[str, Dict[str, int]] = {
+        "newsapi": {"day": 100},
+        "virustotal": {"day": 500, "month": 15500},
+        "hunter": {"month": 50},
+        "numverify": {"month": 100}
+    }
+    QUOTA_INTERACTIVE_RESERVE: float = 0.2
+    QUOTA_BATCH_BURST: float = 0.05
+    # Longest single countdown for a deferred refresh; kept below CELERY_VISIBILITY_TIMEOUT, longer waits are re-deferred
+    QUOTA_DEFER_MAX_COUNTDOWN: int = 3000
+    # Minimum calls in the window before the error / slow-call rates can trip the breaker
     CIRCUIT_BREAKER_THRESHOLD: int = 5
     CIRCUIT_BREAKER_TIMEOUT: int = 60
+    CIRCUIT_BREAKER_DISTRIBUTED: bool = True
+    CIRCUIT_BREAKER_WINDOW: float = 60.0
+    CIRCUIT_BREAKER_BUCKET: float = 5.0
+    CIRCUIT_BREAKER_FAILURE_RATE: float = 0.5
+    CIRCUIT_BREAKER_SLOW_RATE: float = 0.8
+    CIRCUIT_BREAKER_SLOW_CALL: float = 4.0
+    CIRCUIT_BREAKER_HALF_OPEN_PROBES: int = 3
     
     ENABLE_WEBSOCKET: bool = True
     WEBSOCKET_PORT: int = 8765
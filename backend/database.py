@@ -1,19 +1,56 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from sqlalchemy import Column, String, Integer, DateTime, Text, JSON, Boolean, Float, Index
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import event, text, MetaData, PrimaryKeyConstraint, Column, String, Integer, DateTime, Text, JSON, Boolean, Float, Index, UniqueConstraint
 from datetime import datetime
 from config import settings
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 db_url = settings.DATABASE_URL
-if db_url.startswith("sqlite"):
+is_sqlite = db_url.startswith("sqlite")
+sqlite_file = is_sqlite and ":memory:" not in db_url
+
+def configure_sqlite_connection(dbapi_connection, read_only: bool = False):
+    cursor = dbapi_connection.cursor()
+    if settings.SQLITE_WAL:
+        cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    if read_only:
+        cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+if is_sqlite:
     connect_args = {"check_same_thread": False}
-    engine = create_async_engine(db_url, echo=False, connect_args=connect_args)
+    if sqlite_file:
+        # SQLite allows one writer at a time: all writes share a single pooled
+        # connection (the persistence queue batches most of them) while reads
+        # use a separate pool of query-only connections, which WAL lets run
+        # concurrently with the writer.
+        engine = create_async_engine(db_url, echo=False, connect_args=connect_args, poolclass=AsyncAdaptedQueuePool, pool_size=1, max_overflow=0, pool_timeout=settings.SQLITE_WRITE_TIMEOUT)
+        read_engine = create_async_engine(db_url, echo=False, connect_args=connect_args, poolclass=AsyncAdaptedQueuePool, pool_size=settings.SQLITE_READ_POOL_SIZE, max_overflow=0)
+        event.listen(read_engine.sync_engine, "connect", lambda dbapi_connection, record: configure_sqlite_connection(dbapi_connection, read_only=True))
+    else:
+        engine = create_async_engine(db_url, echo=False, connect_args=connect_args)
+        read_engine = engine
+    event.listen(engine.sync_engine, "connect", lambda dbapi_connection, record: configure_sqlite_connection(dbapi_connection))
 else:
     engine = create_async_engine(db_url, echo=False, pool_size=20, max_overflow=40)
+    read_engine = engine
 AsyncSessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+ReadSessionLocal = async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False) if read_engine is not engine else AsyncSessionLocal
 Base = declarative_base()
 
+# JSONB on Postgres so documents can be GIN/expression indexed; plain JSON elsewhere
+JSONDocument = JSON().with_variant(JSONB(), "postgresql")
+
 class Profile(Base):
     __tablename__ = "profiles"
     
@@ -22,13 +59,69 @@ class Profile(Base):
     query_type = Column(String(50), index=True)
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    data = Column(JSON)
+    data = Column(JSONDocument)
     correlation_score = Column(Float, default=0.0)
     status = Column(String(50), default="pending")
     
     __table_args__ = (
         Index('idx_query_type', 'query', 'query_type'),
         Index('idx_created_at', 'created_at'),
+        Index('idx_created_at_id', 'created_at', 'id'),
+        Index('idx_profiles_data', 'data', postgresql_using='gin', postgresql_ops={'data': 'jsonb_path_ops'}).ddl_if(dialect='postgresql'),
+    )
+
+class ProfileSourceResult(Base):
+    __tablename__ = "profile_source_results"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    profile_id = Column(Integer, nullable=False)
+    source = Column(String(100), nullable=False)
+    data = Column(JSONDocument)
+    content_hash = Column(String(64))
+    version = Column(Integer, default=1)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint('profile_id', 'source', name='uq_profile_source'),
+        Index('idx_source_results_profile', 'profile_id'),
+        Index('idx_source_results_data', 'data', postgresql_using='gin', postgresql_ops={'data': 'jsonb_path_ops'}).ddl_if(dialect='postgresql'),
+    )
+
+class ProfileSnapshot(Base):
+    __tablename__ = "profile_snapshots"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    profile_id = Column(Integer)
+    version = Column(Integer)
+    kind = Column(String(10))
+    payload = Column(JSONDocument)
+    content_hash = Column(String(64))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint('profile_id', 'version', name='uq_profile_snapshot_version'),
+    )
+
+# Expression indexes for the paths the triage filters use; Postgres only
+PROFILE_RISK_LEVEL = Profile.data[("analysis", "risk_assessment", "level")].as_string()
+PROFILE_CONFIDENCE = Profile.data[("analysis", "confidence_score")].as_float()
+Index('idx_profiles_risk_level', PROFILE_RISK_LEVEL).ddl_if(dialect='postgresql')
+Index('idx_profiles_confidence', PROFILE_CONFIDENCE).ddl_if(dialect='postgresql')
+
+class ProfileSourceHistory(Base):
+    __tablename__ = "profile_source_history"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    profile_id = Column(Integer, nullable=False)
+    source = Column(String(100), nullable=False)
+    version = Column(Integer, nullable=False)
+    data = Column(JSONDocument)
+    content_hash = Column(String(64))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index('idx_source_history_lookup', 'profile_id', 'source', 'version'),
     )
 
 class APICache(Base):
@@ -68,6 +161,21 @@ class Correlation(Base):
         Index('idx_source_target', 'source_id', 'target_id'),
     )
 
+class ProfileEntity(Base):
+    __tablename__ = "profile_entities"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    profile_id = Column(Integer)
+    entity_type = Column(String(50))
+    value = Column(String(255))
+    source = Column(String(100))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index('idx_entity_lookup', 'entity_type', 'value'),
+        Index('idx_entity_profile', 'profile_id'),
+    )
+
 class APIMetric(Base):
     __tablename__ = "api_metrics"
     
@@ -85,9 +193,126 @@ class APIMetric(Base):
         Index('idx_timestamp', 'timestamp'),
     )
 
+class APIMetricRollup(Base):
+    __tablename__ = "api_metric_rollups"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    api_name = Column(String(100))
+    bucket = Column(DateTime)
+    count = Column(Integer, default=0)
+    error_count = Column(Integer, default=0)
+    error_rate = Column(Float, default=0.0)
+    p50 = Column(Float)
+    p95 = Column(Float)
+    p99 = Column(Float)
+    avg_response_time = Column(Float)
+    max_response_time = Column(Float)
+    
+    __table_args__ = (
+        UniqueConstraint('api_name', 'bucket', name='uq_rollup_api_bucket'),
+        Index('idx_rollup_bucket', 'bucket'),
+    )
+
+def month_start(value: datetime, offset: int = 0) -> datetime:
+    month = value.year * 12 + value.month - 1 + offset
+    return datetime(month // 12, month % 12 + 1, 1)
+
+def profile_partition_name(start: datetime) -> str:
+    return f"profiles_y{start.year}m{start.month:02d}"
+
+def partitioned_profiles_table():
+    """profiles as a RANGE (created_at) partitioned table; Postgres requires the partition key in the primary key"""
+    table = Profile.__table__.to_metadata(MetaData())
+    table.c.created_at.nullable = False
+    table.c.created_at.primary_key = True
+    table.c.id.autoincrement = True
+    table.append_constraint(PrimaryKeyConstraint("id", "created_at"))
+    table.dialect_kwargs["postgresql_partition_by"] = "RANGE (created_at)"
+    return table
+
+async def ensure_profile_partitions(conn, months_ahead: int = None):
+    months_ahead = settings.PROFILE_PARTITION_PREMAKE_MONTHS if months_ahead is None else months_ahead
+    now = datetime.utcnow()
+    for offset in range(-1, months_ahead + 1):
+        start = month_start(now, offset)
+        end = month_start(now, offset + 1)
+        await conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {profile_partition_name(start)} PARTITION OF profiles "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        ))
+    await conn.execute(text("CREATE TABLE IF NOT EXISTS profiles_default PARTITION OF profiles DEFAULT"))
+
+async def _create_partitioned_profiles(conn):
+    exists = (await conn.execute(text("SELECT to_regclass('profiles')"))).scalar()
+    if exists:
+        partitioned = (await conn.execute(text(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'profiles'::regclass"
+        ))).scalar()
+        if not partitioned:
+            logger.warning("PROFILES_PARTITIONED is set but the existing profiles table is not partitioned; it must be migrated manually")
+        return
+    table = partitioned_profiles_table()
+    await conn.run_sync(lambda sync_conn: table.create(sync_conn))
+
+async def _create_search_index(conn):
+    """profile_search full-text index: FTS5 on SQLite, tsvector + GIN on Postgres"""
+    dialect = engine.dialect.name
+    try:
+        async with conn.begin_nested():
+            if dialect == "sqlite":
+                await conn.execute(text(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS profile_search USING fts5("
+                    "profile_id UNINDEXED, query, entities, content, "
+                    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+                ))
+            elif dialect == "postgresql":
+                await conn.execute(text(
+                    "CREATE TABLE IF NOT EXISTS profile_search ("
+                    "profile_id INTEGER PRIMARY KEY, document TSVECTOR NOT NULL, updated_at TIMESTAMP DEFAULT now())"
+                ))
+                await conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS idx_profile_search_document ON profile_search USING GIN (document)"
+                ))
+    except Exception as e:
+        logger.warning(f"Full-text search index unavailable: {e}")
+
+JSONB_COLUMNS = [("profiles", "data"), ("profile_source_results", "data"), ("profile_source_history", "data")]
+
+async def _migrate_json_to_jsonb(conn):
+    """Convert json columns created before the JSONB variant and build their indexes"""
+    migrated = set()
+    for table_name, column in JSONB_COLUMNS:
+        data_type = (await conn.execute(text(
+            "SELECT data_type FROM information_schema.columns WHERE table_name = :table AND column_name = :column"
+        ), {"table": table_name, "column": column})).scalar()
+        if data_type == "json":
+            logger.info(f"Migrating {table_name}.{column} from json to jsonb")
+            await conn.execute(text(f"ALTER TABLE {table_name} ALTER COLUMN {column} TYPE JSONB USING {column}::jsonb"))
+            migrated.add(table_name)
+    if migrated:
+        def create_indexes(sync_conn):
+            for table in Base.metadata.sorted_tables:
+                if table.name in migrated:
+                    for index in table.indexes:
+                        index.create(sync_conn, checkfirst=True)
+        await conn.run_sync(create_indexes)
+
 async def init_db():
     async with engine.begin() as conn:
+        if engine.dialect.name == "postgresql" and settings.PROFILES_PARTITIONED:
+            await _create_partitioned_profiles(conn)
         await conn.run_sync(Base.metadata.create_all)
+        if engine.dialect.name == "postgresql":
+            await _migrate_json_to_jsonb(conn)
+        if engine.dialect.name == "postgresql" and settings.PROFILES_PARTITIONED:
+            await ensure_profile_partitions(conn)
+        await _create_search_index(conn)
+
+async def dispose_engines():
+    """Close pooled connections; pooled aiosqlite connections are bound to the event loop that opened them"""
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
 
 async def get_db():
     async with AsyncSessionLocal() as session:
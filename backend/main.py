@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, BackgroundTasks
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, BackgroundTasks, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
@@ -7,15 +7,28 @@ import asyncio
 import logging
 import uvicorn
 import time
+import base64
+from datetime import datetime
 from contextlib import asynccontextmanager
 
 from config import settings
-from database import init_db, Profile, AsyncSessionLocal
+from database import init_db, dispose_engines, Profile, AsyncSessionLocal, ReadSessionLocal
 from services.orchestrator import orchestrator
 from services.correlation import CorrelationEngine
 from utils.validators import validate_email, validate_phone, validate_username, validate_name, sanitize_input
 from cache import cache_manager
-from sqlalchemy import select
+from services.persistent_cache import persistent_cache
+from services.cache_warmer import cache_warmer
+from services.profile_store import profile_store
+from services.persistence_queue import persistence_queue
+from services.api_metrics import api_metrics
+from services.entity_index import entity_index
+from services.search_index import search_index
+from services.profile_snapshots import profile_snapshots
+from utils.quota import quota_ledger
+from utils.bulkhead import bulkheads
+from utils.rate_limiter import rate_limiter_manager
+from sqlalchemy import select, or_, and_
 
 logging.basicConfig(level=settings.LOG_LEVEL)
 logger = logging.getLogger(__name__)
@@ -32,6 +45,7 @@ class SearchResponse(BaseModel):
     message: str
 
 active_websockets: List[WebSocket] = []
+background_jobs: List[asyncio.Task] = []
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -48,9 +62,41 @@ async def lifespan(app: FastAPI):
         logger.error(f"Database initialization failed: {e}", exc_info=True)
         raise
     
+    await persistence_queue.start()
+    await api_metrics.start()
+    
+    try:
+        await persistent_cache.start()
+        warmed = await persistent_cache.warm(cache_manager)
+        logger.info(f"L3 cache started, warmed {warmed} keys into Redis")
+    except Exception as e:
+        logger.warning(f"L3 cache warm-up failed: {e}")
+    
+    if settings.CACHE_WARM_ON_STARTUP:
+        background_jobs.append(asyncio.create_task(cache_warmer.warm(orchestrator)))
+    
     logger.info("Application started")
     yield
     
+    for job in background_jobs:
+        if not job.done():
+            job.cancel()
+    
+    try:
+        await persistence_queue.stop()
+    except Exception as e:
+        logger.error(f"Error flushing persistence queue: {e}")
+    
+    try:
+        await api_metrics.stop()
+    except Exception as e:
+        logger.error(f"Error flushing API metrics: {e}")
+    
+    try:
+        await persistent_cache.stop()
+    except Exception as e:
+        logger.error(f"Error flushing L3 cache: {e}")
+    
     try:
         await orchestrator.close()
     except Exception as e:
@@ -61,6 +107,7 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Error disconnecting cache: {e}")
     
+    await dispose_engines()
     logger.info("Application shutdown")
 
 app = FastAPI(
@@ -85,8 +132,9 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {
-        "status": "healthy",
-        "cache": "connected" if cache_manager.redis_client else "disconnected"
+        "status": "degraded" if cache_manager.degraded else "healthy",
+        "cache": cache_manager.state,
+        "cache_status": cache_manager.get_status()
     }
 
 @app.get("/api/test")
@@ -171,6 +219,7 @@ async def search(request: SearchRequest, background_tasks: BackgroundTasks):
         await db.commit()
         await db.refresh(profile)
         profile_id = profile.id
+        await profile_store.adjust_count(1)
     except Exception as e:
         logger.error(f"Error creating profile: {e}", exc_info=True)
         try:
@@ -209,18 +258,7 @@ async def process_search(profile_id: int, query: str, query_type: str):
         
         result = await orchestrator.search(query, query_type, profile_id, progress_callback=progress_wrapper)
         
-        db = AsyncSessionLocal()
-        try:
-            profile_result = await db.execute(select(Profile).where(Profile.id == profile_id))
-            profile = profile_result.scalar_one_or_none()
-            if profile:
-                profile.data = result
-                profile.status = "complete"
-                if result.get("correlation") and result["correlation"].get("confidence_scores"):
-                    profile.correlation_score = sum(result["correlation"]["confidence_scores"].values()) / len(result["correlation"]["confidence_scores"]) if result["correlation"]["confidence_scores"] else 0.0
-                await db.commit()
-        finally:
-            await db.close()
+        persistence_queue.enqueue(profile_id, result, status="complete")
         
         completed_count = len(result.get("completed_apis", []))
         await broadcast_progress(profile_id, 100, "Search complete!", completed_count, total_apis)
@@ -228,64 +266,174 @@ async def process_search(profile_id: int, query: str, query_type: str):
     except Exception as e:
         logger.error(f"Search processing error: {e}", exc_info=True)
         await broadcast_progress(profile_id, 0, f"Error: {str(e)}", 0, 0)
-        db = AsyncSessionLocal()
-        try:
-            profile_result = await db.execute(select(Profile).where(Profile.id == profile_id))
-            profile = profile_result.scalar_one_or_none()
-            if profile:
-                profile.status = "error"
-                profile.data = {"error": str(e)}
-                await db.commit()
-        except Exception as db_error:
-            logger.error(f"Error updating profile status: {db_error}")
-        finally:
-            await db.close()
+        persistence_queue.enqueue(profile_id, {"error": str(e)}, status="error")
         await broadcast_error(profile_id, str(e))
 
 @app.get("/api/profile/{profile_id}")
-async def get_profile(profile_id: int):
-    db = AsyncSessionLocal()
+async def get_profile(profile_id: int, parts: Optional[str] = None):
+    requested_parts = [part.strip() for part in parts.split(",")] if parts else None
+    await persistence_queue.flush(profile_id)
+    profile = await profile_store.load(profile_id, requested_parts)
+    
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    profile["created_at"] = profile["created_at"].isoformat()
+    profile["updated_at"] = profile["updated_at"].isoformat()
+    return profile
+
+@app.get("/api/profile/{profile_id}/sources/{source}/history")
+async def get_source_history(profile_id: int, source: str):
+    return {"profile_id": profile_id, "source": source, "history": await profile_store.source_history(profile_id, source)}
+
+def encode_profile_cursor(created_at: datetime, profile_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{profile_id}".encode("utf-8")).decode("ascii")
+
+def decode_profile_cursor(cursor: str):
     try:
-        result = await db.execute(select(Profile).where(Profile.id == profile_id))
-        profile = result.scalar_one_or_none()
-        
-        if not profile:
-            raise HTTPException(status_code=404, detail="Profile not found")
-        
-        return {
-            "id": profile.id,
-            "query": profile.query,
-            "query_type": profile.query_type,
-            "status": profile.status,
-            "data": profile.data,
-            "correlation_score": profile.correlation_score,
-            "created_at": profile.created_at.isoformat(),
-            "updated_at": profile.updated_at.isoformat(),
-            "pending_apis": profile.data.get("pending_apis", []) if profile.data else []
-        }
-    finally:
-        await db.close()
+        created_at, profile_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(profile_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@app.get("/api/profile/{profile_id}/versions")
+async def get_profile_versions(profile_id: int):
+    await persistence_queue.flush(profile_id)
+    return {"profile_id": profile_id, "versions": await profile_snapshots.versions(profile_id)}
+
+@app.get("/api/profile/{profile_id}/versions/{version}")
+async def get_profile_version(profile_id: int, version: int):
+    document = await profile_snapshots.materialize(profile_id, version)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Version not found")
+    data = dict(document["summary"])
+    data["results"] = document["results"]
+    return {"profile_id": profile_id, "version": version, "data": data}
+
+@app.get("/api/profile/{profile_id}/diff")
+async def diff_profile_versions(profile_id: int, from_version: int = Query(..., alias="from"), to_version: int = Query(..., alias="to")):
+    changes = await profile_snapshots.diff(profile_id, from_version, to_version)
+    if changes is None:
+        raise HTTPException(status_code=404, detail="Version not found")
+    return {"profile_id": profile_id, "from": from_version, "to": to_version, "changes": changes}
+
+@app.get("/api/profile/{profile_id}/correlations")
+async def get_profile_correlations(profile_id: int):
+    await persistence_queue.flush(profile_id)
+    return {"profile_id": profile_id, "correlations": await entity_index.correlations_for(profile_id)}
+
+@app.get("/api/profile/{profile_id}/related")
+async def get_related_profiles(profile_id: int, limit: int = 100):
+    await persistence_queue.flush(profile_id)
+    return {"profile_id": profile_id, "related": await entity_index.related_profiles(profile_id, max(1, min(limit, 1000)))}
+
+@app.get("/api/entities/{entity_type}/{value}/profiles")
+async def get_entity_profiles(entity_type: str, value: str, limit: int = 100):
+    if entity_type not in ("email", "phone", "username", "name", "location"):
+        raise HTTPException(status_code=400, detail="Unsupported entity type")
+    profiles = await entity_index.profiles_for(entity_type, value, max(1, min(limit, 1000)))
+    return {"entity_type": entity_type, "value": value, "profiles": profiles}
+
+@app.get("/api/profiles/search")
+async def search_profiles(q: str, limit: int = 50):
+    q = sanitize_input(q)
+    if not q:
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+    hits = await search_index.search(q, max(1, min(limit, 200)))
+    return {"q": q, "hits": hits, "total": len(hits)}
+
+@app.get("/api/profiles/filter")
+async def filter_profiles(
+    risk_level: Optional[str] = None,
+    min_confidence: Optional[float] = None,
+    max_confidence: Optional[float] = None,
+    sources: Optional[str] = None,
+    match: Optional[List[str]] = Query(None),
+    limit: int = 50
+):
+    try:
+        profiles = await profile_store.filter(
+            risk_level=risk_level,
+            min_confidence=min_confidence,
+            max_confidence=max_confidence,
+            sources=[source.strip() for source in sources.split(",") if source.strip()] if sources else None,
+            source_match=match,
+            limit=max(1, min(limit, 1000))
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"profiles": profiles, "total": len(profiles)}
 
 @app.get("/api/profiles")
-async def list_profiles(skip: int = 0, limit: int = 50):
-    db = AsyncSessionLocal()
+async def list_profiles(limit: int = 50, cursor: Optional[str] = None, skip: int = 0):
+    limit = max(1, min(limit, 1000))
+    query = select(
+        Profile.id,
+        Profile.query,
+        Profile.query_type,
+        Profile.status,
+        Profile.created_at
+    ).order_by(Profile.created_at.desc(), Profile.id.desc()).limit(limit + 1)
+    
+    if cursor:
+        cursor_created_at, cursor_id = decode_profile_cursor(cursor)
+        query = query.where(or_(
+            Profile.created_at < cursor_created_at,
+            and_(Profile.created_at == cursor_created_at, Profile.id < cursor_id)
+        ))
+    elif skip:
+        query = query.offset(skip)
+    
+    async with ReadSessionLocal() as db:
+        result = await db.execute(query)
+        rows = result.all()
+    
+    page = rows[:limit]
+    next_cursor = encode_profile_cursor(page[-1].created_at, page[-1].id) if len(rows) > limit else None
+    
+    return {
+        "profiles": [
+            {
+                "id": p.id,
+                "query": p.query,
+                "query_type": p.query_type,
+                "status": p.status,
+                "created_at": p.created_at.isoformat()
+            }
+            for p in page
+        ],
+        "total": await profile_store.count(),
+        "next_cursor": next_cursor
+    }
+
+@app.get("/api/metrics/apis")
+async def get_api_metrics(minutes: int = 60, api_name: Optional[str] = None):
+    return await api_metrics.summary(max(1, min(minutes, 1440)), api_name)
+
+@app.get("/api/metrics/concurrency")
+async def get_concurrency_metrics():
+    return {**bulkheads.snapshot(), "rate_limiters": rate_limiter_manager.snapshot()}
+
+@app.get("/api/quotas")
+async def get_api_quotas():
+    return await quota_ledger.summary()
+
+@app.delete("/api/cache/tags/{tag:path}")
+async def invalidate_cache_tag(tag: str):
+    removed = await cache_manager.invalidate_tag(tag)
+    return {"tag": tag, "removed": removed}
+
+@app.post("/api/profile/{profile_id}/invalidate")
+async def invalidate_profile_cache(profile_id: int):
+    db = ReadSessionLocal()
     try:
-        result = await db.execute(select(Profile).offset(skip).limit(limit).order_by(Profile.created_at.desc()))
-        profiles = result.scalars().all()
-        
-        return {
-            "profiles": [
-                {
-                    "id": p.id,
-                    "query": p.query,
-                    "query_type": p.query_type,
-                    "status": p.status,
-                    "created_at": p.created_at.isoformat()
-                }
-                for p in profiles
-            ],
-            "total": len(profiles)
-        }
+        result = await db.execute(select(Profile.query, Profile.query_type).where(Profile.id == profile_id))
+        row = result.one_or_none()
+        if not row:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        tags = orchestrator._cache_tags(orchestrator._normalize_query(row.query, row.query_type), row.query_type, profile_id)
+        removed = await cache_manager.invalidate_tags(tags)
+        return {"profile_id": profile_id, "tags": tags, "removed": removed}
     finally:
         await db.close()
 
@@ -295,19 +443,14 @@ async def websocket_endpoint(websocket: WebSocket, profile_id: int):
     active_websockets.append(websocket)
     
     try:
-        db = AsyncSessionLocal()
-        try:
-            result = await db.execute(select(Profile).where(Profile.id == profile_id))
-            profile = result.scalar_one_or_none()
-            
-            if profile and profile.data:
-                await websocket.send_json({
-                    "type": "update",
-                    "profile_id": profile_id,
-                    "data": profile.data
-                })
-        finally:
-            await db.close()
+        await persistence_queue.flush(profile_id)
+        profile = await profile_store.load(profile_id)
+        if profile and profile["data"]:
+            await websocket.send_json({
+                "type": "update",
+                "profile_id": profile_id,
+                "data": profile["data"]
+            })
         
         while True:
             data = await websocket.receive_text()
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+from collections import deque, defaultdict
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Tuple
+from sqlalchemy import select, delete, func
+from config import settings
+from database import AsyncSessionLocal, ReadSessionLocal, APIMetric, APIMetricRollup
+
+logger = logging.getLogger(__name__)
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = fraction * (len(sorted_values) - 1)
+    lower = int(index)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (index - lower)
+
+def minute_bucket(timestamp: datetime) -> datetime:
+    return timestamp.replace(second=0, microsecond=0)
+
+class APIMetrics:
+    """In-memory ring buffer of outbound API call timings, bulk-inserted into api_metrics"""
+    def __init__(self):
+        self.buffer: deque = deque(maxlen=settings.METRICS_BUFFER_SIZE)
+        self.dropped = 0
+        self.flush_task: Optional[asyncio.Task] = None
+        self.flush_lock: Optional[asyncio.Lock] = None
+
+    async def start(self):
+        self.flush_lock = asyncio.Lock()
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self.flush_task and not self.flush_task.done():
+            self.flush_task.cancel()
+            try:
+                await self.flush_task
+            except asyncio.CancelledError:
+                pass
+        self.flush_task = None
+        await self.flush()
+
+    def record(self, api_name: str, endpoint: str, response_time: float, status_code: Optional[int], success: bool, error_message: Optional[str] = None):
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append({
+            "api_name": api_name,
+            "endpoint": (endpoint or "")[:255],
+            "response_time": response_time,
+            "status_code": status_code,
+            "success": success,
+            "timestamp": datetime.utcnow(),
+            "error_message": error_message
+        })
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(settings.METRICS_FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"API metrics flush loop error: {e}")
+
+    async def flush(self) -> int:
+        if not self.buffer:
+            return 0
+        if self.flush_lock is None:
+            self.flush_lock = asyncio.Lock()
+        async with self.flush_lock:
+            rows = list(self.buffer)
+            self.buffer.clear()
+            if self.dropped:
+                logger.warning(f"API metrics buffer overflowed, {self.dropped} samples dropped")
+                self.dropped = 0
+            try:
+                async with AsyncSessionLocal() as session:
+                    for start in range(0, len(rows), settings.METRICS_BATCH_SIZE):
+                        await session.execute(APIMetric.__table__.insert(), rows[start:start + settings.METRICS_BATCH_SIZE])
+                    await session.commit()
+            except Exception as e:
+                logger.error(f"API metrics flush error ({len(rows)} samples dropped): {e}")
+                return 0
+            return len(rows)
+
+    async def rollup(self) -> int:
+        """Recompute minutely rollups from the last rolled-up minute (minus a grace period for late flushes) up to the last complete minute"""
+        end = minute_bucket(datetime.utcnow())
+        async with ReadSessionLocal() as session:
+            last_bucket = (await session.execute(select(func.max(APIMetricRollup.bucket)))).scalar()
+        if last_bucket is not None:
+            start = last_bucket - timedelta(seconds=settings.METRICS_ROLLUP_GRACE)
+        else:
+            start = end - timedelta(hours=settings.METRICS_RAW_RETENTION_HOURS)
+        start = minute_bucket(start)
+        if start >= end:
+            return 0
+
+        samples: Dict[Tuple[str, datetime], List[Tuple[float, bool]]] = defaultdict(list)
+        async with ReadSessionLocal() as session:
+            result = await session.stream(
+                select(APIMetric.api_name, APIMetric.timestamp, APIMetric.response_time, APIMetric.success)
+                .where(APIMetric.timestamp >= start, APIMetric.timestamp < end)
+                .execution_options(yield_per=settings.METRICS_BATCH_SIZE)
+            )
+            async for row in result:
+                samples[(row.api_name, minute_bucket(row.timestamp))].append((row.response_time or 0.0, bool(row.success)))
+
+        rollups = []
+        for (api_name, bucket), values in samples.items():
+            times = sorted(value for value, _ in values)
+            errors = sum(1 for _, success in values if not success)
+            rollups.append({
+                "api_name": api_name,
+                "bucket": bucket,
+                "count": len(values),
+                "error_count": errors,
+                "error_rate": errors / len(values),
+                "p50": percentile(times, 0.50),
+                "p95": percentile(times, 0.95),
+                "p99": percentile(times, 0.99),
+                "avg_response_time": sum(times) / len(times),
+                "max_response_time": times[-1]
+            })
+
+        async with AsyncSessionLocal() as session:
+            await session.execute(delete(APIMetricRollup).where(APIMetricRollup.bucket >= start, APIMetricRollup.bucket < end))
+            if rollups:
+                await session.execute(APIMetricRollup.__table__.insert(), rollups)
+            await session.commit()
+        return len(rollups)
+
+    async def compact(self) -> Dict[str, int]:
+        """Delete raw samples past their retention once rolled up, and expired rollups"""
+        now = datetime.utcnow()
+        async with ReadSessionLocal() as session:
+            last_bucket = (await session.execute(select(func.max(APIMetricRollup.bucket)))).scalar()
+        raw_cutoff = now - timedelta(hours=settings.METRICS_RAW_RETENTION_HOURS)
+        if last_bucket is not None:
+            raw_cutoff = min(raw_cutoff, last_bucket - timedelta(seconds=settings.METRICS_ROLLUP_GRACE))
+        else:
+            raw_cutoff = None
+        return {
+            "raw": await self._delete_before(APIMetric, APIMetric.timestamp, raw_cutoff) if raw_cutoff else 0,
+            "rollups": await self._delete_before(APIMetricRollup, APIMetricRollup.bucket, now - timedelta(days=settings.METRICS_ROLLUP_RETENTION_DAYS))
+        }
+
+    async def _delete_before(self, model, column, cutoff: datetime) -> int:
+        removed = 0
+        while True:
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(select(model.id).where(column < cutoff).limit(settings.METRICS_BATCH_SIZE))
+                ids = [row[0] for row in result.all()]
+                if not ids:
+                    break
+                await session.execute(delete(model).where(model.id.in_(ids)))
+                await session.commit()
+                removed += len(ids)
+        return removed
+
+    async def summary(self, minutes: int = 60, api_name: Optional[str] = None) -> Dict[str, Any]:
+        since = minute_bucket(datetime.utcnow()) - timedelta(minutes=minutes)
+        query = select(APIMetricRollup).where(APIMetricRollup.bucket >= since).order_by(APIMetricRollup.api_name, APIMetricRollup.bucket)
+        if api_name:
+            query = query.where(APIMetricRollup.api_name == api_name)
+        async with ReadSessionLocal() as session:
+            result = await session.execute(query)
+            rows = result.scalars().all()
+
+        apis: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            api = apis.setdefault(row.api_name, {"volume": 0, "errors": 0, "p95_max": 0.0, "p99_max": 0.0, "minutes": []})
+            api["volume"] += row.count
+            api["errors"] += row.error_count
+            api["p95_max"] = max(api["p95_max"], row.p95)
+            api["p99_max"] = max(api["p99_max"], row.p99)
+            api["minutes"].append({
+                "bucket": row.bucket.isoformat(),
+                "count": row.count,
+                "error_rate": row.error_rate,
+                "p50": row.p50,
+                "p95": row.p95,
+                "p99": row.p99
+            })
+        for api in apis.values():
+            api["error_rate"] = api["errors"] / api["volume"] if api["volume"] else 0.0
+        return {"minutes": minutes, "buffered": len(self.buffer), "apis": apis}
+
+api_metrics = APIMetrics()
@@ -0,0 +1,75 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Tuple, Optional
+from sqlalchemy import select, func
+from config import settings
+from database import ReadSessionLocal, Profile
+from cache import cache_manager, cache_refresh_ahead
+from utils.rate_limiter import rate_limit_priority, PRIORITY_BATCH
+
+logger = logging.getLogger(__name__)
+
+class CacheWarmer:
+    def __init__(self):
+        self.top_n = settings.CACHE_WARM_TOP_N
+        self.lookback_days = settings.CACHE_WARM_LOOKBACK_DAYS
+        self.refresh_window = settings.CACHE_WARM_REFRESH_WINDOW
+        self.rate_limit_share = settings.CACHE_WARM_RATE_LIMIT_SHARE
+
+    async def top_queries(self, limit: Optional[int] = None) -> List[Tuple[str, str, int]]:
+        """Most frequently searched (query, query_type) pairs over the lookback window"""
+        since = datetime.utcnow() - timedelta(days=self.lookback_days)
+        hits = func.count(Profile.id).label("hits")
+        async with ReadSessionLocal() as session:
+            result = await session.execute(
+                select(Profile.query, Profile.query_type, hits)
+                .where(Profile.created_at >= since)
+                .group_by(Profile.query, Profile.query_type)
+                .order_by(hits.desc())
+                .limit(limit or self.top_n)
+            )
+            return [(row.query, row.query_type, row.hits) for row in result.all()]
+
+    def run_budget(self, orchestrator) -> int:
+        """Number of profiles one run may refresh without exceeding the configured share of any API's rate limit"""
+        interval_minutes = settings.CACHE_WARM_INTERVAL / 60.0
+        budgets = []
+        for client in orchestrator.clients.values():
+            limiter = getattr(client, "rate_limiter", None)
+            if limiter is None:
+                continue
+            allowed_calls = limiter.requests_per_minute * self.rate_limit_share * interval_minutes
+            budgets.append(allowed_calls / settings.CACHE_WARM_CALLS_PER_PROFILE)
+        return int(min(budgets)) if budgets else self.top_n
+
+    async def warm(self, orchestrator) -> Dict[str, Any]:
+        stats = {"candidates": 0, "warmed": 0, "fresh": 0, "skipped_budget": 0, "errors": 0}
+        try:
+            candidates = await self.top_queries()
+        except Exception as e:
+            logger.error(f"Cache warmer could not load top queries: {e}")
+            return stats
+
+        stats["candidates"] = len(candidates)
+        budget = self.run_budget(orchestrator)
+        for query, query_type, _ in candidates:
+            normalized_query = orchestrator._normalize_query(query, query_type)
+            remaining = await cache_manager.ttl(orchestrator.profile_cache_key(normalized_query, query_type))
+            if remaining is not None and remaining > self.refresh_window:
+                stats["fresh"] += 1
+                continue
+            if stats["warmed"] >= budget:
+                stats["skipped_budget"] += 1
+                continue
+            try:
+                with cache_refresh_ahead(self.refresh_window), rate_limit_priority(PRIORITY_BATCH):
+                    await orchestrator.search(query, query_type)
+                stats["warmed"] += 1
+            except Exception as e:
+                stats["errors"] += 1
+                logger.error(f"Cache warmer failed for {query_type}:{query}: {e}")
+
+        logger.info(f"Cache warm run: {stats}")
+        return stats
+
+cache_warmer = CacheWarmer()
@@ -11,7 +11,7 @@ class CorrelationEngine:
         
     def correlate_profiles(self, api_results: Dict[str, Any]) -> Dict[str, Any]:
         correlations = []
-        entities = self._extract_entities(api_results)
+        entities = self.extract_entities(api_results)
         
         name_matches = self._match_names(entities.get("names", []))
         email_matches = self._match_emails(entities.get("emails", []))
@@ -31,7 +31,7 @@ class CorrelationEngine:
             "high_confidence_matches": [c for c in merged_clusters if c.get("confidence", 0) > 0.8]
         }
     
-    def _extract_entities(self, api_results: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    def extract_entities(self, api_results: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
         entities = {
             "names": [],
             "emails": [],
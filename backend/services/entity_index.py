@@ -0,0 +1,152 @@
+import logging
+from itertools import combinations
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import select, delete, func
+from database import ReadSessionLocal, Profile, ProfileEntity, Correlation
+from services.correlation import CorrelationEngine
+from utils.validators import normalize_email, normalize_phone, normalize_username, normalize_name
+
+logger = logging.getLogger(__name__)
+
+# CorrelationEngine entity groups -> entity_type stored in profile_entities
+ENTITY_GROUPS = {
+    "emails": "email",
+    "phones": "phone",
+    "usernames": "username",
+    "names": "name",
+    "locations": "location",
+}
+
+def normalize_entity(entity_type: str, value: str) -> str:
+    value = str(value)
+    if entity_type == "email":
+        value = normalize_email(value)
+    elif entity_type == "phone":
+        value = normalize_phone(value)
+    elif entity_type == "username":
+        value = normalize_username(value)
+    else:
+        value = normalize_name(value).lower()
+    return value[:255]
+
+def _confidence(value: Any) -> float:
+    return float(value) if isinstance(value, (int, float)) else 0.5
+
+class EntityIndex:
+    """Normalized entity identifiers and correlation edges per profile, for cross-profile pivots"""
+    def __init__(self):
+        self.extractor = CorrelationEngine()
+
+    def entity_rows(self, profile_id: int, query: str, query_type: str, results: Dict[str, Any]) -> List[Dict[str, Any]]:
+        rows: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        if query and query_type in ("email", "phone", "username", "name"):
+            value = normalize_entity(query_type, query)
+            rows[(query_type, value, "query")] = {"profile_id": profile_id, "entity_type": query_type, "value": value, "source": "query"}
+        for group, entities in self.extractor.extract_entities(results).items():
+            entity_type = ENTITY_GROUPS.get(group)
+            if not entity_type:
+                continue
+            for entity in entities:
+                if not entity.get("value"):
+                    continue
+                value = normalize_entity(entity_type, entity["value"])
+                source = entity["source"]["api"]
+                rows[(entity_type, value, source)] = {"profile_id": profile_id, "entity_type": entity_type, "value": value, "source": source}
+        return list(rows.values())
+
+    def edge_rows(self, profile_id: int, correlation: Dict[str, Any]) -> List[Dict[str, Any]]:
+        rows = []
+        seen = set()
+        for cluster in correlation.get("clusters") or []:
+            nodes = []
+            for entity in cluster.get("entities") or []:
+                source = entity.get("source") or {}
+                node = (f"{source.get('api')}:{entity.get('value')}"[:255], source.get("api"))
+                if node not in nodes:
+                    nodes.append(node)
+            for (source_id, source_type), (target_id, target_type) in combinations(nodes, 2):
+                edge = (source_id, target_id, cluster.get("type"))
+                if source_type == target_type or edge in seen:
+                    continue
+                seen.add(edge)
+                rows.append({
+                    "profile_id": profile_id,
+                    "source_id": source_id,
+                    "target_id": target_id,
+                    "source_type": source_type,
+                    "target_type": target_type,
+                    "confidence_score": _confidence(cluster.get("confidence")),
+                    "correlation_type": cluster.get("type"),
+                    "meta_data": {"source_count": cluster.get("source_count")}
+                })
+        return rows
+
+    async def rebuild(self, session, profile_id: int, query: str, query_type: str, results: Dict[str, Any], correlation: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Replace a profile's entities and edges inside the caller's transaction; returns the entity rows"""
+        entities = self.entity_rows(profile_id, query, query_type, results)
+        edges = self.edge_rows(profile_id, correlation or {})
+        await session.execute(delete(ProfileEntity).where(ProfileEntity.profile_id == profile_id))
+        await session.execute(delete(Correlation).where(Correlation.profile_id == profile_id))
+        if entities:
+            await session.execute(ProfileEntity.__table__.insert(), entities)
+        if edges:
+            await session.execute(Correlation.__table__.insert(), edges)
+        return entities
+
+    async def profiles_for(self, entity_type: str, value: str, limit: int = 100) -> List[Dict[str, Any]]:
+        value = normalize_entity(entity_type, value)
+        sources = func.count(ProfileEntity.source).label("sources")
+        async with ReadSessionLocal() as session:
+            result = await session.execute(
+                select(Profile.id, Profile.query, Profile.query_type, Profile.status, Profile.created_at, sources)
+                .join(ProfileEntity, ProfileEntity.profile_id == Profile.id)
+                .where(ProfileEntity.entity_type == entity_type, ProfileEntity.value == value)
+                .group_by(Profile.id, Profile.query, Profile.query_type, Profile.status, Profile.created_at)
+                .order_by(Profile.created_at.desc())
+                .limit(limit)
+            )
+            return [
+                {
+                    "id": row.id,
+                    "query": row.query,
+                    "query_type": row.query_type,
+                    "status": row.status,
+                    "created_at": row.created_at.isoformat(),
+                    "sources": row.sources
+                }
+                for row in result.all()
+            ]
+
+    async def related_profiles(self, profile_id: int, limit: int = 100) -> List[Dict[str, Any]]:
+        """Other profiles sharing at least one normalized entity with profile_id"""
+        mine = select(ProfileEntity.entity_type, ProfileEntity.value).where(ProfileEntity.profile_id == profile_id).distinct().subquery()
+        shared = func.count(func.distinct(ProfileEntity.entity_type + ":" + ProfileEntity.value)).label("shared")
+        async with ReadSessionLocal() as session:
+            result = await session.execute(
+                select(ProfileEntity.profile_id, shared)
+                .join(mine, (ProfileEntity.entity_type == mine.c.entity_type) & (ProfileEntity.value == mine.c.value))
+                .where(ProfileEntity.profile_id != profile_id)
+                .group_by(ProfileEntity.profile_id)
+                .order_by(shared.desc())
+                .limit(limit)
+            )
+            return [{"profile_id": row.profile_id, "shared_entities": row.shared} for row in result.all()]
+
+    async def correlations_for(self, profile_id: int) -> List[Dict[str, Any]]:
+        async with ReadSessionLocal() as session:
+            result = await session.execute(
+                select(Correlation).where(Correlation.profile_id == profile_id).order_by(Correlation.confidence_score.desc())
+            )
+            return [
+                {
+                    "source_id": row.source_id,
+                    "target_id": row.target_id,
+                    "source_type": row.source_type,
+                    "target_type": row.target_type,
+                    "confidence_score": row.confidence_score,
+                    "correlation_type": row.correlation_type
+                }
+                for row in result.scalars().all()
+            ]
+
+entity_index = EntityIndex()
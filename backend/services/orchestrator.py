@@ -3,6 +3,7 @@ from typing import Dict, List, Any, Optional
 from collections import defaultdict
 import time
 import logging
+from config import settings
 from api_clients import (
     TwitterClient, InstagramClient, HunterClient, NumverifyClient,
     EtherscanClient, VirusTotalClient, NewsAPIClient, GoogleNewsClient,
@@ -15,13 +16,24 @@ from services.image_matcher import image_matcher
 from services.google_search import google_search
 from services.analysis_engine import analysis_engine
 from services.google_vision import google_vision
+from services.persistence_queue import persistence_queue
 from database import AsyncSessionLocal, Profile
 from sqlalchemy import select
-from cache import cache_manager
+from cache import cache_manager, cache_tag_scope, make_cache_key
+from utils.quota import quota_ledger, VALUE_HIGH, VALUE_MEDIUM, VALUE_LOW
+from utils.rate_limiter import request_priority, PRIORITY_INTERACTIVE
+from utils.bulkhead import bulkheads
 from utils.validators import validate_email, validate_phone, validate_username, normalize_email, normalize_phone, normalize_username, normalize_name, extract_domain, generate_username_variations, generate_name_variations
 
 logger = logging.getLogger(__name__)
 
+PRIORITY_TIMEOUT = 15.0
+SECONDARY_TIMEOUT = 10.0
+BLOG_TIMEOUT = 25.0  # Blog scraping runs several searches
+# Upper bound on one profile collection (API stages plus image analysis and correlation); the
+# rebuild lock expires with it, so a dead lock holder blocks nobody beyond the collection deadline
+COLLECTION_DEADLINE = PRIORITY_TIMEOUT + SECONDARY_TIMEOUT + BLOG_TIMEOUT + 10.0
+
 class APIOrchestrator:
     def __init__(self):
         self.clients = {
@@ -44,17 +56,39 @@ class APIOrchestrator:
         self.background_apis = ["telegram", "numverify", "ipinfo", "instagram"]
         
     async def search(self, query: str, query_type: str, profile_id: Optional[int] = None, progress_callback: Optional[callable] = None) -> Dict[str, Any]:
-        start_time = time.time()
         normalized_query = self._normalize_query(query, query_type)
+        cache_key = self.profile_cache_key(normalized_query, query_type)
+        # Only one worker rebuilds an expiring profile; concurrent searches get the stale copy, or wait
+        # briefly for the rebuild and then collect uncoordinated rather than stall behind the lock
+        # All API calls made for this search (including its background tail) share one concurrency budget
+        with cache_tag_scope(*self._cache_tags(normalized_query, query_type, profile_id)), bulkheads.search_scope():
+            return await cache_manager.get_or_set(
+                cache_key,
+                lambda: self._collect_profile(normalized_query, query_type, cache_key, profile_id, progress_callback),
+                3600,
+                lock_timeout=COLLECTION_DEADLINE,
+                wait_timeout=settings.CACHE_LOCK_WAIT
+            )
+    
+    def profile_cache_key(self, normalized_query: str, query_type: str) -> str:
+        return make_cache_key("profile", query_type, normalized_query)
+    
+    def _cache_tags(self, normalized_query: str, query_type: str, profile_id: Optional[int] = None) -> List[str]:
+        tags = [f"target:{query_type}:{normalized_query}"]
+        if profile_id:
+            tags.append(f"profile:{profile_id}")
+        if query_type == "email":
+            domain = extract_domain(normalized_query)
+            if domain:
+                tags.append(f"domain:{domain}")
+        return tags
+    
+    async def _collect_profile(self, normalized_query: str, query_type: str, cache_key: str, profile_id: Optional[int] = None, progress_callback: Optional[callable] = None) -> Dict[str, Any]:
+        start_time = time.time()
         # Include Google search in total count
         total_apis = len(self.priority_apis) + len(self.secondary_apis) + len(self.background_apis) + 1  # +1 for Google search
         completed_count = 0
         
-        cache_key = f"profile:{query_type}:{normalized_query}"
-        cached_profile = await cache_manager.get(cache_key)
-        if cached_profile:
-            return cached_profile
-        
         query_variations = self._generate_query_variations(normalized_query, query_type)
         
         if progress_callback:
@@ -72,7 +106,12 @@ class APIOrchestrator:
         priority_tasks.append(google_search_task)
         priority_api_names.append("google_search")
         
+        deferred_api_names = []
         for api_name, client in self.clients.items():
+            if not await quota_ledger.admit(api_name, self._call_value(api_name)):
+                deferred_api_names.append(api_name)
+                total_apis -= 1
+                continue
             task = self._search_api(api_name, client, normalized_query, query_type, query_variations, progress_callback, completed_count, total_apis)
             
             if api_name in self.priority_apis:
@@ -94,10 +133,10 @@ class APIOrchestrator:
         try:
             priority_results = await asyncio.wait_for(
                 asyncio.gather(*priority_tasks, return_exceptions=True),
-                timeout=15.0
+                timeout=PRIORITY_TIMEOUT
             )
         except asyncio.TimeoutError:
-            logger.warning("Priority APIs timed out after 15 seconds")
+            logger.warning(f"Priority APIs timed out after {PRIORITY_TIMEOUT:.0f} seconds")
             priority_results = [None] * len(priority_tasks)
         
         for i, api_name in enumerate(priority_api_names):
@@ -120,10 +159,10 @@ class APIOrchestrator:
         try:
             secondary_results = await asyncio.wait_for(
                 asyncio.gather(*secondary_tasks, return_exceptions=True),
-                timeout=10.0
+                timeout=SECONDARY_TIMEOUT
             )
         except asyncio.TimeoutError:
-            logger.warning("Secondary APIs timed out after 10 seconds")
+            logger.warning(f"Secondary APIs timed out after {SECONDARY_TIMEOUT:.0f} seconds")
             secondary_results = [None] * len(secondary_tasks)
         
         if progress_callback:
@@ -150,7 +189,7 @@ class APIOrchestrator:
                     await progress_callback(75, "Searching blogs and articles...", completed_count, total_apis)
                 blog_result = await asyncio.wait_for(
                     self._search_blogs(normalized_query, query_type),
-                    timeout=25.0  # Increased timeout for blog scraping (allows time for multiple searches)
+                    timeout=BLOG_TIMEOUT
                 )
                 if blog_result and blog_result.get("blogs") and len(blog_result.get("blogs", [])) > 0:
                     results["web_scraper"] = blog_result
@@ -213,20 +252,43 @@ class APIOrchestrator:
             "primary_image": primary_image,
             "image_matches": image_matches if image_matches else [],
             "completed_apis": list(completed_apis),
-            "pending_apis": [api for api in self.background_apis if api not in completed_apis],
+            "pending_apis": [api for api in self.background_apis if api not in completed_apis and api not in deferred_api_names],
+            "deferred_apis": deferred_api_names,
             "collection_time": time.time() - start_time,
             "status": "partial" if background_tasks else "complete"
         }
         
-        await cache_manager.set(cache_key, profile_data, 3600)
-        
         if profile_id:
             await self._save_profile(profile_id, profile_data)
+            if deferred_api_names:
+                await self._schedule_deferred(profile_id, deferred_api_names)
         
-        asyncio.create_task(self._complete_background_tasks(background_future, background_api_names, profile_data, cache_key))
+        asyncio.create_task(self._complete_background_tasks(background_future, background_api_names, profile_data, cache_key, profile_id))
         
         return profile_data
     
+    def _call_value(self, api_name: str) -> str:
+        if api_name in self.priority_apis:
+            return VALUE_HIGH
+        if api_name in self.secondary_apis:
+            return VALUE_MEDIUM
+        return VALUE_LOW
+    
+    async def _schedule_deferred(self, profile_id: int, api_names: List[str]):
+        """Refresh an interactive profile once the quota periods that blocked its skipped APIs have reset"""
+        if request_priority.get() != PRIORITY_INTERACTIVE:
+            return
+        delays = [await quota_ledger.seconds_until_reset(api_name, self._call_value(api_name)) for api_name in api_names]
+        delays = [delay for delay in delays if delay > 0]
+        if not delays:
+            return
+        try:
+            from tasks import defer_refresh
+            defer_refresh(profile_id, time.time() + min(delays) + 60)
+            logger.info(f"Deferred {', '.join(api_names)} for profile {profile_id} by {min(delays)}s")
+        except Exception as e:
+            logger.error(f"Could not schedule deferred refresh for profile {profile_id}: {e}")
+    
     async def _search_api(self, api_name: str, client: Any, query: str, query_type: str, variations: List[str], progress_callback: Optional[callable] = None, completed_count: int = 0, total_apis: int = 0) -> Optional[Dict[str, Any]]:
         try:
             # Handle Google search separately
@@ -417,29 +479,16 @@ class APIOrchestrator:
         return list(set(variations))
     
     async def _save_profile(self, profile_id: int, profile_data: Dict[str, Any]):
-        try:
-            db = AsyncSessionLocal()
-            try:
-                result = await db.execute(select(Profile).where(Profile.id == profile_id))
-                profile = result.scalar_one_or_none()
-                if profile:
-                    profile.data = profile_data
-                    profile.status = profile_data.get("status", "complete")
-                    if profile_data.get("correlation") and profile_data["correlation"].get("confidence_scores"):
-                        scores = profile_data["correlation"]["confidence_scores"]
-                        profile.correlation_score = sum(scores.values()) / len(scores) if scores else 0.0
-                    await db.commit()
-            finally:
-                await db.close()
-        except Exception as e:
-            logger.error(f"Error saving profile: {e}")
+        persistence_queue.enqueue(profile_id, profile_data, status=profile_data.get("status", "complete"))
     
-    async def _complete_background_tasks(self, background_future, background_api_names: List[str], profile_data: Dict[str, Any], cache_key: str):
+    async def _complete_background_tasks(self, background_future, background_api_names: List[str], profile_data: Dict[str, Any], cache_key: str, profile_id: Optional[int] = None):
         try:
             background_results = await background_future
+            new_results = {}
             for i, api_name in enumerate(background_api_names):
                 if i < len(background_results) and not isinstance(background_results[i], Exception) and background_results[i]:
                     profile_data["results"][api_name] = background_results[i]
+                    new_results[api_name] = background_results[i]
                     if api_name not in profile_data["completed_apis"]:
                         profile_data["completed_apis"].append(api_name)
             
@@ -457,6 +506,16 @@ class APIOrchestrator:
             profile_data["correlation"] = self.correlation_engine.correlate_profiles(profile_data["results"])
             
             await cache_manager.set(cache_key, profile_data, 3600)
+            
+            if profile_id:
+                persistence_queue.enqueue(
+                    profile_id,
+                    sources=new_results,
+                    summary_updates={
+                        key: profile_data[key]
+                        for key in ("completed_apis", "pending_apis", "image_matches", "status", "correlation")
+                    }
+                )
         except Exception as e:
             logger.error(f"Error completing background tasks: {e}")
     
@@ -0,0 +1,115 @@
+import asyncio
+import copy
+import logging
+from typing import Dict, Any, Optional, Set
+from config import settings
+from database import AsyncSessionLocal
+from services.profile_store import profile_store
+
+logger = logging.getLogger(__name__)
+
+class PersistenceQueue:
+    """Write-behind queue that coalesces profile updates per profile id and applies them in batched transactions"""
+    def __init__(self):
+        self.flush_interval = settings.PERSISTENCE_FLUSH_INTERVAL
+        self.batch_size = settings.PERSISTENCE_BATCH_SIZE
+        self.pending: Dict[int, Dict[str, Any]] = {}
+        self.in_flight: Set[int] = set()
+        self.flush_task: Optional[asyncio.Task] = None
+        self.flush_lock: Optional[asyncio.Lock] = None
+
+    async def start(self):
+        self.flush_lock = asyncio.Lock()
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self.flush_task and not self.flush_task.done():
+            self.flush_task.cancel()
+            try:
+                await self.flush_task
+            except asyncio.CancelledError:
+                pass
+        self.flush_task = None
+        await self.flush()
+
+    def enqueue(self, profile_id: int, profile_data: Optional[Dict[str, Any]] = None, status: Optional[str] = None,
+                sources: Optional[Dict[str, Any]] = None, summary_updates: Optional[Dict[str, Any]] = None):
+        entry = self.pending.setdefault(profile_id, {"profile_data": None, "status": None, "sources": {}, "summary_updates": {}})
+        if profile_data is not None:
+            # A full snapshot supersedes earlier summary updates and any earlier copy of the sources it carries.
+            # Stored as a copy: the orchestrator keeps mutating its dict while background APIs complete.
+            entry["profile_data"] = copy.deepcopy(profile_data)
+            entry["summary_updates"] = {}
+            for source in profile_data.get("results") or {}:
+                entry["sources"].pop(source, None)
+        if status is not None:
+            entry["status"] = status
+        if sources:
+            entry["sources"].update(copy.deepcopy(sources))
+        if summary_updates:
+            entry["summary_updates"].update(copy.deepcopy(summary_updates))
+
+        if len(self.pending) >= self.batch_size:
+            try:
+                asyncio.get_running_loop().create_task(self.flush())
+            except RuntimeError:
+                pass
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Persistence queue flush loop error: {e}")
+
+    async def flush(self, profile_id: Optional[int] = None):
+        """Apply pending updates; with profile_id only that profile's update is written"""
+        if self.flush_lock is None:
+            self.flush_lock = asyncio.Lock()
+        if profile_id is not None and profile_id not in self.pending:
+            if profile_id in self.in_flight:
+                # A batch holding this profile is being written; wait for it to commit
+                async with self.flush_lock:
+                    pass
+            return
+        if not self.pending:
+            return
+        async with self.flush_lock:
+            if profile_id is not None:
+                entry = self.pending.pop(profile_id, None)
+                batch = {profile_id: entry} if entry else {}
+            else:
+                batch, self.pending = self.pending, {}
+            if not batch:
+                return
+            items = list(batch.items())
+            self.in_flight = set(batch.keys())
+            for start in range(0, len(items), self.batch_size):
+                chunk = items[start:start + self.batch_size]
+                try:
+                    async with AsyncSessionLocal() as session:
+                        for pid, entry in chunk:
+                            await profile_store.apply(
+                                session,
+                                pid,
+                                entry["profile_data"],
+                                entry["status"],
+                                entry["sources"] or None,
+                                entry["summary_updates"] or None
+                            )
+                        await session.commit()
+                except Exception as e:
+                    logger.error(f"Persistence queue flush error ({len(chunk)} profile updates requeued): {e}")
+                    self._requeue(chunk)
+            self.in_flight = set()
+
+    def _requeue(self, chunk):
+        for pid, entry in chunk:
+            newer = self.pending.pop(pid, None)
+            self.pending[pid] = entry
+            if newer:
+                self.enqueue(pid, newer["profile_data"], newer["status"], newer["sources"], newer["summary_updates"])
+
+persistence_queue = PersistenceQueue()
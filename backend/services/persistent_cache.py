@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Optional, Any, Dict, Tuple, List
+from sqlalchemy import select, update, delete, bindparam
+from config import settings
+from database import AsyncSessionLocal, ReadSessionLocal, APICache, engine
+
+logger = logging.getLogger(__name__)
+
+class PersistentCache:
+    """Write-behind L3 tier on the api_cache table, read through on Redis misses"""
+    def __init__(self):
+        self.enabled = settings.CACHE_L3_ENABLED
+        self.pending_writes: Dict[str, Tuple[str, Any, datetime]] = {}
+        self.pending_hits: Dict[str, int] = defaultdict(int)
+        self.flush_task: Optional[asyncio.Task] = None
+        self.flush_lock: Optional[asyncio.Lock] = None
+        self.last_sweep = 0.0
+
+    async def start(self):
+        if not self.enabled:
+            return
+        from cache import cache_manager
+        cache_manager.attach_l3(self)
+        self.flush_lock = asyncio.Lock()
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self.flush_task and not self.flush_task.done():
+            self.flush_task.cancel()
+            try:
+                await self.flush_task
+            except asyncio.CancelledError:
+                pass
+        self.flush_task = None
+        await self.flush()
+
+    async def get(self, key: str) -> Optional[Tuple[Any, int]]:
+        if not self.enabled:
+            return None
+        now = datetime.utcnow()
+        pending = self.pending_writes.get(key)
+        if pending:
+            _, value, expires_at = pending
+            if expires_at > now:
+                return value, int((expires_at - now).total_seconds())
+        try:
+            async with ReadSessionLocal() as session:
+                result = await session.execute(
+                    select(APICache.response_data, APICache.expires_at).where(
+                        APICache.cache_key == key,
+                        APICache.expires_at > now
+                    )
+                )
+                row = result.one_or_none()
+        except Exception as e:
+            logger.error(f"L3 cache get error: {e}")
+            return None
+        if row is None:
+            return None
+        self.pending_hits[key] += 1
+        return row.response_data, max(1, int((row.expires_at - now).total_seconds()))
+
+    def put(self, key: str, api_name: str, value: Any, ttl: int):
+        if not self.enabled:
+            return
+        self.pending_writes[key] = (api_name, value, datetime.utcnow() + timedelta(seconds=ttl))
+        if len(self.pending_writes) >= settings.CACHE_L3_BATCH_SIZE:
+            try:
+                asyncio.get_running_loop().create_task(self.flush())
+            except RuntimeError:
+                pass
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(settings.CACHE_L3_FLUSH_INTERVAL)
+            try:
+                await self.flush()
+                if time.monotonic() - self.last_sweep >= settings.CACHE_L3_SWEEP_INTERVAL:
+                    self.last_sweep = time.monotonic()
+                    await self.sweep()
+            except Exception as e:
+                logger.error(f"L3 cache flush loop error: {e}")
+
+    async def flush(self):
+        if not self.pending_writes and not self.pending_hits:
+            return
+        if self.flush_lock is None:
+            self.flush_lock = asyncio.Lock()
+        async with self.flush_lock:
+            writes, self.pending_writes = self.pending_writes, {}
+            hits, self.pending_hits = self.pending_hits, defaultdict(int)
+            try:
+                async with AsyncSessionLocal() as session:
+                    if writes:
+                        await self._upsert(session, writes)
+                    if hits:
+                        table = APICache.__table__
+                        await session.execute(
+                            update(table)
+                            .where(table.c.cache_key == bindparam("b_key"))
+                            .values(hit_count=table.c.hit_count + bindparam("b_hits")),
+                            [{"b_key": key, "b_hits": count} for key, count in hits.items()]
+                        )
+                    await session.commit()
+            except Exception as e:
+                logger.error(f"L3 cache flush error ({len(writes)} writes, {len(hits)} hit counters dropped): {e}")
+
+    async def _upsert(self, session, writes: Dict[str, Tuple[str, Any, datetime]]):
+        rows = [
+            {"cache_key": key, "api_name": api_name, "response_data": value, "expires_at": expires_at, "created_at": datetime.utcnow()}
+            for key, (api_name, value, expires_at) in writes.items()
+        ]
+        dialect = engine.dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            if dialect == "sqlite":
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            for start in range(0, len(rows), settings.CACHE_L3_BATCH_SIZE):
+                stmt = insert(APICache.__table__).values(rows[start:start + settings.CACHE_L3_BATCH_SIZE])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["cache_key"],
+                    set_={
+                        "api_name": stmt.excluded.api_name,
+                        "response_data": stmt.excluded.response_data,
+                        "expires_at": stmt.excluded.expires_at,
+                        "created_at": stmt.excluded.created_at
+                    }
+                )
+                await session.execute(stmt)
+        else:
+            await session.execute(delete(APICache).where(APICache.cache_key.in_(list(writes.keys()))))
+            await session.execute(APICache.__table__.insert(), rows)
+
+    async def sweep(self) -> int:
+        removed = 0
+        now = datetime.utcnow()
+        try:
+            while True:
+                async with AsyncSessionLocal() as session:
+                    result = await session.execute(
+                        select(APICache.id).where(APICache.expires_at < now).limit(settings.CACHE_L3_BATCH_SIZE)
+                    )
+                    ids = [row[0] for row in result.all()]
+                    if not ids:
+                        break
+                    await session.execute(delete(APICache).where(APICache.id.in_(ids)))
+                    await session.commit()
+                    removed += len(ids)
+        except Exception as e:
+            logger.error(f"L3 cache sweep error: {e}")
+        return removed
+
+    async def warm(self, cache_manager, limit: Optional[int] = None) -> int:
+        if not self.enabled:
+            return 0
+        limit = limit or settings.CACHE_L3_WARMUP_KEYS
+        now = datetime.utcnow()
+        try:
+            async with ReadSessionLocal() as session:
+                result = await session.execute(
+                    select(APICache.cache_key, APICache.response_data, APICache.expires_at)
+                    .where(APICache.expires_at > now)
+                    .order_by(APICache.hit_count.desc())
+                    .limit(limit)
+                )
+                rows = result.all()
+        except Exception as e:
+            logger.error(f"L3 cache warm-up error: {e}")
+            return 0
+
+        mapping = {row.cache_key: row.response_data for row in rows}
+        ttls = {row.cache_key: max(1, int((row.expires_at - now).total_seconds())) for row in rows}
+        await cache_manager.set_many(mapping, ttls=ttls)
+        return len(mapping)
+
+persistent_cache = PersistentCache()
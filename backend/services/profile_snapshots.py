@@ -0,0 +1,106 @@
+import json
+import logging
+from typing import Dict, Any, Optional, List
+from sqlalchemy import select, func
+from config import settings
+from database import ReadSessionLocal, ProfileSnapshot
+from utils import json_diff
+
+logger = logging.getLogger(__name__)
+
+def _size(value: Any) -> int:
+    return len(json.dumps(value, default=str))
+
+class ProfileSnapshots:
+    """Profile version history stored as a base document plus JSON diffs, re-based every N versions"""
+    def __init__(self):
+        self.enabled = settings.PROFILE_SNAPSHOTS_ENABLED
+        self.rebase_every = settings.PROFILE_SNAPSHOT_REBASE_EVERY
+        self.max_delta_ratio = settings.PROFILE_SNAPSHOT_MAX_DELTA_RATIO
+
+    async def record(self, session, profile_id: int, document: Dict[str, Any], digest: str) -> Optional[int]:
+        """Append a version inside the caller's transaction unless the document is unchanged"""
+        if not self.enabled:
+            return None
+        result = await session.execute(
+            select(ProfileSnapshot.version, ProfileSnapshot.content_hash)
+            .where(ProfileSnapshot.profile_id == profile_id)
+            .order_by(ProfileSnapshot.version.desc())
+            .limit(1)
+        )
+        latest = result.one_or_none()
+        if latest is not None and latest.content_hash == digest:
+            return latest.version
+
+        version = (latest.version if latest else 0) + 1
+        kind, payload = "base", document
+        if latest is not None:
+            base_version = await self._base_version(session, profile_id, latest.version)
+            if base_version is not None and version - base_version < self.rebase_every:
+                previous = await self._materialize(session, profile_id, latest.version)
+                ops = json_diff.diff(previous, document)
+                if _size(ops) <= _size(document) * self.max_delta_ratio:
+                    kind, payload = "delta", ops
+
+        session.add(ProfileSnapshot(profile_id=profile_id, version=version, kind=kind, payload=payload, content_hash=digest))
+        return version
+
+    async def _base_version(self, session, profile_id: int, version: int) -> Optional[int]:
+        result = await session.execute(
+            select(func.max(ProfileSnapshot.version)).where(
+                ProfileSnapshot.profile_id == profile_id,
+                ProfileSnapshot.kind == "base",
+                ProfileSnapshot.version <= version
+            )
+        )
+        return result.scalar()
+
+    async def _materialize(self, session, profile_id: int, version: int) -> Optional[Dict[str, Any]]:
+        base_version = await self._base_version(session, profile_id, version)
+        if base_version is None:
+            return None
+        result = await session.execute(
+            select(ProfileSnapshot.version, ProfileSnapshot.kind, ProfileSnapshot.payload)
+            .where(
+                ProfileSnapshot.profile_id == profile_id,
+                ProfileSnapshot.version >= base_version,
+                ProfileSnapshot.version <= version
+            )
+            .order_by(ProfileSnapshot.version)
+        )
+        document, last_version = None, None
+        for last_version, kind, payload in result.all():
+            document = payload if kind == "base" else json_diff.patch(document, payload)
+        return document if last_version == version else None
+
+    async def materialize(self, profile_id: int, version: int) -> Optional[Dict[str, Any]]:
+        async with ReadSessionLocal() as session:
+            return await self._materialize(session, profile_id, version)
+
+    async def versions(self, profile_id: int) -> List[Dict[str, Any]]:
+        async with ReadSessionLocal() as session:
+            result = await session.execute(
+                select(ProfileSnapshot.version, ProfileSnapshot.kind, ProfileSnapshot.payload, ProfileSnapshot.created_at)
+                .where(ProfileSnapshot.profile_id == profile_id)
+                .order_by(ProfileSnapshot.version)
+            )
+            return [
+                {
+                    "version": row.version,
+                    "kind": row.kind,
+                    "size": _size(row.payload),
+                    "changes": len(row.payload) if row.kind == "delta" else None,
+                    "created_at": row.created_at.isoformat()
+                }
+                for row in result.all()
+            ]
+
+    async def diff(self, profile_id: int, from_version: int, to_version: int) -> Optional[List[Dict[str, Any]]]:
+        async with ReadSessionLocal() as session:
+            old = await self._materialize(session, profile_id, from_version)
+            new = await self._materialize(session, profile_id, to_version)
+        if old is None or new is None:
+            return None
+        return json_diff.diff(old, new)
+
+profile_snapshots = ProfileSnapshots()
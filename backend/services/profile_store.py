@@ -0,0 +1,298 @@
+import copy
+import hashlib
+import json
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Iterable
+from sqlalchemy import select, delete, func, exists, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+from config import settings
+from database import AsyncSessionLocal, ReadSessionLocal, engine, Profile, ProfileSourceResult, ProfileSourceHistory, PROFILE_RISK_LEVEL, PROFILE_CONFIDENCE
+from cache import cache_manager
+from services.entity_index import entity_index
+from services.search_index import search_index
+from services.profile_snapshots import profile_snapshots
+
+logger = logging.getLogger(__name__)
+
+PROFILE_COUNT_KEY = "profiles:count"
+
+def content_hash(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def correlation_score(profile_data: Dict[str, Any]) -> Optional[float]:
+    scores = (profile_data.get("correlation") or {}).get("confidence_scores")
+    if not scores:
+        return None
+    return sum(scores.values()) / len(scores)
+
+def _map_correlation_sources(correlation: Dict[str, Any], transform) -> Dict[str, Any]:
+    correlation = copy.copy(correlation)
+    for field in ("clusters", "high_confidence_matches"):
+        groups = []
+        for group in correlation.get(field) or []:
+            group = dict(group)
+            entities = []
+            for entity in group.get("entities") or []:
+                entity = dict(entity)
+                if isinstance(entity.get("source"), dict):
+                    entity["source"] = transform(entity["source"])
+                entities.append(entity)
+            group["entities"] = entities
+            groups.append(group)
+        if field in correlation:
+            correlation[field] = groups
+    return correlation
+
+def strip_correlation(correlation: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop the full source payloads the correlation engine embeds in every entity; they live in profile_source_results"""
+    return _map_correlation_sources(correlation, lambda source: {"api": source.get("api")})
+
+def hydrate_correlation(correlation: Dict[str, Any], results: Dict[str, Any]) -> Dict[str, Any]:
+    return _map_correlation_sources(correlation, lambda source: {"api": source.get("api"), "data": results.get(source.get("api"))})
+
+class ProfileStore:
+    """Profile summaries in profiles.data, one row per source result in profile_source_results"""
+    def __init__(self):
+        self.keep_history = settings.PROFILE_SOURCE_HISTORY
+
+    def split(self, profile_data: Dict[str, Any]):
+        summary = {key: value for key, value in profile_data.items() if key != "results"}
+        if isinstance(summary.get("correlation"), dict):
+            summary["correlation"] = strip_correlation(summary["correlation"])
+        return summary, profile_data.get("results") or {}
+
+    async def save(self, profile_id: int, profile_data: Optional[Dict[str, Any]] = None, status: Optional[str] = None,
+                   sources: Optional[Dict[str, Any]] = None, summary_updates: Optional[Dict[str, Any]] = None):
+        async with AsyncSessionLocal() as session:
+            await self.apply(session, profile_id, profile_data, status, sources, summary_updates)
+            await session.commit()
+
+    async def apply(self, session, profile_id: int, profile_data: Optional[Dict[str, Any]] = None, status: Optional[str] = None,
+                    sources: Optional[Dict[str, Any]] = None, summary_updates: Optional[Dict[str, Any]] = None) -> Optional[Profile]:
+        """Apply a full or partial update inside the caller's transaction.
+
+        profile_data replaces the summary and the full set of sources (rows for
+        sources it no longer carries are removed); sources and summary_updates
+        touch only the given sources and summary keys.
+        """
+        result = await session.execute(select(Profile).where(Profile.id == profile_id))
+        profile = result.scalar_one_or_none()
+        if profile is None:
+            return None
+
+        changed_sources: Dict[str, Any] = {}
+        summary = None
+        if profile_data is not None:
+            summary, results = self.split(profile_data)
+            changed_sources.update(results)
+            score = correlation_score(profile_data)
+            if score is not None:
+                profile.correlation_score = score
+        if sources:
+            changed_sources.update(sources)
+        if summary_updates:
+            summary = dict(summary if summary is not None else (profile.data or {}))
+            summary.pop("results", None)
+            for key, value in summary_updates.items():
+                summary[key] = strip_correlation(value) if key == "correlation" and isinstance(value, dict) else value
+            score = correlation_score(summary_updates)
+            if score is not None:
+                profile.correlation_score = score
+
+        if summary is not None:
+            profile.data = summary
+        if status is not None:
+            profile.status = status
+        profile.updated_at = datetime.utcnow()
+
+        if profile_data is not None:
+            await session.execute(
+                delete(ProfileSourceResult).where(
+                    ProfileSourceResult.profile_id == profile_id,
+                    ProfileSourceResult.source.not_in(list(changed_sources.keys()))
+                )
+            )
+        if changed_sources:
+            await self._upsert_sources(session, profile_id, changed_sources)
+        correlation = (summary_updates or {}).get("correlation") or (profile_data or {}).get("correlation")
+        if profile_data is not None or correlation is not None:
+            await self._after_results_changed(session, profile, correlation)
+        return profile
+
+    async def _after_results_changed(self, session, profile: Profile, correlation: Optional[Dict[str, Any]]):
+        """Refresh the derived entity/search indexes and record a snapshot version"""
+        result = await session.execute(
+            select(ProfileSourceResult.source, ProfileSourceResult.data).where(ProfileSourceResult.profile_id == profile.id)
+        )
+        results = {source: data for source, data in result.all()}
+        entities = await entity_index.rebuild(session, profile.id, profile.query, profile.query_type, results, correlation)
+        await search_index.update(session, profile.id, profile.query, entities, results)
+        document = {"summary": profile.data or {}, "results": results}
+        await profile_snapshots.record(session, profile.id, document, content_hash(document))
+
+    async def _upsert_sources(self, session, profile_id: int, sources: Dict[str, Any]):
+        result = await session.execute(
+            select(ProfileSourceResult).where(
+                ProfileSourceResult.profile_id == profile_id,
+                ProfileSourceResult.source.in_(list(sources.keys()))
+            )
+        )
+        existing = {row.source: row for row in result.scalars().all()}
+        for source, data in sources.items():
+            digest = content_hash(data)
+            row = existing.get(source)
+            if row is not None and row.content_hash == digest:
+                continue
+            if row is None:
+                row = ProfileSourceResult(profile_id=profile_id, source=source, data=data, content_hash=digest, version=1)
+                session.add(row)
+            else:
+                row.data = data
+                row.content_hash = digest
+                row.version = (row.version or 1) + 1
+            if self.keep_history:
+                session.add(ProfileSourceHistory(
+                    profile_id=profile_id,
+                    source=source,
+                    version=row.version,
+                    data=data,
+                    content_hash=digest
+                ))
+
+    async def load(self, profile_id: int, parts: Optional[Iterable[str]] = None) -> Optional[Dict[str, Any]]:
+        async with ReadSessionLocal() as session:
+            return await self.load_with_session(session, profile_id, parts)
+
+    async def load_with_session(self, session, profile_id: int, parts: Optional[Iterable[str]] = None) -> Optional[Dict[str, Any]]:
+        """Assemble a profile; parts limits the payload to top-level keys, "results" or "results.<source>" """
+        parts = [part for part in (parts or []) if part]
+        wanted_keys = {part.split(".", 1)[0] for part in parts}
+        wanted_sources = {part.split(".", 1)[1] for part in parts if part.startswith("results.")}
+        all_sources = not parts or "results" in parts or "correlation" in wanted_keys
+
+        columns = [Profile.id, Profile.query, Profile.query_type, Profile.status,
+                   Profile.correlation_score, Profile.created_at, Profile.updated_at]
+        if not parts or wanted_keys - {"results"}:
+            columns.append(Profile.data)
+        result = await session.execute(select(*columns).where(Profile.id == profile_id))
+        row = result.one_or_none()
+        if row is None:
+            return None
+
+        stored = dict(getattr(row, "data", None) or {})
+        results = stored.pop("results", None) or {}
+        if "results" in wanted_keys or not parts or "correlation" in wanted_keys:
+            query = select(ProfileSourceResult.source, ProfileSourceResult.data).where(ProfileSourceResult.profile_id == profile_id)
+            if not all_sources:
+                query = query.where(ProfileSourceResult.source.in_(list(wanted_sources)))
+            source_rows = await session.execute(query)
+            for source, data in source_rows.all():
+                results[source] = data
+
+        data = stored
+        if not parts or "results" in wanted_keys:
+            data["results"] = results if all_sources else {k: v for k, v in results.items() if k in wanted_sources}
+        if isinstance(data.get("correlation"), dict):
+            data["correlation"] = hydrate_correlation(data["correlation"], results)
+        if parts:
+            data = {key: value for key, value in data.items() if key in wanted_keys}
+
+        return {
+            "id": row.id,
+            "query": row.query,
+            "query_type": row.query_type,
+            "status": row.status,
+            "data": data,
+            "correlation_score": row.correlation_score,
+            "created_at": row.created_at,
+            "updated_at": row.updated_at,
+            "pending_apis": stored.get("pending_apis", [])
+        }
+
+    async def source_history(self, profile_id: int, source: str) -> List[Dict[str, Any]]:
+        async with ReadSessionLocal() as session:
+            result = await session.execute(
+                select(ProfileSourceHistory)
+                .where(ProfileSourceHistory.profile_id == profile_id, ProfileSourceHistory.source == source)
+                .order_by(ProfileSourceHistory.version.desc())
+            )
+            return [
+                {"version": row.version, "data": row.data, "created_at": row.created_at.isoformat()}
+                for row in result.scalars().all()
+            ]
+
+    def _source_match(self, source: str, path: List[str], value: str):
+        """Clause matching profiles whose stored result for source has value at path"""
+        condition = [ProfileSourceResult.profile_id == Profile.id, ProfileSourceResult.source == source]
+        if engine.dialect.name == "postgresql":
+            # Containment is served by the jsonb_path_ops GIN index
+            document: Any = value
+            for key in reversed(path):
+                document = {key: document}
+            condition.append(type_coerce(ProfileSourceResult.data, JSONB).contains(document))
+        else:
+            condition.append(ProfileSourceResult.data[tuple(path)].as_string() == value)
+        return exists().where(*condition)
+
+    async def filter(self, risk_level: Optional[str] = None, min_confidence: Optional[float] = None, max_confidence: Optional[float] = None,
+                     sources: Optional[List[str]] = None, source_match: Optional[List[str]] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Triage query over indexed JSON paths; source_match items look like "github.user.login=octocat" """
+        query = select(
+            Profile.id, Profile.query, Profile.query_type, Profile.status, Profile.created_at,
+            PROFILE_RISK_LEVEL.label("risk_level"), PROFILE_CONFIDENCE.label("confidence_score")
+        )
+        if risk_level:
+            query = query.where(PROFILE_RISK_LEVEL == risk_level)
+        if min_confidence is not None:
+            query = query.where(PROFILE_CONFIDENCE >= min_confidence)
+        if max_confidence is not None:
+            query = query.where(PROFILE_CONFIDENCE <= max_confidence)
+        for source in sources or []:
+            query = query.where(exists().where(ProfileSourceResult.profile_id == Profile.id, ProfileSourceResult.source == source))
+        for item in source_match or []:
+            path, _, value = item.partition("=")
+            source, *keys = path.split(".")
+            if not keys:
+                raise ValueError(f"Invalid source match {item!r}, expected source.path=value")
+            query = query.where(self._source_match(source, keys, value))
+        query = query.order_by(Profile.created_at.desc(), Profile.id.desc()).limit(limit)
+
+        async with ReadSessionLocal() as session:
+            result = await session.execute(query)
+            return [
+                {
+                    "id": row.id,
+                    "query": row.query,
+                    "query_type": row.query_type,
+                    "status": row.status,
+                    "created_at": row.created_at.isoformat(),
+                    "risk_level": row.risk_level,
+                    "confidence_score": row.confidence_score
+                }
+                for row in result.all()
+            ]
+
+    async def count(self) -> int:
+        """Total number of profiles from the Redis counter, initialised from COUNT(*) when missing"""
+        cached = await cache_manager.get(PROFILE_COUNT_KEY)
+        if isinstance(cached, int):
+            return cached
+        total = await self._count_rows()
+        await cache_manager.set_counter(PROFILE_COUNT_KEY, total, only_if_missing=True)
+        return total
+
+    async def adjust_count(self, amount: int):
+        await cache_manager.increment_existing(PROFILE_COUNT_KEY, amount)
+
+    async def reconcile_count(self) -> int:
+        total = await self._count_rows()
+        await cache_manager.set_counter(PROFILE_COUNT_KEY, total)
+        return total
+
+    async def _count_rows(self) -> int:
+        async with ReadSessionLocal() as session:
+            result = await session.execute(select(func.count(Profile.id)))
+            return result.scalar_one()
+
+profile_store = ProfileStore()
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import select, delete, text
+from config import settings
+from database import (
+    AsyncSessionLocal, engine, Profile, ProfileSourceResult, ProfileSourceHistory, ProfileEntity, Correlation, ProfileSnapshot,
+    ensure_profile_partitions, month_start
+)
+from cache import cache_manager
+from services.profile_store import profile_store
+from services.search_index import search_index
+
+logger = logging.getLogger(__name__)
+
+# Tables keyed by profile_id that are removed together with their profile
+PROFILE_DEPENDENTS = [ProfileSourceResult, ProfileSourceHistory, ProfileEntity, Correlation, ProfileSnapshot]
+
+PARTITION_NAME = re.compile(r"^profiles_y(\d{4})m(\d{2})$")
+
+class RetentionManager:
+    """Expires old profiles in bounded batches, or by dropping whole monthly partitions on Postgres"""
+    def __init__(self):
+        self.batch_size = settings.RETENTION_BATCH_SIZE
+        self.batch_pause = settings.RETENTION_BATCH_PAUSE
+
+    @property
+    def partitioned(self) -> bool:
+        return engine.dialect.name == "postgresql" and settings.PROFILES_PARTITIONED
+
+    async def run(self, retention_days: Optional[int] = None) -> Dict[str, int]:
+        cutoff = datetime.utcnow() - timedelta(days=retention_days or settings.PROFILE_RETENTION_DAYS)
+        stats = {"partitions_dropped": 0, "profiles_deleted": 0}
+        if self.partitioned:
+            async with engine.begin() as conn:
+                await ensure_profile_partitions(conn)
+            stats["partitions_dropped"] = await self.drop_expired_partitions(cutoff)
+        stats["profiles_deleted"] = await self.purge_profiles(cutoff)
+        return stats
+
+    async def _delete_dependents(self, session, profile_ids: List[int]):
+        for model in PROFILE_DEPENDENTS:
+            await session.execute(delete(model).where(model.profile_id.in_(profile_ids)))
+        await search_index.delete(session, profile_ids)
+
+    async def _forget(self, profile_ids: List[int]):
+        await profile_store.adjust_count(-len(profile_ids))
+        await cache_manager.invalidate_tags([f"profile:{profile_id}" for profile_id in profile_ids])
+
+    async def purge_profiles(self, cutoff: datetime) -> int:
+        """Set-based DELETEs of at most batch_size profiles (and their dependent rows) per transaction"""
+        removed = 0
+        while True:
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(
+                    select(Profile.id).where(Profile.created_at < cutoff).order_by(Profile.created_at).limit(self.batch_size)
+                )
+                profile_ids = [row[0] for row in result.all()]
+                if not profile_ids:
+                    break
+                await self._delete_dependents(session, profile_ids)
+                await session.execute(delete(Profile).where(Profile.id.in_(profile_ids)))
+                await session.commit()
+            removed += len(profile_ids)
+            await self._forget(profile_ids)
+            if len(profile_ids) < self.batch_size:
+                break
+            # Yield between batches so readers and the WAL checkpointer are not starved
+            await asyncio.sleep(self.batch_pause)
+        if removed:
+            logger.info(f"Retention removed {removed} profiles older than {cutoff.isoformat()}")
+        return removed
+
+    async def drop_expired_partitions(self, cutoff: datetime) -> int:
+        """Drop monthly partitions whose whole range is older than cutoff"""
+        async with engine.connect() as conn:
+            result = await conn.execute(text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+                "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+                "WHERE parent.relname = 'profiles'"
+            ))
+            partitions = [row[0] for row in result.all()]
+
+        dropped = 0
+        for name in sorted(partitions):
+            match = PARTITION_NAME.match(name)
+            if not match:
+                continue
+            end = month_start(datetime(int(match.group(1)), int(match.group(2)), 1), 1)
+            if end > cutoff:
+                continue
+            await self._drop_partition(name)
+            dropped += 1
+        return dropped
+
+    async def _drop_partition(self, name: str):
+        # Dependent tables are not partitioned: clear their rows in id-ordered batches, then drop the partition whole
+        last_id = 0
+        while True:
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(
+                    text(f"SELECT id FROM {name} WHERE id > :last_id ORDER BY id LIMIT :limit"),
+                    {"last_id": last_id, "limit": self.batch_size}
+                )
+                profile_ids = [row[0] for row in result.all()]
+                if not profile_ids:
+                    break
+                await self._delete_dependents(session, profile_ids)
+                await session.commit()
+            last_id = profile_ids[-1]
+            await self._forget(profile_ids)
+            await asyncio.sleep(self.batch_pause)
+        async with engine.begin() as conn:
+            await conn.execute(text(f"ALTER TABLE profiles DETACH PARTITION {name}"))
+            await conn.execute(text(f"DROP TABLE {name}"))
+        logger.info(f"Retention dropped profile partition {name}")
+
+retention_manager = RetentionManager()
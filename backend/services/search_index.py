@@ -0,0 +1,133 @@
+import logging
+import re
+from datetime import datetime
+from typing import Dict, Any, List, Iterable
+from sqlalchemy import text
+from config import settings
+from database import ReadSessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+# Keys whose string values are indexed as free text wherever they appear in a source result
+TEXT_FIELDS = {"bio", "description", "title", "summary", "text", "about", "company", "full_name", "public_description"}
+
+TOKEN = re.compile(r"\w+", re.UNICODE)
+
+def collect_text(value: Any, parts: List[str], limit: int, key: str = None):
+    if sum(len(part) for part in parts) >= limit:
+        return
+    if isinstance(value, dict):
+        for child_key, child in value.items():
+            collect_text(child, parts, limit, child_key)
+    elif isinstance(value, list):
+        for child in value:
+            collect_text(child, parts, limit, key)
+    elif isinstance(value, str) and key in TEXT_FIELDS and value.strip():
+        parts.append(value.strip())
+
+def _isoformat(value: Any) -> Any:
+    # Raw SQL on SQLite returns DATETIME columns as their stored text; parse it so both backends serialize alike
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    return value.isoformat() if value is not None else None
+
+class SearchIndex:
+    """Ranked full-text search over profiles: FTS5 on SQLite, tsvector/GIN on Postgres"""
+    def __init__(self):
+        self.dialect = engine.dialect.name
+        self.enabled = settings.SEARCH_INDEX_ENABLED and self.dialect in ("sqlite", "postgresql")
+        self.max_text = settings.SEARCH_INDEX_MAX_TEXT
+
+    def document(self, query: str, entities: Iterable[Dict[str, Any]], results: Dict[str, Any]) -> Dict[str, str]:
+        parts: List[str] = []
+        for data in results.values():
+            collect_text(data, parts, self.max_text)
+        return {
+            "query": query or "",
+            "entities": " ".join(sorted({entity["value"] for entity in entities})),
+            "content": " ".join(parts)[:self.max_text]
+        }
+
+    async def update(self, session, profile_id: int, query: str, entities: Iterable[Dict[str, Any]], results: Dict[str, Any]):
+        """Replace a profile's index entry inside the caller's transaction; a failure never fails the save"""
+        if not self.enabled:
+            return
+        doc = self.document(query, entities, results)
+        try:
+            async with session.begin_nested():
+                if self.dialect == "sqlite":
+                    await session.execute(text("DELETE FROM profile_search WHERE profile_id = :profile_id"), {"profile_id": profile_id})
+                    await session.execute(
+                        text("INSERT INTO profile_search (profile_id, query, entities, content) VALUES (:profile_id, :query, :entities, :content)"),
+                        {"profile_id": profile_id, **doc}
+                    )
+                else:
+                    await session.execute(
+                        text(
+                            "INSERT INTO profile_search (profile_id, document, updated_at) VALUES (:profile_id, "
+                            "setweight(to_tsvector('simple', :query), 'A') || "
+                            "setweight(to_tsvector('simple', :entities), 'B') || "
+                            "setweight(to_tsvector('simple', :content), 'C'), now()) "
+                            "ON CONFLICT (profile_id) DO UPDATE SET document = EXCLUDED.document, updated_at = EXCLUDED.updated_at"
+                        ),
+                        {"profile_id": profile_id, **doc}
+                    )
+        except Exception as e:
+            logger.error(f"Search index update error for profile {profile_id}: {e}")
+
+    async def delete(self, session, profile_ids: List[int]):
+        if not self.enabled or not profile_ids:
+            return
+        try:
+            async with session.begin_nested():
+                params = {f"id{i}": profile_id for i, profile_id in enumerate(profile_ids)}
+                placeholders = ", ".join(f":{name}" for name in params)
+                await session.execute(text(f"DELETE FROM profile_search WHERE profile_id IN ({placeholders})"), params)
+        except Exception as e:
+            logger.error(f"Search index delete error: {e}")
+
+    def _terms(self, q: str) -> List[str]:
+        return TOKEN.findall(q.lower())[:16]
+
+    async def search(self, q: str, limit: int = 50) -> List[Dict[str, Any]]:
+        terms = self._terms(q)
+        if not self.enabled or not terms:
+            return []
+        if self.dialect == "sqlite":
+            # Every term quoted (no FTS syntax from user input) and prefix-matched; bm25 weights query > entities > content
+            match = " ".join(f'"{term}"*' for term in terms)
+            sql = (
+                "SELECT p.id, p.query, p.query_type, p.status, p.created_at, "
+                "bm25(profile_search, 0.0, 10.0, 5.0, 1.0) AS rank, "
+                "snippet(profile_search, 3, '[', ']', '...', 12) AS snippet "
+                "FROM profile_search JOIN profiles p ON p.id = profile_search.profile_id "
+                "WHERE profile_search MATCH :match ORDER BY rank LIMIT :limit"
+            )
+        else:
+            match = " & ".join(f"{term}:*" for term in terms)
+            sql = (
+                "SELECT p.id, p.query, p.query_type, p.status, p.created_at, "
+                "ts_rank_cd(s.document, to_tsquery('simple', :match)) AS rank, NULL AS snippet "
+                "FROM profile_search s JOIN profiles p ON p.id = s.profile_id "
+                "WHERE s.document @@ to_tsquery('simple', :match) ORDER BY rank DESC LIMIT :limit"
+            )
+        async with ReadSessionLocal() as session:
+            result = await session.execute(text(sql), {"match": match, "limit": limit})
+            rows = result.all()
+        return [
+            {
+                "id": row.id,
+                "query": row.query,
+                "query_type": row.query_type,
+                "status": row.status,
+                "created_at": _isoformat(row.created_at),
+                "score": abs(row.rank) if row.rank is not None else 0.0,
+                "snippet": row.snippet
+            }
+            for row in rows
+        ]
+
+search_index = SearchIndex()
@@ -1,10 +1,20 @@
 from celery import Celery
 from config import settings
 from services.orchestrator import APIOrchestrator
-from database import AsyncSessionLocal, Profile
+from services.persistent_cache import persistent_cache
+from cache import cache_manager
+from services.cache_warmer import cache_warmer
+from services.profile_store import profile_store
+from services.persistence_queue import persistence_queue
+from services.api_metrics import api_metrics
+from services.retention import retention_manager
+from utils.rate_limiter import rate_limit_priority, PRIORITY_BATCH
+from database import ReadSessionLocal, Profile, dispose_engines
 from sqlalchemy import select
 from datetime import datetime, timedelta
+from typing import Optional
 import asyncio
+import time
 
 celery_app = Celery(
     "osint_tasks",
@@ -21,77 +31,121 @@ celery_app.conf.update(
     task_track_started=True,
     task_time_limit=300,
     worker_prefetch_multiplier=4,
-    worker_max_tasks_per_child=1000
+    worker_max_tasks_per_child=1000,
+    broker_transport_options={"visibility_timeout": settings.CELERY_VISIBILITY_TIMEOUT}
 )
 
+def run_async(coro):
+    async def _runner():
+        await persistent_cache.start()
+        await persistence_queue.start()
+        await api_metrics.start()
+        try:
+            # Background refreshes queue behind interactive searches for shared API rate limits
+            with rate_limit_priority(PRIORITY_BATCH):
+                return await coro
+        finally:
+            await persistence_queue.stop()
+            await api_metrics.stop()
+            await persistent_cache.stop()
+            # The Redis client and batcher are bound to this task's event loop, which asyncio.run closes next
+            await cache_manager.disconnect()
+            await dispose_engines()
+    return asyncio.run(_runner())
+
 @celery_app.task(name="refresh_profile")
-def refresh_profile_task(profile_id: int):
+def refresh_profile_task(profile_id: int, run_at: Optional[float] = None):
+    if run_at is not None and run_at > time.time():
+        defer_refresh(profile_id, run_at)
+        return
+    
     async def _refresh():
         orchestrator = APIOrchestrator()
-        async with AsyncSessionLocal() as session:
-            result = await session.execute(select(Profile).where(Profile.id == profile_id))
-            profile = result.scalar_one_or_none()
-            
-            if profile:
-                result_data = await orchestrator.search(profile.query, profile.query_type, profile_id)
-                profile.data = result_data
-                profile.updated_at = datetime.utcnow()
-                await session.commit()
+        async with ReadSessionLocal() as session:
+            result = await session.execute(select(Profile.query, Profile.query_type).where(Profile.id == profile_id))
+            profile = result.one_or_none()
+        
+        if profile:
+            result_data = await orchestrator.search(profile.query, profile.query_type, profile_id)
+            persistence_queue.enqueue(profile_id, result_data)
         
         await orchestrator.close()
     
-    asyncio.run(_refresh())
+    run_async(_refresh())
+
+def defer_refresh(profile_id: int, run_at: float):
+    """Refresh profile_id at the unix time run_at, in hops short enough that the broker never redelivers a waiting task"""
+    countdown = min(max(0.0, run_at - time.time()), settings.QUOTA_DEFER_MAX_COUNTDOWN)
+    refresh_profile_task.apply_async(args=[profile_id, run_at], countdown=countdown)
 
 @celery_app.task(name="batch_refresh_profiles")
 def batch_refresh_profiles_task():
     async def _batch_refresh():
         orchestrator = APIOrchestrator()
-        async with AsyncSessionLocal() as session:
+        async with ReadSessionLocal() as session:
             cutoff_date = datetime.utcnow() - timedelta(days=1)
             result = await session.execute(
-                select(Profile).where(
+                select(Profile.id, Profile.query, Profile.query_type).where(
                     Profile.updated_at < cutoff_date,
                     Profile.status == "complete"
                 ).limit(100)
             )
-            profiles = result.scalars().all()
-            
-            for profile in profiles:
-                try:
-                    result_data = await orchestrator.search(profile.query, profile.query_type, profile.id)
-                    profile.data = result_data
-                    profile.updated_at = datetime.utcnow()
-                except Exception as e:
-                    print(f"Error refreshing profile {profile.id}: {e}")
-            
-            await session.commit()
+            profiles = result.all()
+        
+        for profile in profiles:
+            try:
+                result_data = await orchestrator.search(profile.query, profile.query_type, profile.id)
+                persistence_queue.enqueue(profile.id, result_data)
+            except Exception as e:
+                print(f"Error refreshing profile {profile.id}: {e}")
         
         await orchestrator.close()
     
-    asyncio.run(_batch_refresh())
+    run_async(_batch_refresh())
 
 @celery_app.task(name="cleanup_old_profiles")
 def cleanup_old_profiles_task():
     async def _cleanup():
-        async with AsyncSessionLocal() as session:
-            cutoff_date = datetime.utcnow() - timedelta(days=90)
-            result = await session.execute(
-                select(Profile).where(Profile.created_at < cutoff_date)
-            )
-            old_profiles = result.scalars().all()
-            
-            for profile in old_profiles:
-                await session.delete(profile)
-            
-            await session.commit()
+        stats = await retention_manager.run()
+        await profile_store.reconcile_count()
+        await persistent_cache.sweep()
+        return stats
     
-    asyncio.run(_cleanup())
+    return run_async(_cleanup())
+
+@celery_app.task(name="warm_popular_profiles")
+def warm_popular_profiles_task():
+    async def _warm():
+        orchestrator = APIOrchestrator()
+        try:
+            return await cache_warmer.warm(orchestrator)
+        finally:
+            await orchestrator.close()
+    
+    return run_async(_warm())
+
+@celery_app.task(name="rollup_api_metrics")
+def rollup_api_metrics_task():
+    async def _rollup():
+        rolled_up = await api_metrics.rollup()
+        removed = await api_metrics.compact()
+        return {"rollups": rolled_up, "removed": removed}
+    
+    return run_async(_rollup())
 
 celery_app.conf.beat_schedule = {
     "batch-refresh-profiles": {
         "task": "batch_refresh_profiles",
         "schedule": 3600.0,
     },
+    "warm-popular-profiles": {
+        "task": "warm_popular_profiles",
+        "schedule": settings.CACHE_WARM_INTERVAL,
+    },
+    "rollup-api-metrics": {
+        "task": "rollup_api_metrics",
+        "schedule": 60.0,
+    },
     "cleanup-old-profiles": {
         "task": "cleanup_old_profiles",
         "schedule": 86400.0,
@@ -0,0 +1,57 @@
+import asyncio
+import fakeredis.aioredis
+from cache import cache_manager, CACHE_STATE_CONNECTED
+from api_clients.base import BaseAPIClient
+from utils.bulkhead import bulkheads, Bulkhead
+
+class StubClient(BaseAPIClient):
+    def __init__(self):
+        super().__init__("shedtest", rate_limit=600)
+
+    async def search(self, query, query_type):
+        return await self._cached_call(self.cache_key(query_type, query), lambda: self._fetch("GET", "http://upstream.invalid/lookup"))
+
+def test_shed_call_is_not_cached_in_redis():
+    async def run():
+        redis_client = fakeredis.aioredis.FakeRedis()
+        cache_manager.redis_client = redis_client
+        cache_manager.state = CACHE_STATE_CONNECTED
+        client = StubClient()
+        # A full bulkhead with no queue sheds the call before any request is made
+        bulkhead = Bulkhead("shedtest", 1, 0, 0.1)
+        bulkheads.apis["shedtest"] = bulkhead
+        await bulkhead.acquire()
+        try:
+            result = await client.search("alice", "username")
+            keys = [key for key in await redis_client.keys("*") if b"alice" in key]
+        finally:
+            bulkhead.release()
+            await client.close()
+            await cache_manager.disconnect()
+        return result, keys
+
+    result, keys = asyncio.run(run())
+    assert result is None
+    assert keys == []
+
+def test_circuit_open_result_is_not_cached():
+    async def run():
+        redis_client = fakeredis.aioredis.FakeRedis()
+        cache_manager.redis_client = redis_client
+        cache_manager.state = CACHE_STATE_CONNECTED
+        client = StubClient()
+        client.circuit_breaker.shared = False
+        client.circuit_breaker._open_local(0.0)
+        client.circuit_breaker.open_until = float("inf")
+        try:
+            result = await client.search("bob", "username")
+            keys = [key for key in await redis_client.keys("*") if b"bob" in key]
+        finally:
+            await client.circuit_breaker.reset()
+            await client.close()
+            await cache_manager.disconnect()
+        return result, keys
+
+    result, keys = asyncio.run(run())
+    assert result is None
+    assert keys == []
@@ -0,0 +1,38 @@
+import asyncio
+import fakeredis.aioredis
+from cache import CacheManager, CacheBatcher, CACHE_STATE_CONNECTED
+
+def make_manager() -> CacheManager:
+    manager = CacheManager()
+    manager.batcher = CacheBatcher(manager, 0.05)
+    manager.redis_client = fakeredis.aioredis.FakeRedis()
+    manager.state = CACHE_STATE_CONNECTED
+    return manager
+
+def test_batcher_survives_consecutive_event_loops():
+    manager = make_manager()
+
+    async def abandon_pending_flush():
+        # Leave a get waiting on the flush window when the loop shuts down
+        asyncio.get_running_loop().create_task(manager.batcher.get("key"))
+        await asyncio.sleep(0)
+
+    async def round_trip():
+        manager.redis_client = fakeredis.aioredis.FakeRedis()
+        await asyncio.wait_for(manager.batcher.set("key", manager.codec.encode({"value": 1}), 60), 2)
+        return await asyncio.wait_for(manager.batcher.get("key"), 2)
+
+    asyncio.run(abandon_pending_flush())
+    assert asyncio.run(round_trip()) == {"value": 1}
+    assert asyncio.run(round_trip()) == {"value": 1}
+
+def test_disconnect_resets_loop_bound_state():
+    manager = make_manager()
+
+    async def use_and_disconnect():
+        await manager.batcher.set("key", manager.codec.encode("v"), 60)
+        await manager.disconnect()
+
+    asyncio.run(use_and_disconnect())
+    assert manager.redis_client is None
+    assert manager.batcher.loop is None and manager.batcher.flush_task is None
@@ -0,0 +1,29 @@
+import asyncio
+import time
+import fakeredis.aioredis
+from cache import cache_manager, CACHE_STATE_CONNECTED
+from config import settings
+
+def test_waiter_gives_up_after_default_lock_wait(monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_LOCK_WAIT", 0.3)
+
+    async def fetch():
+        return {"fetched": True}
+
+    async def run():
+        redis_client = fakeredis.aioredis.FakeRedis()
+        cache_manager.redis_client = redis_client
+        cache_manager.state = CACHE_STATE_CONNECTED
+        try:
+            # Another worker holds the rebuild lock for the full default lock timeout
+            await redis_client.set("lockwait:key:lock", "other-worker", px=int(settings.CACHE_LOCK_TIMEOUT * 1000))
+            start = time.monotonic()
+            value = await cache_manager.get_or_set("lockwait:key", fetch, 60)
+            elapsed = time.monotonic() - start
+        finally:
+            await cache_manager.disconnect()
+        return value, elapsed
+
+    value, elapsed = asyncio.run(run())
+    assert value == {"fetched": True}
+    assert 0.3 <= elapsed < 1.0
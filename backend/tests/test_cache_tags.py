@@ -0,0 +1,42 @@
+import asyncio
+import fakeredis.aioredis
+from cache import cache_manager, cache_tag_scope, CACHE_STATE_CONNECTED
+
+def test_invalidate_tag_removes_every_tagged_key():
+    async def run():
+        redis_client = fakeredis.aioredis.FakeRedis()
+        cache_manager.redis_client = redis_client
+        cache_manager.state = CACHE_STATE_CONNECTED
+        try:
+            await cache_manager.set("tagged:a", {"n": 1}, 60, tags=["profile:1"])
+            with cache_tag_scope("profile:1"):
+                await cache_manager.set("tagged:b", {"n": 2}, 60)
+            await cache_manager.set("tagged:c", {"n": 3}, 60, tags=["profile:2"])
+            removed = await cache_manager.invalidate_tag("profile:1")
+            remaining = sorted(key.decode() for key in await redis_client.keys("tagged:*"))
+            tag_keys = sorted(key.decode() for key in await redis_client.keys("tags:*"))
+        finally:
+            await cache_manager.disconnect()
+        return removed, remaining, tag_keys
+
+    removed, remaining, tag_keys = asyncio.run(run())
+    assert removed == 2
+    assert remaining == ["tagged:c"]
+    assert tag_keys == ["tags:profile:2"]
+
+def test_expired_members_are_pruned_on_write():
+    async def run():
+        redis_client = fakeredis.aioredis.FakeRedis()
+        cache_manager.redis_client = redis_client
+        cache_manager.state = CACHE_STATE_CONNECTED
+        try:
+            await cache_manager.set("short:a", 1, 1, tags=["busy"])
+            await cache_manager.set("short:b", 2, 1, tags=["busy"])
+            await asyncio.sleep(1.1)
+            await cache_manager.set("long:c", 3, 60, tags=["busy"])
+            members = sorted(member.decode() for member in await redis_client.zrange("tags:busy", 0, -1))
+        finally:
+            await cache_manager.disconnect()
+        return members
+
+    assert asyncio.run(run()) == ["long:c"]
@@ -0,0 +1,61 @@
+import asyncio
+from types import SimpleNamespace
+import fakeredis.aioredis
+from cache import cache_manager, CACHE_STATE_CONNECTED
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+async def failing_response():
+    return SimpleNamespace(status_code=503)
+
+async def ok_response():
+    return SimpleNamespace(status_code=200)
+
+def test_reset_clears_shared_state():
+    async def run():
+        redis_client = fakeredis.aioredis.FakeRedis()
+        cache_manager.redis_client = redis_client
+        cache_manager.state = CACHE_STATE_CONNECTED
+        breaker = CircuitBreaker("resettest", threshold=3, timeout=60)
+        other_worker = CircuitBreaker("resettest", threshold=3, timeout=60)
+        try:
+            for _ in range(3):
+                await breaker.call(failing_response)
+            try:
+                await other_worker.call(ok_response)
+                opened_everywhere = False
+            except CircuitOpenError:
+                opened_everywhere = True
+
+            await breaker.reset()
+            keys = await redis_client.keys("breaker:*")
+            result = await other_worker.call(ok_response)
+        finally:
+            await cache_manager.disconnect()
+        return opened_everywhere, keys, result.status_code, breaker.state
+
+    opened_everywhere, keys, status_code, state = asyncio.run(run())
+    assert opened_everywhere
+    assert keys == []
+    assert status_code == 200
+    assert state == "closed"
+
+def test_probe_count_never_goes_negative():
+    async def run():
+        redis_client = fakeredis.aioredis.FakeRedis()
+        cache_manager.redis_client = redis_client
+        cache_manager.state = CACHE_STATE_CONNECTED
+        breaker = CircuitBreaker("probeclamp", threshold=3, timeout=60)
+        try:
+            await redis_client.hset(breaker.state_key, mapping={"state": 2, "probes": 1, "successes": 0, "probe_deadline": 0})
+            local, probe = await breaker._acquire()
+            # The probe's slot is reclaimed before it reports back, as after a probe timeout
+            await redis_client.hset(breaker.state_key, "probes", 0)
+            await breaker._record(local, probe, False, False)
+            probes = int(await redis_client.hget(breaker.state_key, "probes"))
+        finally:
+            await cache_manager.disconnect()
+        return probe, probes
+
+    probe, probes = asyncio.run(run())
+    assert probe
+    assert probes == 0
@@ -0,0 +1,31 @@
+import time
+import tasks
+from config import settings
+
+def capture_apply_async(monkeypatch):
+    calls = []
+    monkeypatch.setattr(tasks.refresh_profile_task, "apply_async", lambda args, countdown: calls.append((args, countdown)))
+    return calls
+
+def test_long_deferral_is_split_below_visibility_timeout(monkeypatch):
+    calls = capture_apply_async(monkeypatch)
+    run_at = time.time() + 3 * 86400
+    tasks.defer_refresh(42, run_at)
+    assert calls == [([42, run_at], settings.QUOTA_DEFER_MAX_COUNTDOWN)]
+    assert settings.QUOTA_DEFER_MAX_COUNTDOWN < settings.CELERY_VISIBILITY_TIMEOUT
+
+def test_early_hop_re_defers_instead_of_refreshing(monkeypatch):
+    calls = capture_apply_async(monkeypatch)
+    monkeypatch.setattr(tasks, "run_async", lambda coro: (coro.close(), calls.append("refreshed")))
+    run_at = time.time() + 600
+    tasks.refresh_profile_task(42, run_at)
+    assert len(calls) == 1
+    args, countdown = calls[0]
+    assert args == [42, run_at]
+    assert 595 <= countdown <= 600
+
+def test_due_refresh_runs(monkeypatch):
+    calls = capture_apply_async(monkeypatch)
+    monkeypatch.setattr(tasks, "run_async", lambda coro: (coro.close(), calls.append("refreshed")))
+    tasks.refresh_profile_task(42, time.time() - 1)
+    assert calls == ["refreshed"]
@@ -0,0 +1,31 @@
+import asyncio
+from database import init_db, dispose_engines, AsyncSessionLocal, Profile
+from services.profile_store import profile_store
+
+def profile_data(results):
+    return {"query": "alice", "query_type": "username", "results": results, "correlation": {}, "status": "complete"}
+
+def test_full_snapshot_drops_sources_it_no_longer_carries():
+    async def run():
+        await init_db()
+        try:
+            async with AsyncSessionLocal() as session:
+                profile = Profile(query="alice", query_type="username", data={}, status="pending")
+                session.add(profile)
+                await session.commit()
+                profile_id = profile.id
+
+            await profile_store.save(profile_id, profile_data({"github": {"login": "alice"}, "reddit": {"name": "alice"}}))
+            await profile_store.save(profile_id, profile_data({"github": {"login": "alice2"}}))
+            first = await profile_store.load(profile_id)
+
+            # Partial updates still only touch the sources they carry
+            await profile_store.save(profile_id, sources={"twitter": {"handle": "alice"}})
+            second = await profile_store.load(profile_id)
+            return first["data"]["results"], second["data"]["results"]
+        finally:
+            await dispose_engines()
+
+    first, second = asyncio.run(run())
+    assert first == {"github": {"login": "alice2"}}
+    assert second == {"github": {"login": "alice2"}, "twitter": {"handle": "alice"}}
@@ -0,0 +1,96 @@
+import asyncio
+from datetime import datetime
+import fakeredis.aioredis
+from cache import cache_manager, CACHE_STATE_CONNECTED
+from utils.quota import QuotaLedger, VALUE_HIGH, VALUE_MEDIUM, VALUE_LOW
+from utils.rate_limiter import PRIORITY_INTERACTIVE, PRIORITY_BATCH
+
+def make_period(used, limit=100, forecast=None, elapsed=0.5, resets_in=3600, period="day"):
+    return {
+        "period": period,
+        "limit": limit,
+        "used": used,
+        "remaining": max(0, limit - used),
+        "forecast": forecast,
+        "resets_in": resets_in,
+        "elapsed": elapsed,
+        "known": True
+    }
+
+def make_ledger(periods=None) -> QuotaLedger:
+    ledger = QuotaLedger()
+    ledger.quotas = {"quotatest": {"day": 100}}
+    ledger.reserve = 0.2
+    ledger.batch_burst = 0.05
+    if periods is not None:
+        async def status(api_name):
+            return periods
+        ledger.status = status
+    return ledger
+
+def test_interactive_reserve_gives_way_by_call_value():
+    ledger = make_ledger()
+    period = make_period(used=85)
+    assert ledger._admits(period, PRIORITY_INTERACTIVE, VALUE_HIGH)
+    assert ledger._admits(period, PRIORITY_INTERACTIVE, VALUE_MEDIUM)
+    assert not ledger._admits(period, PRIORITY_INTERACTIVE, VALUE_LOW)
+    # A forecast within the limit lets low-value calls into the reserve too
+    assert ledger._admits(make_period(used=85, forecast=95), PRIORITY_INTERACTIVE, VALUE_LOW)
+    assert not ledger._admits(make_period(used=100), PRIORITY_INTERACTIVE, VALUE_HIGH)
+
+def test_batch_stays_out_of_reserve_and_is_paced():
+    ledger = make_ledger()
+    assert not ledger._admits(make_period(used=80, elapsed=1.0), PRIORITY_BATCH, VALUE_HIGH)
+    # Half way through the period batch may have used (100 - 20) * 0.5 + 100 * 0.05 = 45 calls
+    assert ledger._admits(make_period(used=44), PRIORITY_BATCH, VALUE_HIGH)
+    assert not ledger._admits(make_period(used=45), PRIORITY_BATCH, VALUE_HIGH)
+
+def test_seconds_until_reset_follows_admission():
+    periods = [
+        make_period(used=85, resets_in=3600),
+        make_period(used=500, limit=1000, resets_in=86400, period="month")
+    ]
+    ledger = make_ledger(periods)
+
+    async def run():
+        return {
+            value: (
+                await ledger.admit("quotatest", value, PRIORITY_INTERACTIVE),
+                await ledger.seconds_until_reset("quotatest", value, PRIORITY_INTERACTIVE)
+            )
+            for value in (VALUE_HIGH, VALUE_MEDIUM, VALUE_LOW)
+        }
+
+    results = asyncio.run(run())
+    assert results[VALUE_HIGH] == (True, 0)
+    assert results[VALUE_MEDIUM] == (True, 0)
+    # Only the day period refuses a low-value call; the month still has room
+    assert results[VALUE_LOW] == (False, 3600)
+
+def test_seconds_until_reset_waits_for_every_refusing_period():
+    periods = [
+        make_period(used=100, resets_in=3600),
+        make_period(used=1000, limit=1000, resets_in=86400, period="month")
+    ]
+    ledger = make_ledger(periods)
+    assert asyncio.run(ledger.seconds_until_reset("quotatest", VALUE_HIGH, PRIORITY_INTERACTIVE)) == 86400
+
+def test_exhausted_day_resets_at_midnight():
+    async def run():
+        cache_manager.redis_client = fakeredis.aioredis.FakeRedis()
+        cache_manager.state = CACHE_STATE_CONNECTED
+        ledger = make_ledger()
+        try:
+            for _ in range(100):
+                await ledger.record("quotatest")
+            admitted = await ledger.admit("quotatest", VALUE_HIGH, PRIORITY_INTERACTIVE)
+            delay = await ledger.seconds_until_reset("quotatest", VALUE_HIGH, PRIORITY_INTERACTIVE)
+        finally:
+            await cache_manager.disconnect()
+        return admitted, delay
+
+    now = datetime.utcnow()
+    until_midnight = 86400 - (now.hour * 3600 + now.minute * 60 + now.second)
+    admitted, delay = asyncio.run(run())
+    assert not admitted
+    assert abs(delay - until_midnight) <= 2
@@ -0,0 +1,145 @@
+import asyncio
+import time
+import fakeredis.aioredis
+from cache import cache_manager, CACHE_STATE_CONNECTED, CACHE_STATE_DEGRADED
+from utils.rate_limiter import RateLimiter, RateLimiterManager, PRIORITY_INTERACTIVE, PRIORITY_BATCH
+
+def local_limiter(name: str, requests_per_minute: int) -> RateLimiter:
+    limiter = RateLimiter(name, requests_per_minute)
+    limiter.shared = None
+    return limiter
+
+def test_shared_bucket_leases_tokens_in_batches():
+    async def run():
+        redis_client = fakeredis.aioredis.FakeRedis()
+        cache_manager.redis_client = redis_client
+        cache_manager.state = CACHE_STATE_CONNECTED
+        bucket = RateLimiter("leasebatch", 600).shared
+        try:
+            await bucket.take()
+            after_first = float(await redis_client.hget(bucket.key, "tokens"))
+            for _ in range(bucket.lease_size - 1):
+                await bucket.take()
+            after_lease = float(await redis_client.hget(bucket.key, "tokens"))
+            await bucket.take()
+            after_refill = float(await redis_client.hget(bucket.key, "tokens"))
+        finally:
+            await cache_manager.disconnect()
+        return bucket.lease_size, after_first, after_lease, after_refill
+
+    lease_size, after_first, after_lease, after_refill = asyncio.run(run())
+    assert lease_size == 5
+    assert 595 <= after_first < 596
+    # The rest of the lease is served in-process without touching Redis
+    assert after_lease == after_first
+    assert after_refill < after_first - 4
+
+def test_credentials_get_separate_shared_buckets():
+    async def run():
+        cache_manager.redis_client = fakeredis.aioredis.FakeRedis()
+        cache_manager.state = CACHE_STATE_CONNECTED
+        manager = RateLimiterManager()
+        first = manager.get_limiter("credentialsplit", 20, "key-a")
+        second = manager.get_limiter("credentialsplit", 20, "key-b")
+        try:
+            drained = [await first.shared.take() for _ in range(21)]
+            other = await second.shared.take()
+        finally:
+            await cache_manager.disconnect()
+        return first.shared.key, second.shared.key, drained, other
+
+    first_key, second_key, drained, other = asyncio.run(run())
+    assert first_key != second_key
+    assert drained[:20] == [0.0] * 20
+    assert drained[20] > 0
+    assert other == 0.0
+
+def test_pause_is_seen_by_every_worker():
+    async def run():
+        cache_manager.redis_client = fakeredis.aioredis.FakeRedis()
+        cache_manager.state = CACHE_STATE_CONNECTED
+        worker = RateLimiter("sharedpause", 600)
+        other_worker = RateLimiter("sharedpause", 600)
+        try:
+            await worker.pause(30)
+            wait = await other_worker.shared.take()
+        finally:
+            await cache_manager.disconnect()
+        return wait
+
+    assert 29 < asyncio.run(run()) <= 30
+
+def test_falls_back_to_local_bucket_without_redis():
+    async def run():
+        cache_manager.redis_client = None
+        cache_manager.state = CACHE_STATE_DEGRADED
+        limiter = RateLimiter("localfallback", 60)
+        try:
+            wait, source = await limiter._take()
+        finally:
+            await cache_manager.disconnect()
+        return limiter, wait, source
+
+    limiter, wait, source = asyncio.run(run())
+    assert wait == 0.0
+    assert source is limiter.bucket
+    assert limiter.bucket.tokens < 60
+
+def test_shared_bucket_grants_full_capacity_to_concurrent_callers():
+    async def run():
+        cache_manager.redis_client = fakeredis.aioredis.FakeRedis()
+        cache_manager.state = CACHE_STATE_CONNECTED
+        limiter = RateLimiter("leaseconcurrency", 60)
+        try:
+            results = await asyncio.gather(*(limiter.shared.take() for _ in range(80)))
+        finally:
+            await cache_manager.disconnect()
+        return results
+
+    results = asyncio.run(run())
+    assert results.count(0.0) == 60
+    assert all(wait > 0 for wait in results if wait != 0.0)
+
+def test_waiters_are_granted_by_priority_then_arrival():
+    async def run():
+        limiter = local_limiter("priorityorder", 600)
+        limiter.bucket.tokens = 0
+        granted = []
+
+        async def wait(label, priority):
+            await limiter.wait_if_needed(priority)
+            granted.append(label)
+
+        tasks = [asyncio.create_task(wait("batch-1", PRIORITY_BATCH))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(wait("batch-2", PRIORITY_BATCH)))
+        tasks.append(asyncio.create_task(wait("interactive", PRIORITY_INTERACTIVE)))
+        await asyncio.gather(*tasks)
+        return granted
+
+    assert asyncio.run(run()) == ["interactive", "batch-1", "batch-2"]
+
+def test_pump_wakes_when_the_next_token_is_due():
+    async def run():
+        limiter = local_limiter("pumptiming", 600)
+        limiter.bucket.tokens = 0
+        start = time.monotonic()
+        await asyncio.gather(*(limiter.wait_if_needed() for _ in range(3)))
+        return time.monotonic() - start
+
+    # Three tokens at ten per second
+    assert 0.28 <= asyncio.run(run()) < 0.5
+
+def test_snapshot_reports_queued_callers():
+    async def run():
+        manager = RateLimiterManager()
+        limiter = manager.get_limiter("queuedepth", 600)
+        limiter.shared = None
+        limiter.bucket.tokens = 0
+        waiters = [asyncio.create_task(limiter.wait_if_needed()) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        queued = manager.snapshot()["queuedepth:default"]["queued"]
+        await asyncio.gather(*waiters)
+        return queued, manager.snapshot()["queuedepth:default"]["queued"]
+
+    assert asyncio.run(run()) == (3, 0)
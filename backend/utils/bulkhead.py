@@ -0,0 +1,144 @@
+import asyncio
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager, AsyncExitStack
+from contextvars import ContextVar
+from typing import Dict, Any, Optional
+from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+class BulkheadFullError(Exception):
+    pass
+
+class Bulkhead:
+    """Concurrency limit with a bounded FIFO wait queue; callers beyond the queue or the wait timeout are rejected"""
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.peak_queued = 0
+        self.waiters: "deque[asyncio.Future]" = deque()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _bind_loop(self):
+        # Celery tasks each run in a fresh event loop; slots and waiters from a finished loop are dropped
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.waiters.clear()
+            self.in_flight = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for future in self.waiters if not future.done())
+
+    async def acquire(self):
+        self._bind_loop()
+        if self.in_flight < self.limit and not self.waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        if len(self.waiters) >= self.max_queue:
+            self.rejected += 1
+            raise BulkheadFullError(f"Bulkhead {self.name} is full ({self.in_flight} in flight, {len(self.waiters)} queued)")
+        future = self.loop.create_future()
+        self.waiters.append(future)
+        self.peak_queued = max(self.peak_queued, len(self.waiters))
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise BulkheadFullError(f"Bulkhead {self.name} wait exceeded {self.queue_timeout:.1f}s")
+        except asyncio.CancelledError:
+            # The slot may have been handed over just before the cancellation landed
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        finally:
+            if future in self.waiters:
+                self.waiters.remove(future)
+
+    def release(self):
+        # Hand the slot straight to the oldest live waiter so in_flight never dips below the limit under load
+        while self.waiters:
+            future = self.waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                self.admitted += 1
+                return
+        self.in_flight = max(0, self.in_flight - 1)
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "peak_queued": self.peak_queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected
+        }
+
+# Concurrency budget of the search the current task belongs to, set by BulkheadRegistry.search_scope
+search_budget: ContextVar[Optional[Bulkhead]] = ContextVar("search_budget", default=None)
+
+class BulkheadRegistry:
+    """Per-API bulkheads, per-search budgets and the process-wide admission controller for outbound calls"""
+    def __init__(self):
+        self.admission = Bulkhead("global", settings.MAX_CONCURRENT_REQUESTS, settings.ADMISSION_MAX_QUEUE, settings.BULKHEAD_QUEUE_TIMEOUT)
+        self.apis: Dict[str, Bulkhead] = {}
+        self.searches: "weakref.WeakSet[Bulkhead]" = weakref.WeakSet()
+
+    def for_api(self, api_name: str) -> Bulkhead:
+        if api_name not in self.apis:
+            limit = settings.BULKHEAD_API_LIMITS.get(api_name, settings.BULKHEAD_API_CONCURRENCY)
+            self.apis[api_name] = Bulkhead(api_name, limit, settings.BULKHEAD_MAX_QUEUE, settings.BULKHEAD_QUEUE_TIMEOUT)
+        return self.apis[api_name]
+
+    @contextmanager
+    def search_scope(self, limit: Optional[int] = None):
+        budget = Bulkhead("search", limit or settings.SEARCH_CONCURRENCY_BUDGET, settings.BULKHEAD_MAX_QUEUE, settings.BULKHEAD_QUEUE_TIMEOUT)
+        self.searches.add(budget)
+        token = search_budget.set(budget)
+        try:
+            yield budget
+        finally:
+            search_budget.reset(token)
+
+    @asynccontextmanager
+    async def admit(self, api_name: str):
+        """Search budget, then API bulkhead, then global admission: always taken in this order so waits cannot deadlock"""
+        async with AsyncExitStack() as stack:
+            budget = search_budget.get()
+            if budget is not None:
+                await stack.enter_async_context(budget.slot())
+            await stack.enter_async_context(self.for_api(api_name).slot())
+            await stack.enter_async_context(self.admission.slot())
+            yield
+
+    def snapshot(self) -> Dict[str, Any]:
+        searches = [budget.stats() for budget in list(self.searches) if budget.in_flight or budget.queued]
+        return {
+            "global": self.admission.stats(),
+            "apis": {name: bulkhead.stats() for name, bulkhead in sorted(self.apis.items())},
+            "searches": {
+                "active": len(searches),
+                "in_flight": sum(stats["in_flight"] for stats in searches),
+                "queued": sum(stats["queued"] for stats in searches)
+            }
+        }
+
+bulkheads = BulkheadRegistry()
@@ -0,0 +1,163 @@
+import json
+import zlib
+import logging
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+try:
+    import lz4.frame
+    LZ4_AVAILABLE = True
+except ImportError:
+    LZ4_AVAILABLE = False
+
+# Encoded values start with MAGIC followed by a serializer id and a compression id.
+# 0xFF never appears in UTF-8 text, so entries written as plain JSON by older
+# versions are still recognised and decoded.
+MAGIC = b"\xffC"
+HEADER_SIZE = len(MAGIC) + 2
+
+SERIALIZER_JSON = 1
+SERIALIZER_ORJSON = 2
+SERIALIZER_MSGPACK = 3
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_ZSTD = 2
+COMPRESSION_LZ4 = 3
+
+SERIALIZER_IDS = {
+    "json": SERIALIZER_JSON,
+    "orjson": SERIALIZER_ORJSON,
+    "msgpack": SERIALIZER_MSGPACK,
+}
+
+COMPRESSION_IDS = {
+    "none": COMPRESSION_NONE,
+    "zlib": COMPRESSION_ZLIB,
+    "zstd": COMPRESSION_ZSTD,
+    "lz4": COMPRESSION_LZ4,
+}
+
+class CacheCodec:
+    def __init__(self, serializer: str = "auto", compression: str = "auto", compression_threshold: int = 1024, compression_level: int = 3):
+        self.serializer = self._resolve_serializer(serializer)
+        self.compression = self._resolve_compression(compression)
+        self.compression_threshold = compression_threshold
+        self.compression_level = compression_level
+        self._zstd_compressor = zstandard.ZstdCompressor(level=compression_level) if ZSTD_AVAILABLE else None
+        self._zstd_decompressor = zstandard.ZstdDecompressor() if ZSTD_AVAILABLE else None
+
+    def _resolve_serializer(self, name: str) -> int:
+        name = (name or "auto").lower()
+        if name == "auto":
+            if ORJSON_AVAILABLE:
+                return SERIALIZER_ORJSON
+            if MSGPACK_AVAILABLE:
+                return SERIALIZER_MSGPACK
+            return SERIALIZER_JSON
+        serializer_id = SERIALIZER_IDS.get(name)
+        if serializer_id == SERIALIZER_ORJSON and not ORJSON_AVAILABLE:
+            logger.warning("orjson not available, falling back to json cache serializer")
+            return SERIALIZER_JSON
+        if serializer_id == SERIALIZER_MSGPACK and not MSGPACK_AVAILABLE:
+            logger.warning("msgpack not available, falling back to json cache serializer")
+            return SERIALIZER_JSON
+        return serializer_id or SERIALIZER_JSON
+
+    def _resolve_compression(self, name: str) -> int:
+        name = (name or "auto").lower()
+        if name == "auto":
+            if ZSTD_AVAILABLE:
+                return COMPRESSION_ZSTD
+            if LZ4_AVAILABLE:
+                return COMPRESSION_LZ4
+            return COMPRESSION_ZLIB
+        compression_id = COMPRESSION_IDS.get(name, COMPRESSION_NONE)
+        if compression_id == COMPRESSION_ZSTD and not ZSTD_AVAILABLE:
+            logger.warning("zstandard not available, falling back to zlib cache compression")
+            return COMPRESSION_ZLIB
+        if compression_id == COMPRESSION_LZ4 and not LZ4_AVAILABLE:
+            logger.warning("lz4 not available, falling back to zlib cache compression")
+            return COMPRESSION_ZLIB
+        return compression_id
+
+    def encode(self, value: Any) -> bytes:
+        payload = self._serialize(value)
+        compression = COMPRESSION_NONE
+        if self.compression != COMPRESSION_NONE and len(payload) >= self.compression_threshold:
+            compressed = self._compress(payload)
+            if len(compressed) < len(payload):
+                payload = compressed
+                compression = self.compression
+        return MAGIC + bytes((self.serializer, compression)) + payload
+
+    def decode(self, data: Optional[bytes]) -> Any:
+        if data is None:
+            return None
+        if isinstance(data, str):
+            return json.loads(data)
+        if not data.startswith(MAGIC):
+            return json.loads(data.decode("utf-8"))
+        serializer = data[len(MAGIC)]
+        compression = data[len(MAGIC) + 1]
+        payload = data[HEADER_SIZE:]
+        if compression != COMPRESSION_NONE:
+            payload = self._decompress(payload, compression)
+        return self._deserialize(payload, serializer)
+
+    def _serialize(self, value: Any) -> bytes:
+        if self.serializer == SERIALIZER_ORJSON:
+            return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS)
+        if self.serializer == SERIALIZER_MSGPACK:
+            return msgpack.packb(value, default=str, use_bin_type=True)
+        return json.dumps(value, default=str).encode("utf-8")
+
+    def _deserialize(self, payload: bytes, serializer: int) -> Any:
+        if serializer == SERIALIZER_ORJSON:
+            if ORJSON_AVAILABLE:
+                return orjson.loads(payload)
+            return json.loads(payload.decode("utf-8"))
+        if serializer == SERIALIZER_MSGPACK:
+            if not MSGPACK_AVAILABLE:
+                raise ValueError("Cached value is msgpack-encoded but msgpack is not installed")
+            return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+        return json.loads(payload.decode("utf-8"))
+
+    def _compress(self, payload: bytes) -> bytes:
+        if self.compression == COMPRESSION_ZSTD:
+            return self._zstd_compressor.compress(payload)
+        if self.compression == COMPRESSION_LZ4:
+            return lz4.frame.compress(payload)
+        return zlib.compress(payload, self.compression_level)
+
+    def _decompress(self, payload: bytes, compression: int) -> bytes:
+        if compression == COMPRESSION_ZSTD:
+            if not ZSTD_AVAILABLE:
+                raise ValueError("Cached value is zstd-compressed but zstandard is not installed")
+            return self._zstd_decompressor.decompress(payload)
+        if compression == COMPRESSION_LZ4:
+            if not LZ4_AVAILABLE:
+                raise ValueError("Cached value is lz4-compressed but lz4 is not installed")
+            return lz4.frame.decompress(payload)
+        if compression == COMPRESSION_ZLIB:
+            return zlib.decompress(payload)
+        raise ValueError(f"Unknown cache compression id {compression}")
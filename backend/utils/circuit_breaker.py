@@ -1,82 +1,263 @@
 import asyncio
 import time
-from typing import Dict, Callable, Any, Optional
-from datetime import datetime, timedelta
+from typing import Dict, Callable, Any, Optional, Tuple
 from config import settings
+from cache import cache_manager
 import logging
 
 logger = logging.getLogger(__name__)
 
+STATE_CLOSED = 0
+STATE_OPEN = 1
+STATE_HALF_OPEN = 2
+
+STATE_NAMES = {STATE_CLOSED: "closed", STATE_OPEN: "open", STATE_HALF_OPEN: "half_open"}
+
+# KEYS[1] state hash; ARGV probe limit, probe timeout ms. Returns {admitted, state}: an open breaker
+# turns half-open once open_until passes, and half-open admits at most ARGV[1] probes at a time.
+ACQUIRE_SCRIPT = """
+local clock = redis.call('time')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local state = tonumber(redis.call('hget', KEYS[1], 'state') or '0')
+if state == 1 then
+    if now < tonumber(redis.call('hget', KEYS[1], 'open_until') or '0') then
+        return {0, 1}
+    end
+    redis.call('hset', KEYS[1], 'state', 2, 'probes', 0, 'successes', 0, 'probe_deadline', 0)
+    state = 2
+end
+if state == 2 then
+    local probes = tonumber(redis.call('hget', KEYS[1], 'probes') or '0')
+    if probes >= tonumber(ARGV[1]) then
+        -- Probes whose worker died never report back; reclaim their slots after the probe timeout
+        if now < tonumber(redis.call('hget', KEYS[1], 'probe_deadline') or '0') then
+            return {0, 2}
+        end
+        probes = 0
+    end
+    redis.call('hset', KEYS[1], 'probes', probes + 1, 'probe_deadline', now + tonumber(ARGV[2]))
+    return {1, 2}
+end
+return {1, 0}
+"""
+
+# KEYS[1] state hash, KEYS[2] window hash of per-bucket "<bucket>:c|f|s" counts.
+# ARGV failed, slow, probe, window ms, bucket ms, min calls, failure rate, slow rate, open ms, probe limit.
+# Returns the state after recording the outcome.
+RECORD_SCRIPT = """
+local clock = redis.call('time')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local failed = tonumber(ARGV[1])
+local slow = tonumber(ARGV[2])
+local state = tonumber(redis.call('hget', KEYS[1], 'state') or '0')
+if tonumber(ARGV[3]) == 1 then
+    if state ~= 2 then
+        return state
+    end
+    if failed == 1 then
+        redis.call('hset', KEYS[1], 'state', 1, 'open_until', now + tonumber(ARGV[9]))
+        return 1
+    end
+    -- Probe slots may have been reclaimed since this probe was admitted; never count below zero
+    local probes = tonumber(redis.call('hget', KEYS[1], 'probes') or '0')
+    redis.call('hset', KEYS[1], 'probes', math.max(0, probes - 1))
+    if redis.call('hincrby', KEYS[1], 'successes', 1) >= tonumber(ARGV[10]) then
+        redis.call('del', KEYS[1], KEYS[2])
+        return 0
+    end
+    return 2
+end
+if state ~= 0 then
+    return state
+end
+local bucket_ms = tonumber(ARGV[5])
+local current = math.floor(now / bucket_ms)
+local oldest = current - math.floor(tonumber(ARGV[4]) / bucket_ms) + 1
+redis.call('hincrby', KEYS[2], current .. ':c', 1)
+if failed == 1 then
+    redis.call('hincrby', KEYS[2], current .. ':f', 1)
+end
+if slow == 1 then
+    redis.call('hincrby', KEYS[2], current .. ':s', 1)
+end
+redis.call('pexpire', KEYS[2], tonumber(ARGV[4]) + bucket_ms)
+local calls, failures, slows = 0, 0, 0
+local fields = redis.call('hgetall', KEYS[2])
+for i = 1, #fields, 2 do
+    local bucket, kind = string.match(fields[i], '(%d+):(%a)')
+    if tonumber(bucket) < oldest then
+        redis.call('hdel', KEYS[2], fields[i])
+    elseif kind == 'c' then
+        calls = calls + tonumber(fields[i + 1])
+    elseif kind == 'f' then
+        failures = failures + tonumber(fields[i + 1])
+    else
+        slows = slows + tonumber(fields[i + 1])
+    end
+end
+if calls >= tonumber(ARGV[6]) and (failures / calls >= tonumber(ARGV[7]) or slows / calls >= tonumber(ARGV[8])) then
+    redis.call('hset', KEYS[1], 'state', 1, 'open_until', now + tonumber(ARGV[9]))
+    redis.call('del', KEYS[2])
+    return 1
+end
+return 0
+"""
+
+class CircuitOpenError(Exception):
+    pass
+
+def response_failed(result: Any) -> bool:
+    """HTTP 5xx and 429 responses count as failures even though the call itself returned"""
+    status_code = getattr(result, "status_code", None)
+    return status_code is not None and (status_code >= 500 or status_code == 429)
+
 class CircuitBreaker:
+    """Trips on the error or slow-call rate over a sliding window, then admits a few probes while half-open.
+    State lives in Redis so every worker sees the same breaker; a local copy of the same logic is used while Redis is unavailable."""
     def __init__(self, name: str, threshold: int = None, timeout: int = None):
         self.name = name
-        self.threshold = threshold or settings.CIRCUIT_BREAKER_THRESHOLD
+        self.min_calls = threshold or settings.CIRCUIT_BREAKER_THRESHOLD
         self.timeout = timeout or settings.CIRCUIT_BREAKER_TIMEOUT
-        self.failure_count = 0
-        self.last_failure_time: Optional[datetime] = None
+        self.window = settings.CIRCUIT_BREAKER_WINDOW
+        self.bucket_seconds = settings.CIRCUIT_BREAKER_BUCKET
+        self.failure_rate = settings.CIRCUIT_BREAKER_FAILURE_RATE
+        self.slow_rate = settings.CIRCUIT_BREAKER_SLOW_RATE
+        self.slow_call = settings.CIRCUIT_BREAKER_SLOW_CALL
+        self.probe_limit = settings.CIRCUIT_BREAKER_HALF_OPEN_PROBES
+        self.shared = settings.CIRCUIT_BREAKER_DISTRIBUTED
+        self.state_key = f"breaker:{{{name}}}:state"
+        self.window_key = f"breaker:{{{name}}}:window"
         self.state = "closed"
-        self.lock = asyncio.Lock()
-        
+        self.local_state = STATE_CLOSED
+        self.open_until = 0.0
+        self.probes = 0
+        self.probe_successes = 0
+        self.probe_deadline = 0.0
+        self.buckets: Dict[int, list] = {}
+
+    def _set_state(self, state: int):
+        name = STATE_NAMES[state]
+        if name != self.state:
+            log = logger.warning if state == STATE_OPEN else logger.info
+            log(f"Circuit breaker {self.name} {self.state} -> {name}")
+            self.state = name
+
+    async def _acquire(self) -> Tuple[bool, bool]:
+        """(local, probe) when the call may proceed; raises CircuitOpenError otherwise"""
+        if self.shared:
+            result = await cache_manager.run_script(
+                ACQUIRE_SCRIPT, [self.state_key], [self.probe_limit, int(self.timeout * 1000)]
+            )
+            if result is not None:
+                admitted, state = int(result[0]), int(result[1])
+                self._set_state(state)
+                if not admitted:
+                    raise CircuitOpenError(f"Circuit breaker {self.name} is {self.state}")
+                return False, state == STATE_HALF_OPEN
+        return True, self._acquire_local()
+
+    def _acquire_local(self) -> bool:
+        now = time.monotonic()
+        if self.local_state == STATE_OPEN:
+            if now < self.open_until:
+                raise CircuitOpenError(f"Circuit breaker {self.name} is open")
+            self.local_state, self.probes, self.probe_successes = STATE_HALF_OPEN, 0, 0
+        if self.local_state == STATE_HALF_OPEN:
+            if self.probes >= self.probe_limit and now < self.probe_deadline:
+                raise CircuitOpenError(f"Circuit breaker {self.name} is half_open")
+            if self.probes >= self.probe_limit:
+                self.probes = 0
+            self.probes += 1
+            self.probe_deadline = now + self.timeout
+            self._set_state(STATE_HALF_OPEN)
+            return True
+        return False
+
+    async def _record(self, local: bool, probe: bool, failed: bool, slow: bool):
+        if not local:
+            state = await cache_manager.run_script(
+                RECORD_SCRIPT,
+                [self.state_key, self.window_key],
+                [
+                    int(failed), int(slow), int(probe),
+                    int(self.window * 1000), int(self.bucket_seconds * 1000),
+                    self.min_calls, self.failure_rate, self.slow_rate,
+                    int(self.timeout * 1000), self.probe_limit
+                ]
+            )
+            if state is not None:
+                self._set_state(int(state))
+                return
+        self._record_local(probe, failed, slow)
+
+    def _open_local(self, now: float):
+        self.local_state = STATE_OPEN
+        self.open_until = now + self.timeout
+        self.buckets.clear()
+        self._set_state(STATE_OPEN)
+
+    def _record_local(self, probe: bool, failed: bool, slow: bool):
+        now = time.monotonic()
+        if probe:
+            if self.local_state != STATE_HALF_OPEN:
+                return
+            if failed:
+                self._open_local(now)
+                return
+            self.probes = max(0, self.probes - 1)
+            self.probe_successes += 1
+            if self.probe_successes >= self.probe_limit:
+                self._reset_local()
+            return
+        if self.local_state != STATE_CLOSED:
+            return
+        current = int(now // self.bucket_seconds)
+        oldest = current - int(self.window // self.bucket_seconds) + 1
+        counts = self.buckets.setdefault(current, [0, 0, 0])
+        counts[0] += 1
+        counts[1] += int(failed)
+        counts[2] += int(slow)
+        for bucket in [bucket for bucket in self.buckets if bucket < oldest]:
+            del self.buckets[bucket]
+        calls, failures, slows = (sum(column) for column in zip(*self.buckets.values()))
+        if calls >= self.min_calls and (failures / calls >= self.failure_rate or slows / calls >= self.slow_rate):
+            self._open_local(now)
+
     async def call(self, func: Callable, *args, **kwargs) -> Any:
-        async with self.lock:
-            if self.state == "open":
-                if self._should_attempt_reset():
-                    self.state = "half_open"
-                    logger.info(f"Circuit breaker {self.name} entering half-open state")
-                else:
-                    raise Exception(f"Circuit breaker {self.name} is open")
-            elif self.state == "half_open":
-                pass
-        
+        local, probe = await self._acquire()
+        start = time.monotonic()
         try:
             result = await func(*args, **kwargs)
-            await self._on_success()
-            return result
-        except Exception as e:
-            await self._on_failure()
-            raise e
-    
-    async def _on_success(self):
-        async with self.lock:
-            if self.state == "half_open":
-                self.state = "closed"
-                self.failure_count = 0
-                logger.info(f"Circuit breaker {self.name} closed after successful call")
-            elif self.state == "closed":
-                self.failure_count = 0
-    
-    async def _on_failure(self):
-        async with self.lock:
-            self.failure_count += 1
-            self.last_failure_time = datetime.utcnow()
-            
-            if self.failure_count >= self.threshold:
-                self.state = "open"
-                logger.warning(f"Circuit breaker {self.name} opened after {self.failure_count} failures")
-    
-    def _should_attempt_reset(self) -> bool:
-        if self.last_failure_time is None:
-            return True
-        elapsed = (datetime.utcnow() - self.last_failure_time).total_seconds()
-        return elapsed >= self.timeout
-    
-    def reset(self):
-        self.failure_count = 0
-        self.state = "closed"
-        self.last_failure_time = None
+        except (Exception, asyncio.CancelledError):
+            # Cancellation is how the orchestrator's per-call timeout surfaces; it counts as a failure too
+            await asyncio.shield(self._record(local, probe, True, time.monotonic() - start >= self.slow_call))
+            raise
+        await self._record(local, probe, response_failed(result), time.monotonic() - start >= self.slow_call)
+        return result
+
+    async def reset(self):
+        """Close the breaker everywhere: clear the shared window and state in Redis as well as the local fallback"""
+        if self.shared:
+            await cache_manager.delete_many([self.state_key, self.window_key])
+        self._reset_local()
+
+    def _reset_local(self):
+        self.local_state = STATE_CLOSED
+        self.probes = 0
+        self.probe_successes = 0
+        self.buckets.clear()
+        self._set_state(STATE_CLOSED)
 
 class CircuitBreakerManager:
     def __init__(self):
         self.breakers: Dict[str, CircuitBreaker] = {}
-        
+
     def get_breaker(self, name: str) -> CircuitBreaker:
         if name not in self.breakers:
             self.breakers[name] = CircuitBreaker(name)
         return self.breakers[name]
-    
-    def reset_breaker(self, name: str):
-        if name in self.breakers:
-            self.breakers[name].reset()
 
-circuit_breaker_manager = CircuitBreakerManager()
+    async def reset_breaker(self, name: str):
+        await self.get_breaker(name).reset()
 
+circuit_breaker_manager = CircuitBreakerManager()
@@ -0,0 +1,44 @@
+import copy
+from typing import Any, Dict, List
+
+# Operations are {"op": "set" | "remove", "path": [key or index, ...], "value": ...}.
+# Dicts are diffed key by key and equal-length lists element by element; any other
+# change replaces the value at its path.
+
+def diff(old: Any, new: Any, path: List[Any] = None) -> List[Dict[str, Any]]:
+    path = path or []
+    if old == new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": path + [key]})
+        for key, value in new.items():
+            if key not in old:
+                ops.append({"op": "set", "path": path + [key], "value": value})
+            else:
+                ops.extend(diff(old[key], value, path + [key]))
+        return ops
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        ops = []
+        for index, (old_item, new_item) in enumerate(zip(old, new)):
+            ops.extend(diff(old_item, new_item, path + [index]))
+        return ops
+    return [{"op": "set", "path": path, "value": new}]
+
+def patch(document: Any, ops: List[Dict[str, Any]]) -> Any:
+    document = copy.deepcopy(document)
+    for op in ops:
+        path = op["path"]
+        if not path:
+            document = copy.deepcopy(op.get("value"))
+            continue
+        parent = document
+        for key in path[:-1]:
+            parent = parent[key]
+        if op["op"] == "remove":
+            parent.pop(path[-1], None)
+        else:
+            parent[path[-1]] = copy.deepcopy(op["value"])
+    return document
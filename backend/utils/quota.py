@@ -0,0 +1,138 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+from config import settings
+from cache import cache_manager
+from utils.rate_limiter import credential_fingerprint, request_priority, PRIORITY_INTERACTIVE
+
+logger = logging.getLogger(__name__)
+
+# Call value tiers, matching the orchestrator's priority / secondary / background API groups
+VALUE_HIGH = "high"
+VALUE_MEDIUM = "medium"
+VALUE_LOW = "low"
+
+# KEYS period counters; ARGV[i] unix expiry of KEYS[i]. INCR each and set its expiry on first use.
+RECORD_SCRIPT = """
+local counts = {}
+for i, key in ipairs(KEYS) do
+    counts[i] = redis.call('incr', key)
+    if counts[i] == 1 then
+        redis.call('expireat', key, ARGV[i])
+    end
+end
+return counts
+"""
+
+READ_SCRIPT = """
+return redis.call('mget', unpack(KEYS))
+"""
+
+def period_bounds(period: str, now: datetime) -> Tuple[datetime, datetime]:
+    if period == "day":
+        start = datetime(now.year, now.month, now.day)
+        return start, start + timedelta(days=1)
+    start = datetime(now.year, now.month, 1)
+    end = datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start, end
+
+class QuotaLedger:
+    """Per-API, per-credential call counters for daily / monthly upstream quotas, with a pace forecast and an interactive reserve"""
+    def __init__(self):
+        self.quotas: Dict[str, Dict[str, int]] = settings.API_QUOTAS
+        self.reserve = settings.QUOTA_INTERACTIVE_RESERVE
+        self.batch_burst = settings.QUOTA_BATCH_BURST
+        self.credentials: Dict[str, str] = {}
+
+    def register(self, api_name: str, credential: Optional[str]):
+        if api_name in self.quotas:
+            self.credentials[api_name] = credential_fingerprint(credential)
+
+    def _keys(self, api_name: str, now: datetime) -> List[Tuple[str, int, datetime, datetime, str]]:
+        fingerprint = self.credentials.get(api_name, credential_fingerprint(None))
+        keys = []
+        for period, limit in self.quotas.get(api_name, {}).items():
+            start, end = period_bounds(period, now)
+            stamp = start.strftime("%Y%m%d" if period == "day" else "%Y%m")
+            # One {hash tag} per API and credential so a script can update all its periods in cluster mode
+            keys.append((f"quota:{{{api_name}:{fingerprint}}}:{period}:{stamp}", limit, start, end, period))
+        return keys
+
+    async def record(self, api_name: str):
+        """Count one upstream call against every configured period of api_name"""
+        if api_name not in self.quotas or not settings.QUOTA_ENABLED:
+            return
+        keys = self._keys(api_name, datetime.utcnow())
+        # Expire a day after the period ends so the last counts stay readable around the boundary
+        expiries = [int((end + timedelta(days=1) - datetime(1970, 1, 1)).total_seconds()) for _, _, _, end, _ in keys]
+        await cache_manager.run_script(RECORD_SCRIPT, [key for key, *_ in keys], expiries)
+
+    async def status(self, api_name: str) -> List[Dict[str, Any]]:
+        now = datetime.utcnow()
+        keys = self._keys(api_name, now)
+        if not keys:
+            return []
+        counts = await cache_manager.run_script(READ_SCRIPT, [key for key, *_ in keys], [])
+        periods = []
+        for i, (key, limit, start, end, period) in enumerate(keys):
+            used = int(counts[i]) if counts and counts[i] is not None else 0
+            elapsed = max((now - start).total_seconds() / (end - start).total_seconds(), 1e-6)
+            periods.append({
+                "period": period,
+                "limit": limit,
+                "used": used,
+                "remaining": max(0, limit - used),
+                "forecast": int(used / elapsed) if elapsed >= 0.05 else None,
+                "resets_in": int((end - now).total_seconds()),
+                "elapsed": elapsed,
+                "known": counts is not None
+            })
+        return periods
+
+    def _admits(self, period: Dict[str, Any], priority: int, value: str) -> bool:
+        limit, used, remaining = period["limit"], period["used"], period["remaining"]
+        reserve = limit * self.reserve
+        if remaining <= 0:
+            return False
+        if priority != PRIORITY_INTERACTIVE:
+            # Batch work keeps out of the interactive reserve and is paced across the period,
+            # so an early bulk run cannot spend the whole day's quota
+            paced = (limit - reserve) * period["elapsed"] + limit * self.batch_burst
+            return remaining > reserve and used < paced
+        if value == VALUE_HIGH:
+            return True
+        # Lower-value calls give way once the reserve is being eaten into and the forecast overshoots the limit
+        guard = reserve if value == VALUE_LOW else reserve / 2
+        forecast = period["forecast"]
+        return remaining > guard or (forecast is not None and forecast <= limit)
+
+    async def admit(self, api_name: str, value: str = VALUE_HIGH, priority: Optional[int] = None) -> bool:
+        """Whether a call to api_name fits its quotas; always True when no quota is configured or Redis is unavailable"""
+        if api_name not in self.quotas or not settings.QUOTA_ENABLED:
+            return True
+        priority = request_priority.get() if priority is None else priority
+        for period in await self.status(api_name):
+            if period["known"] and not self._admits(period, priority, value):
+                logger.info(f"Quota ledger skipping {api_name} ({value}) with {period['remaining']}/{period['limit']} {period['period']} calls left")
+                return False
+        return True
+
+    async def seconds_until_reset(self, api_name: str, value: str = VALUE_HIGH, priority: Optional[int] = None) -> int:
+        """Seconds until every period that admit() is currently refusing for this call has reset; 0 when none is"""
+        priority = request_priority.get() if priority is None else priority
+        periods = [
+            period for period in await self.status(api_name)
+            if period["known"] and not self._admits(period, priority, value)
+        ]
+        return max((period["resets_in"] for period in periods), default=0)
+
+    async def summary(self) -> Dict[str, Any]:
+        summary = {}
+        for api_name in self.quotas:
+            summary[api_name] = [
+                {key: value for key, value in period.items() if key not in ("elapsed", "known")}
+                for period in await self.status(api_name)
+            ]
+        return {"reserve": self.reserve, "apis": summary}
+
+quota_ledger = QuotaLedger()
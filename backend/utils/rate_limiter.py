@@ -1,80 +1,344 @@
 import asyncio
+import hashlib
+import heapq
+import itertools
 import time
-from typing import Dict, Optional
-from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Tuple
 from config import settings
+from cache import cache_manager
 import logging
 
 logger = logging.getLogger(__name__)
 
+# KEYS[1] bucket hash, KEYS[2] pause marker; ARGV capacity, refill per ms, tokens wanted. Refills from
+# the Redis clock so every worker sees one bucket; returns {granted, ms until the next token when nothing was granted}.
+TOKEN_BUCKET_SCRIPT = """
+local paused = redis.call('pttl', KEYS[2])
+if paused > 0 then
+    return {0, paused}
+end
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local wanted = tonumber(ARGV[3])
+local clock = redis.call('time')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local state = redis.call('hmget', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil or ts == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local granted = 0
+local wait = 0
+if tokens >= 1 then
+    granted = math.min(wanted, math.floor(tokens))
+    tokens = tokens - granted
+else
+    wait = math.ceil((1 - tokens) / rate)
+end
+redis.call('hset', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('pexpire', KEYS[1], math.ceil(capacity / rate) + 1000)
+return {granted, wait}
+"""
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+# Waiters with a lower value are granted first; batch work (Celery refreshes, the cache
+# warmer) runs under PRIORITY_BATCH so interactive searches overtake it in the queue.
+request_priority: ContextVar[int] = ContextVar("request_priority", default=PRIORITY_INTERACTIVE)
+
+@contextmanager
+def rate_limit_priority(priority: int):
+    token = request_priority.set(priority)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+# KEYS[1] pause marker; extends the pause to ARGV[1] ms from now unless it already lasts longer
+PAUSE_SCRIPT = """
+if redis.call('pttl', KEYS[1]) < tonumber(ARGV[1]) then
+    redis.call('set', KEYS[1], 1, 'PX', ARGV[1])
+end
+return 1
+"""
+
+REMAINING_HEADERS = ("X-RateLimit-Remaining", "RateLimit-Remaining", "X-RateLimit-Requests-Remaining", "X-RateLimit-Remaining-Requests")
+RESET_HEADERS = ("X-RateLimit-Reset", "RateLimit-Reset", "X-RateLimit-Requests-Reset", "X-RateLimit-Reset-Requests")
+
+def _header_number(headers, names) -> Optional[float]:
+    for name in names:
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return float(str(value).strip().rstrip("s"))
+        except ValueError:
+            continue
+    return None
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def parse_rate_limit_headers(headers) -> Dict[str, Optional[float]]:
+    """remaining requests, seconds until the window resets and Retry-After seconds, each None when absent"""
+    reset = _header_number(headers, RESET_HEADERS)
+    if reset is not None and reset > 1e9:
+        # GitHub-style epoch timestamp rather than a delta
+        reset = max(0.0, reset - time.time())
+    return {
+        "remaining": _header_number(headers, REMAINING_HEADERS),
+        "reset": reset,
+        "retry_after": _retry_after(headers.get("Retry-After"))
+    }
+
+def credential_fingerprint(credential: Optional[str]) -> str:
+    if not credential:
+        return "default"
+    return hashlib.sha256(str(credential).encode()).hexdigest()[:16]
+
 class TokenBucket:
+    """In-process token bucket; take() never blocks and returns the exact wait until the next token"""
     def __init__(self, capacity: int, refill_rate: float):
         self.capacity = capacity
-        self.tokens = capacity
+        self.tokens = float(capacity)
         self.refill_rate = refill_rate
-        self.last_refill = time.time()
-        self.lock = asyncio.Lock()
+        self.last_refill = time.monotonic()
         
-    async def acquire(self, tokens: int = 1) -> bool:
-        async with self.lock:
-            self._refill()
-            if self.tokens >= tokens:
-                self.tokens -= tokens
-                return True
-            return False
-    
     def _refill(self):
-        now = time.time()
-        elapsed = now - self.last_refill
-        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.refill_rate)
         self.last_refill = now
     
-    async def wait_for_token(self, tokens: int = 1, timeout: float = 30.0):
-        start = time.time()
-        while time.time() - start < timeout:
-            if await self.acquire(tokens):
-                return True
-            await asyncio.sleep(0.1)
+    def set_rate(self, capacity: int, refill_rate: float):
+        self._refill()
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = min(self.tokens, capacity)
+    
+    async def take(self) -> float:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.refill_rate
+    
+    def refund(self):
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+class RedisTokenBucket:
+    """Token bucket shared by every worker through Redis; tokens are leased in small batches so most acquires stay in-process"""
+    def __init__(self, key: str, capacity: int, refill_rate: float, lease_size: int, lease_ttl: float):
+        self.key = key
+        # Same {hash tag} as the bucket so the script can touch both keys in cluster mode
+        self.pause_key = f"{key}:paused"
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.lease_size = lease_size
+        self.lease_ttl = lease_ttl
+        self.leased = 0
+        self.lease_expires = 0.0
+        self.lock: Optional[asyncio.Lock] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def _refill_lock(self) -> asyncio.Lock:
+        # Celery tasks each run in a fresh event loop; a lock from a finished loop cannot be awaited
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.lock = asyncio.Lock()
+        return self.lock
+    
+    def _take_leased(self) -> bool:
+        if self.leased > 0 and time.monotonic() < self.lease_expires:
+            self.leased -= 1
+            return True
         return False
+        
+    async def take(self) -> Optional[float]:
+        """0 when a token was taken, seconds until the next token when the bucket is empty, None when Redis is unavailable"""
+        if self._take_leased():
+            return 0.0
+        # One refill in flight per process: concurrent callers wait for it and then draw on the new lease
+        async with self._refill_lock():
+            if self._take_leased():
+                return 0.0
+            if time.monotonic() >= self.lease_expires:
+                self.leased = 0
+            result = await cache_manager.run_script(
+                TOKEN_BUCKET_SCRIPT, [self.key, self.pause_key], [self.capacity, self.refill_rate / 1000.0, self.lease_size]
+            )
+            if result is None:
+                return None
+            granted, wait_ms = int(result[0]), int(result[1])
+            if granted > 0:
+                # Added rather than assigned so tokens refunded during the call are kept.
+                # Unused leased tokens simply expire: the fleet may under-use its limit briefly, never exceed it
+                self.leased += granted - 1
+                self.lease_expires = time.monotonic() + self.lease_ttl
+                return 0.0
+            return max(wait_ms, 1) / 1000.0
+    
+    def refund(self):
+        self.leased += 1
+    
+    def set_rate(self, capacity: int, refill_rate: float):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.lease_size = max(1, min(settings.RATE_LIMIT_LEASE_SIZE, capacity // 20))
+    
+    async def pause(self, seconds: float):
+        self.leased = 0
+        await cache_manager.run_script(PAUSE_SCRIPT, [self.pause_key], [max(1, int(seconds * 1000))])
 
 class RateLimiter:
-    def __init__(self, name: str, requests_per_minute: int):
+    """Grants tokens in priority then FIFO order; one pump task sleeps until the exact time the next token is due"""
+    def __init__(self, name: str, requests_per_minute: int, credential: Optional[str] = None):
         self.name = name
+        self.configured_rpm = requests_per_minute
         self.requests_per_minute = requests_per_minute
+        self.paused_until = 0.0
         self.bucket = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
-        self.request_times = deque(maxlen=requests_per_minute)
-        self.lock = asyncio.Lock()
+        self.shared: Optional[RedisTokenBucket] = None
+        if settings.RATE_LIMIT_DISTRIBUTED:
+            lease_size = max(1, min(settings.RATE_LIMIT_LEASE_SIZE, requests_per_minute // 20))
+            self.shared = RedisTokenBucket(
+                f"ratelimit:{{{name}:{credential_fingerprint(credential)}}}",
+                requests_per_minute,
+                requests_per_minute / 60.0,
+                lease_size,
+                settings.RATE_LIMIT_LEASE_TTL
+            )
+        self.waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self.sequence = itertools.count()
+        self.pump_task: Optional[asyncio.Task] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
         
-    async def acquire(self) -> bool:
-        async with self.lock:
-            now = time.time()
-            self.request_times.append(now)
-            
-            if len(self.request_times) < self.requests_per_minute:
-                return await self.bucket.acquire()
-            
-            oldest_request = self.request_times[0]
-            time_elapsed = now - oldest_request
-            
-            if time_elapsed < 60.0:
-                wait_time = 60.0 - time_elapsed
-                await asyncio.sleep(wait_time)
-                return await self.bucket.acquire()
-            
-            return await self.bucket.acquire()
-    
-    async def wait_if_needed(self):
-        if not await self.acquire():
-            await self.bucket.wait_for_token()
+    async def _take(self):
+        """(seconds to wait, source) from the shared bucket, or the local one while Redis is unavailable"""
+        paused = self.paused_until - time.monotonic()
+        if paused > 0:
+            return paused, self.bucket
+        if self.shared is not None:
+            wait = await self.shared.take()
+            if wait is not None:
+                return wait, self.shared
+        return await self.bucket.take(), self.bucket
+    
+    def _bind_loop(self):
+        # Celery tasks each run in a fresh event loop; waiters and the pump from a finished loop are dropped
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.waiters = []
+            self.pump_task = None
+    
+    def _pump_running(self) -> bool:
+        return self.pump_task is not None and not self.pump_task.done()
+    
+    def _drop_cancelled(self):
+        while self.waiters and self.waiters[0][2].done():
+            heapq.heappop(self.waiters)
+    
+    async def _pump(self):
+        while True:
+            self._drop_cancelled()
+            if not self.waiters:
+                return
+            wait, source = await self._take()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            self._drop_cancelled()
+            if not self.waiters:
+                source.refund()
+                return
+            heapq.heappop(self.waiters)[2].set_result(None)
+    
+    async def wait_if_needed(self, priority: Optional[int] = None):
+        self._bind_loop()
+        if not self.waiters and not self._pump_running():
+            wait, _ = await self._take()
+            if wait == 0:
+                return
+        future = self.loop.create_future()
+        heapq.heappush(self.waiters, (request_priority.get() if priority is None else priority, next(self.sequence), future))
+        if not self._pump_running():
+            self.pump_task = asyncio.create_task(self._pump())
+        await future
+    
+    async def observe(self, status_code: int, headers):
+        """Track the upstream budget: pause until reset on 429 / exhausted quota, otherwise pace the remaining quota over the window"""
+        limits = parse_rate_limit_headers(headers)
+        remaining, reset = limits["remaining"], limits["reset"]
+        delay = limits["retry_after"]
+        if delay is None and remaining is not None and remaining < 1 and reset:
+            delay = reset
+        if delay is None and status_code == 429:
+            delay = settings.RATE_LIMIT_DEFAULT_BACKOFF
+        if delay:
+            await self.pause(delay)
+        elif remaining is not None and reset:
+            self.set_rate(max(1, int(remaining * 60.0 / max(reset, 1.0))))
+    
+    async def pause(self, seconds: float):
+        seconds = min(seconds, settings.RATE_LIMIT_MAX_BACKOFF)
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        if self.shared is not None:
+            await self.shared.pause(seconds)
+        logger.warning(f"{self.name} rate limited upstream, pausing {seconds:.1f}s")
+    
+    def set_rate(self, requests_per_minute: int):
+        """Adopt the pace the server's remaining quota allows, which may be above or below the configured limit"""
+        if requests_per_minute == self.requests_per_minute:
+            return
+        self.requests_per_minute = requests_per_minute
+        self.bucket.set_rate(requests_per_minute, requests_per_minute / 60.0)
+        if self.shared is not None:
+            self.shared.set_rate(requests_per_minute, requests_per_minute / 60.0)
+    
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, future in self.waiters if not future.done())
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests_per_minute": self.requests_per_minute,
+            "configured_rpm": self.configured_rpm,
+            "queued": self.queue_depth(),
+            "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 1),
+            "shared": self.shared is not None
+        }
 
 class RateLimiterManager:
     def __init__(self):
         self.limiters: Dict[str, RateLimiter] = {}
         
-    def get_limiter(self, name: str, requests_per_minute: int = 60) -> RateLimiter:
-        if name not in self.limiters:
-            self.limiters[name] = RateLimiter(name, requests_per_minute)
-        return self.limiters[name]
+    def get_limiter(self, name: str, requests_per_minute: int = 60, credential: Optional[str] = None) -> RateLimiter:
+        """One limiter per API and credential, so separate keys keep separate quotas"""
+        key = f"{name}:{credential_fingerprint(credential)}"
+        if key not in self.limiters:
+            self.limiters[key] = RateLimiter(name, requests_per_minute, credential)
+        return self.limiters[key]
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Per limiter (API name and credential fingerprint) pace, pause and number of callers queued for a token"""
+        return {key: limiter.stats() for key, limiter in sorted(self.limiters.items())}
 
 rate_limiter_manager = RateLimiterManager()
 
@@ -0,0 +1,176 @@
+import asyncio
+import bisect
+import hashlib
+from typing import Dict, List, Any, Tuple, Optional
+import redis.asyncio as redis
+
+def hash_slot_key(key: Any) -> bytes:
+    """Part of the key used for placement: the first non-empty {...} section, as in Redis Cluster"""
+    if isinstance(key, str):
+        key = key.encode("utf-8")
+    start = key.find(b"{")
+    if start != -1:
+        end = key.find(b"}", start + 1)
+        if end > start + 1:
+            return key[start + 1:end]
+    return key
+
+class HashRing:
+    def __init__(self, nodes: List[str], replicas: int = 128):
+        self.replicas = replicas
+        self.ring: List[int] = []
+        self.owners: Dict[int, str] = {}
+        for node in nodes:
+            self.add_node(node)
+
+    def _hash(self, value: bytes) -> int:
+        return int.from_bytes(hashlib.md5(value).digest()[:8], "big")
+
+    def add_node(self, node: str):
+        for i in range(self.replicas):
+            point = self._hash(f"{node}#{i}".encode("utf-8"))
+            if point in self.owners:
+                continue
+            self.owners[point] = node
+            bisect.insort(self.ring, point)
+
+    def remove_node(self, node: str):
+        points = [point for point, owner in self.owners.items() if owner == node]
+        for point in points:
+            del self.owners[point]
+            self.ring.remove(point)
+
+    def get_node(self, key: Any) -> str:
+        point = self._hash(hash_slot_key(key))
+        index = bisect.bisect(self.ring, point) % len(self.ring)
+        return self.owners[self.ring[index]]
+
+# Commands whose positional arguments are all keys; they are split per node and the
+# results recombined. Every other command is routed by its first key argument.
+MULTI_KEY_COMMANDS = {"mget", "delete", "unlink", "exists"}
+
+class ShardedPipeline:
+    def __init__(self, sharded: "ShardedRedis"):
+        self.sharded = sharded
+        self.commands: List[Tuple[str, tuple, dict]] = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.commands = []
+
+    def __getattr__(self, name: str):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self) -> List[Any]:
+        node_commands: Dict[str, List[Tuple[int, int, str, tuple, dict]]] = {}
+        parts_per_command: List[List[Tuple[str, List[int]]]] = []
+
+        for index, (name, args, kwargs) in enumerate(self.commands):
+            parts: List[Tuple[str, List[int]]] = []
+            if name in MULTI_KEY_COMMANDS:
+                keys = list(args[0]) if name == "mget" and len(args) == 1 and isinstance(args[0], (list, tuple)) else list(args)
+                for node, positions in self.sharded.group_keys(keys).items():
+                    sub_args = [keys[p] for p in positions]
+                    node_commands.setdefault(node, []).append((index, len(parts), name, tuple(sub_args), kwargs))
+                    parts.append((node, positions))
+            else:
+                node = self.sharded.ring.get_node(args[0])
+                node_commands.setdefault(node, []).append((index, 0, name, args, kwargs))
+                parts.append((node, []))
+            parts_per_command.append(parts)
+
+        async def run_node(node: str, commands):
+            async with self.sharded.clients[node].pipeline(transaction=False) as pipe:
+                for _, _, name, args, kwargs in commands:
+                    getattr(pipe, name)(*args, **kwargs)
+                return node, await pipe.execute()
+
+        node_results = await asyncio.gather(*(run_node(node, cmds) for node, cmds in node_commands.items()))
+        partials: Dict[Tuple[int, int], Any] = {}
+        for node, results in node_results:
+            for (index, part, _, _, _), result in zip(node_commands[node], results):
+                partials[(index, part)] = result
+
+        results = []
+        for index, (name, args, _) in enumerate(self.commands):
+            parts = parts_per_command[index]
+            if name == "mget":
+                size = len(args[0]) if len(args) == 1 and isinstance(args[0], (list, tuple)) else len(args)
+                values: List[Any] = [None] * size
+                for part, (_, positions) in enumerate(parts):
+                    for position, value in zip(positions, partials[(index, part)]):
+                        values[position] = value
+                results.append(values)
+            elif name in MULTI_KEY_COMMANDS:
+                results.append(sum(partials[(index, part)] or 0 for part in range(len(parts))))
+            else:
+                results.append(partials[(index, 0)])
+        self.commands = []
+        return results
+
+class ShardedRedis:
+    """Client-side consistent-hash ring over independent Redis nodes"""
+    def __init__(self, clients: Dict[str, redis.Redis], replicas: int = 128):
+        self.clients = clients
+        self.ring = HashRing(list(clients.keys()), replicas)
+
+    @classmethod
+    def from_urls(cls, urls: List[str], replicas: int = 128, **kwargs) -> "ShardedRedis":
+        return cls({url: redis.from_url(url, **kwargs) for url in urls}, replicas)
+
+    def client_for(self, key: Any) -> redis.Redis:
+        return self.clients[self.ring.get_node(key)]
+
+    def group_keys(self, keys: List[Any]) -> Dict[str, List[int]]:
+        groups: Dict[str, List[int]] = {}
+        for position, key in enumerate(keys):
+            groups.setdefault(self.ring.get_node(key), []).append(position)
+        return groups
+
+    def pipeline(self, transaction: bool = False) -> ShardedPipeline:
+        return ShardedPipeline(self)
+
+    async def ping(self) -> bool:
+        results = await asyncio.gather(*(client.ping() for client in self.clients.values()))
+        return all(results)
+
+    async def close(self):
+        await asyncio.gather(*(client.close() for client in self.clients.values()), return_exceptions=True)
+
+    async def mget(self, keys: List[Any], *more) -> List[Any]:
+        keys = list(keys) + list(more) if isinstance(keys, (list, tuple)) else [keys] + list(more)
+        async with self.pipeline() as pipe:
+            pipe.mget(keys)
+            return (await pipe.execute())[0]
+
+    async def _multi_key(self, name: str, *keys) -> int:
+        async with self.pipeline() as pipe:
+            getattr(pipe, name)(*keys)
+            return (await pipe.execute())[0]
+
+    async def delete(self, *keys) -> int:
+        return await self._multi_key("delete", *keys)
+
+    async def unlink(self, *keys) -> int:
+        return await self._multi_key("unlink", *keys)
+
+    async def exists(self, *keys) -> int:
+        return await self._multi_key("exists", *keys)
+
+    async def eval(self, script: str, numkeys: int, *keys_and_args):
+        return await self.client_for(keys_and_args[0]).eval(script, numkeys, *keys_and_args)
+
+    async def scan_iter(self, match: Optional[str] = None, count: Optional[int] = None, **kwargs):
+        for client in self.clients.values():
+            async for key in client.scan_iter(match=match, count=count, **kwargs):
+                yield key
+
+    def __getattr__(self, name: str):
+        def route(key, *args, **kwargs):
+            return getattr(self.client_for(key), name)(key, *args, **kwargs)
+        return route
@@ -14,7 +14,7 @@ function StatsPanel() {
         const response = await axios.get('/api/profiles?limit=1000')
         const profiles = response.data.profiles
         setStats({
-          total: profiles.length,
+          total: response.data.total,
           complete: profiles.filter(p => p.status === 'complete').length,
           pending: profiles.filter(p => p.status === 'pending').length
         })